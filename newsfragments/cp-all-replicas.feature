@@ -0,0 +1 @@
+`cp --all-replicas` packs the host source once and streams it to every replica with `podman cp -` concurrently, and `cp --index` selects the replica to copy from or to.
@@ -0,0 +1 @@
+Added `daemon` command, which keeps the project and its containers in memory, up to date with `podman events`, and answers `ps -q`/`ps --format json`, the container of `exec`/`cp`, `up -d` when nothing needs to change and the routing of `logs` for the other commands over a unix socket.
@@ -0,0 +1 @@
+`stop`, `start` and `restart` now act on each service as soon as the services it depends on (or its dependents, when stopping) are done, like `down`, and wait for its `depends_on` conditions before starting it; `restart --rolling [--rolling-batch-size K]` restarts replicas in batches, waiting up to `--wait-timeout` seconds for each batch to be running or healthy and stopping with an error otherwise.
@@ -0,0 +1 @@
+`watch` supports `develop.watch` rules: it syncs batches of changed files into every replica as one tar stream, restarts for `sync+restart` and rebuilds only for `rebuild` rules.
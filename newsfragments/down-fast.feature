@@ -0,0 +1 @@
+Added `down --fast`, which removes the whole project with `podman pod stop` and `podman pod rm -f` (or a single `podman rm -f` when not running in a pod), and `down --volumes` now removes volumes with a single `podman volume rm` call.
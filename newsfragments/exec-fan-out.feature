@@ -0,0 +1 @@
+`exec --all-replicas` and `exec --services a,b,c` (which takes no service argument) run the command concurrently in every selected container, up to `--concurrency` at once, with prefixed output and a table of the exit codes.
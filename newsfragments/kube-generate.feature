@@ -0,0 +1 @@
+Add `kube generate`, which writes the project as one multi-document Kubernetes YAML (a Pod or Deployment, ConfigMaps for env files, PersistentVolumeClaims for named volumes and Secrets) for a single `podman kube play`, and warns about every compose feature that does not map.
@@ -0,0 +1 @@
+Add `all`, which runs a command like `up -d` in every project registered with `systemd -a register` at once, and allow repeating `--project-directory` to do the same for the given directories, with one podman runner and `--parallel` limit shared by all projects and the result of each project printed at the end.
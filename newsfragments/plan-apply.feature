@@ -0,0 +1 @@
+Add `plan`, which writes the podman commands of `up -d` with their dependencies to a JSON file, and `apply`, which runs them concurrently in dependency order without reading the compose files, skipping resources that exist and containers that are up to date.
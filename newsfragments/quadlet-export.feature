@@ -0,0 +1 @@
+Add `quadlet --output DIR`, which writes the project as Quadlet .container, .network, .volume and .pod files with the arguments `up` would use and the dependencies as unit ordering.
@@ -0,0 +1 @@
+`scale SERVICE=NUM [SERVICE=NUM...]` creates and starts only the missing replicas and stops and removes only the surplus highest-numbered ones; `up --scale` no longer resets the replica count of the other services to 1.
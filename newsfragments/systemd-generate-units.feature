@@ -0,0 +1 @@
+`systemd -a generate-units` writes a `podman-compose-<project>-<container>.service` unit per container, started with `podman start -a` and ordered after the units of its dependencies, and a target for the project, so that systemd starts independent services in parallel at boot.
@@ -0,0 +1 @@
+`up --replace-strategy=start-first` recreates outdated replicas by starting the new container next to the old one and swapping them once it is running or healthy, for services without fixed host ports or a `container_name`.
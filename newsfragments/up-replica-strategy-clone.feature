@@ -0,0 +1 @@
+`up --replica-strategy=clone` creates the first replica of a service and clones the other replicas concurrently with `podman container clone`; unlike created replicas the clones have no `com.docker.compose.container-number` label, podman-compose reads their number from the container name, and `scripts/benchmark_replica_strategy.py` compares both strategies against a stand-in podman.
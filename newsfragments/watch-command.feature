@@ -0,0 +1 @@
+Added `watch` command, which recreates only the services whose configuration, env files or extended files changed.
@@ -12,37 +12,76 @@ import argparse
 import asyncio.exceptions
 import asyncio.subprocess
 import codecs
-import getpass
-import glob
-import hashlib
+import copy
+import functools
+import importlib.util
 import inspect
 import json
 import logging
 import os
-import random
+import posixpath
 import re
 import shlex
 import signal
+import stat
 import string
+import struct
 import subprocess
 import sys
-import tempfile
-import urllib.parse
 from asyncio import Task
+from collections.abc import Iterator
+from collections.abc import MutableMapping
 from dataclasses import dataclass
 from enum import Enum
+from types import ModuleType
+from typing import IO
 from typing import Any
+from typing import Awaitable
 from typing import Callable
 from typing import ClassVar
 from typing import Iterable
+from typing import NamedTuple
 from typing import Sequence
 from typing import overload
-from urllib.parse import quote
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    import a module on first attribute access instead of at startup
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
 
 # import fnmatch
 # fnmatch.fnmatchcase(env, "*_HOST")
-import yaml
-from dotenv import dotenv_values
+
+# modules not needed by every command are loaded on first use, to keep startup fast
+yaml = lazy_import("yaml")
+base64 = lazy_import("base64")
+ctypes = lazy_import("ctypes")
+ctypes_util = lazy_import("ctypes.util")
+dotenv = lazy_import("dotenv")
+fnmatch = lazy_import("fnmatch")
+getpass = lazy_import("getpass")
+glob = lazy_import("glob")
+hashlib = lazy_import("hashlib")
+hmac = lazy_import("hmac")
+random = lazy_import("random")
+shutil = lazy_import("shutil")
+tarfile = lazy_import("tarfile")
+tempfile = lazy_import("tempfile")
+urllib_parse = lazy_import("urllib.parse")
 
 # Python loads the appropriate path module based on the OS, but we need to be able
 # to check if a path is absolute according to BOTH major OS's rules.
@@ -106,6 +145,16 @@ def try_float(i: int | str, fallback: float | None = None) -> float | None:
     return fallback
 
 
+def positive_int(value: str) -> int:
+    """
+    argparse type of options which only accept a number greater than zero
+    """
+    number = try_int(value, fallback=None)
+    if number is None or number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+    return number
+
+
 log = logging.getLogger(__name__)
 
 
@@ -130,6 +179,8 @@ PODMAN_CMDS = (
 
 t_re = re.compile(r"^(?:(\d+)[m:])?(?:(\d+(?:\.\d+)?)s?)?$")
 STOP_GRACE_PERIOD = "10"
+# seconds a container without healthcheck gets to be running again in a rolling restart
+ROLLING_RUNNING_TIMEOUT = 60
 
 
 def str_to_seconds(txt: int | str | None) -> int | None:
@@ -159,6 +210,14 @@ def strverscmp_lt(a: str, b: str) -> bool:
     return a_ls < b_ls
 
 
+def print_table(rows: list[list[str]]) -> None:
+    """print the rows with their columns aligned, the first row being the header"""
+    column_widths = [max(map(len, column)) for column in zip(*rows)]
+    for row in rows:
+        cells = [cell.ljust(width) for cell, width in zip(row[:-1], column_widths)]
+        print("  ".join([*cells, row[-1]]))
+
+
 def parse_short_mount(mount_str: str, basedir: str) -> dict[str, Any]:
     mount_a = mount_str.split(":")
     mount_opt_dict: dict[str, Any] = {}
@@ -579,17 +638,43 @@ def try_parse_bool(value: Any) -> bool | None:
     return None
 
 
-async def assert_volume(compose: PodmanCompose, mount_dict: dict[str, Any]) -> None:
+def get_volume_create_args(vol: dict[str, Any], proj_name: str, vol_name: str) -> list[str]:
+    args = [
+        "create",
+        "--label",
+        f"io.podman.compose.project={proj_name}",
+        "--label",
+        f"com.docker.compose.project={proj_name}",
+    ]
+    labels = vol.get("labels", [])
+    for item in norm_as_list(labels):
+        args.extend(["--label", item])
+    driver = vol.get("driver")
+    if driver:
+        args.extend(["--driver", driver])
+    driver_opts = vol.get("driver_opts", {})
+    for opt, value in driver_opts.items():
+        args.extend(["--opt", f"{opt}={value}"])
+    args.append(vol_name)
+    return args
+
+
+def bind_mount_source(compose: PodmanCompose, mount_dict: dict[str, Any]) -> str:
+    basedir = os.path.realpath(compose.dirname)
+    return os.path.abspath(os.path.join(basedir, os.path.expanduser(mount_dict["source"])))
+
+
+async def assert_volume(
+    compose: PodmanCompose, mount_dict: dict[str, Any], create: bool = True
+) -> None:
     """
     inspect volume to get directory
     create volume if needed
     """
     vol = mount_dict.get("_vol")
     if mount_dict["type"] == "bind":
-        basedir = os.path.realpath(compose.dirname)
-        mount_src = mount_dict["source"]
-        mount_src = os.path.abspath(os.path.join(basedir, os.path.expanduser(mount_src)))
-        if not os.path.exists(mount_src):
+        mount_src = bind_mount_source(compose, mount_dict)
+        if create and not os.path.exists(mount_src):
             bind_opts = mount_dict.get("bind", {})
             if "create_host_path" in bind_opts and not bind_opts["create_host_path"]:
                 raise ValueError(
@@ -602,7 +687,7 @@ async def assert_volume(compose: PodmanCompose, mount_dict: dict[str, Any]) -> N
                 pass
         mount_dict["source"] = mount_src
         return
-    if mount_dict["type"] != "volume" or not vol or not vol.get("name"):
+    if not create or mount_dict["type"] != "volume" or not vol or not vol.get("name"):
         return
     vol_name = vol["name"]
     is_ext = vol.get("external")
@@ -619,23 +704,8 @@ async def assert_volume(compose: PodmanCompose, mount_dict: dict[str, Any]) -> N
                 f"External volume [{vol_name}] does not exist. "
                 f"Create it first with: podman volume create '{vol_name}'"
             ) from e
-        labels = vol.get("labels", [])
-        args = [
-            "create",
-            "--label",
-            f"io.podman.compose.project={compose.project_name}",
-            "--label",
-            f"com.docker.compose.project={compose.project_name}",
-        ]
-        for item in norm_as_list(labels):
-            args.extend(["--label", item])
-        driver = vol.get("driver")
-        if driver:
-            args.extend(["--driver", driver])
-        driver_opts = vol.get("driver_opts", {})
-        for opt, value in driver_opts.items():
-            args.extend(["--opt", f"{opt}={value}"])
-        args.append(vol_name)
+        assert compose.project_name is not None
+        args = get_volume_create_args(vol, compose.project_name, vol_name)
         await compose.podman.output([], "volume", args)
         await compose.podman.output([], "volume", ["inspect", vol_name])
 
@@ -767,7 +837,10 @@ def get_mnt_dict(
 
 
 async def get_mount_args(
-    compose: PodmanCompose, cnt: dict[str, Any], volume: str | dict[str, Any]
+    compose: PodmanCompose,
+    cnt: dict[str, Any],
+    volume: str | dict[str, Any],
+    create_resources: bool = True,
 ) -> list[str]:
     volume = get_mnt_dict(compose, cnt, volume)
     srv_name = cnt["_service"]
@@ -777,7 +850,7 @@ async def get_mount_args(
     # --mount is forced for type set in mount_over_volume_needed var.
     #
     mount_over_volume_needed = {"image", "glob", "volume"}
-    await assert_volume(compose, volume)
+    await assert_volume(compose, volume, create_resources)
     if compose.prefer_volume_over_mount and mount_type not in mount_over_volume_needed:
         if mount_type == "tmpfs":
             # TODO: --tmpfs /tmp:rw,size=787448k,mode=1777
@@ -799,40 +872,147 @@ async def get_mount_args(
     return ["--mount", args]
 
 
-async def create_secrets_from_environment(compose: PodmanCompose) -> None:
-    if not compose.declared_secrets:
-        return
-    for secret_name in compose.declared_secrets.keys():
-        secret_environment = compose.declared_secrets[secret_name].get("environment")
-        if secret_environment:
-            secret_environment_value = os.getenv(secret_environment)
+def secret_hash_key_file() -> str:
+    config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    return os.path.join(config_home, "containers", "compose", "secret-hash.key")
 
-            if secret_environment_value is None:
-                raise ValueError(
-                    f"Environment variable '{secret_environment}' required"
-                    + " by secret '{secret_name}' is not set in the process environment."
-                )
 
-            log.debug(
-                "attempting creation of secret '%s' set to '%s'",
-                secret_name,
-                secret_environment_value,
-            )
+@functools.lru_cache(maxsize=None)
+def read_secret_hash_key(fn: str) -> bytes:
+    """
+    the key of the secret hashes of the user, created readable only by them on first use
+    """
+    try:
+        with open(fn, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(fn), mode=0o700, exist_ok=True)
+    # mkstemp creates the file with mode 0600, linking it fails if another process was first
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(fn))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(os.urandom(32))
+        try:
+            os.link(tmp, fn)
+        except FileExistsError:
+            pass
+    finally:
+        os.unlink(tmp)
+    with open(fn, "rb") as f:
+        return f.read()
 
-            assert compose.project_name is not None
 
-            await compose.podman.run(
-                [],
-                "secret",
-                [
-                    "create",
-                    "--label",
-                    "io.podman.compose.project=" + compose.project_name,
-                    "--env",
-                    f"{compose.project_name}_{secret_name}",
-                    secret_environment,
-                ],
+def secret_value_hash(secret_name: str, value: str) -> str:
+    """
+    the keyed hash of the value of an environment secret, labelled on its podman secret to tell
+    whether it changed without letting the value be guessed from the label
+    """
+    key = read_secret_hash_key(secret_hash_key_file())
+    return hmac.new(key, f"{secret_name}\0{value}".encode(), hashlib.sha256).hexdigest()
+
+
+def secret_content_hash(compose: PodmanCompose, secret_name: str) -> str | None:
+    """
+    the secret_value_hash() of an environment secret, None if the variable is not set
+    """
+    assert compose.declared_secrets is not None
+    value = compose.getenv(compose.declared_secrets[secret_name]["environment"])
+    if value is None:
+        return None
+    return secret_value_hash(secret_name, value)
+
+
+def config_hash_with_secrets(config_hash: str, secret_hashes: dict[str, str | None]) -> str:
+    """
+    the config hash of a service combined with the hashes of its environment secrets by name
+    """
+    return hashlib.sha256(
+        json.dumps([config_hash, secret_hashes], sort_keys=True).encode()
+    ).hexdigest()
+
+
+def secret_create_replaces(compose: PodmanCompose) -> bool:
+    """
+    whether `podman secret create` takes --replace, which was introduced in podman 4.7.0
+    """
+    return compose.podman_version is None or not strverscmp_lt(compose.podman_version, "4.7.0")
+
+
+async def existing_secret_hashes(compose: PodmanCompose) -> dict[str, str]:
+    """
+    the content hash label of the podman secrets of the project by their name
+    """
+    try:
+        output = await compose.podman.output(
+            [],
+            "secret",
+            [
+                "ls",
+                "--format",
+                "json",
+                "--filter",
+                f"label=io.podman.compose.project={compose.project_name}",
+            ],
+        )
+    except subprocess.CalledProcessError as e:
+        log.warning("could not list the secrets of the project: %s", e)
+        return {}
+    hashes = {}
+    for record in json.loads(output or b"[]") or []:
+        # podman nests the name and labels in Spec
+        spec = record.get("Spec") or record
+        hashes[spec.get("Name", "")] = (spec.get("Labels") or {}).get(
+            "io.podman.compose.secret-hash", ""
+        )
+    return hashes
+
+
+async def create_secrets_from_environment(compose: PodmanCompose) -> None:
+    """
+    creates the podman secrets of environment secrets, replacing only those whose value changed
+    """
+    env_secrets = [
+        secret_name
+        for secret_name, secret in (compose.declared_secrets or {}).items()
+        if secret.get("environment")
+    ]
+    if not env_secrets:
+        return
+    assert compose.declared_secrets is not None
+    assert compose.project_name is not None
+    existing = await existing_secret_hashes(compose)
+    for secret_name in env_secrets:
+        secret_environment = compose.declared_secrets[secret_name]["environment"]
+        content_hash = secret_content_hash(compose, secret_name)
+        if content_hash is None:
+            raise ValueError(
+                f"Environment variable '{secret_environment}' required"
+                + f" by secret '{secret_name}' is not set in the process environment."
             )
+        name = f"{compose.project_name}_{secret_name}"
+        if existing.get(name) == content_hash:
+            log.debug("secret '%s' is up to date", secret_name)
+            continue
+        log.debug("creating secret '%s' from $%s", secret_name, secret_environment)
+        replace = secret_create_replaces(compose)
+        if not replace and name in existing:
+            await compose.podman.run([], "secret", ["rm", name])
+        await compose.podman.run(
+            [],
+            "secret",
+            [
+                "create",
+                *(["--replace"] if replace else []),
+                "--label",
+                "io.podman.compose.project=" + compose.project_name,
+                "--label",
+                "io.podman.compose.secret-hash=" + content_hash,
+                "--env",
+                name,
+                secret_environment,
+            ],
+        )
 
 
 def get_secret_args(
@@ -1163,26 +1343,37 @@ def get_network_create_args(net_desc: dict[str, Any], proj_name: str, net_name:
     return args
 
 
-async def assert_cnt_nets(compose: PodmanCompose, cnt: dict[str, Any]) -> None:
+def get_cnt_nets(
+    compose: PodmanCompose, cnt: dict[str, Any]
+) -> list[tuple[dict[str, Any], str, Any]]:
     """
-    create missing networks
+    the description, podman name and external setting of the networks the container joins
     """
-    net = cnt.get("network_mode")
-    if net:
-        return
-
-    assert compose.project_name is not None
+    if cnt.get("network_mode"):
+        return []
 
     cnt_nets = cnt.get("networks")
     if cnt_nets and isinstance(cnt_nets, dict):
         cnt_nets = list(cnt_nets.keys())
     cnt_nets = norm_as_list(cnt_nets or compose.default_net)  # type: ignore[arg-type]
+    nets = []
     for net in cnt_nets:
         net_desc = compose.networks[net] or {}
         is_ext = net_desc.get("external")
         ext_desc = is_ext if isinstance(is_ext, dict) else {}
         default_net_name = default_network_name_for_project(compose, net, is_ext)
         net_name = ext_desc.get("name") or net_desc.get("name") or default_net_name
+        nets.append((net_desc, net_name, is_ext))
+    return nets
+
+
+async def assert_cnt_nets(compose: PodmanCompose, cnt: dict[str, Any]) -> None:
+    """
+    create missing networks
+    """
+    assert compose.project_name is not None
+
+    for net_desc, net_name, is_ext in get_cnt_nets(compose, cnt):
         try:
             await compose.podman.output([], "network", ["exists", net_name])
         except subprocess.CalledProcessError as e:
@@ -1341,11 +1532,69 @@ def get_net_args_from_networks(compose: PodmanCompose, cnt: dict[str, Any]) -> l
     return net_args
 
 
+@dataclass
+class ContainerArgsTemplate:
+    """
+    `podman create` arguments of one replica of a service and the positions of its
+    replica specific values, to derive the arguments of the other replicas from
+    """
+
+    args: list[str]
+    label_indices: list[int]
+
+
 async def container_to_args(
-    compose: PodmanCompose, cnt: dict[str, Any], detached: bool = True, no_deps: bool = False
+    compose: PodmanCompose,
+    cnt: dict[str, Any],
+    detached: bool = True,
+    no_deps: bool = False,
+    create_resources: bool = True,
+) -> list[str]:
+    """
+    the arguments of `podman create` for the container, creating the missing networks, volumes
+    and bind mount sources unless create_resources is False
+    """
+    if not isinstance(cnt, ServiceContainer):
+        return await _container_to_args(compose, cnt, detached, no_deps, create_resources)
+    # replicas of a service only differ in their name and container-number label,
+    # so env files, mounts, networks, etc. are resolved and checked once per service
+    service_desc = compose.services[cnt["_service"]]
+    # the service name is part of the key, its network aliases and anonymous volume names
+    # differ between services of the same configuration
+    key = (
+        cnt["_service"],
+        compose.config_hash(service_desc),
+        detached,
+        no_deps,
+        create_resources,
+        cnt.overrides(),
+    )
+    template = compose.container_args_templates.get(key)
+    labels = cnt.get("labels", [])
+    if template is None or len(template.label_indices) != len(labels):
+        podman_args = await _container_to_args(compose, cnt, detached, no_deps, create_resources)
+        label_indices = [i for i in range(1, len(podman_args)) if podman_args[i - 1] == "--label"][
+            : len(labels)
+        ]
+        compose.container_args_templates[key] = ContainerArgsTemplate(
+            list(podman_args), label_indices
+        )
+        return podman_args
+    podman_args = list(template.args)
+    podman_args[0] = f"--name={cnt['name']}"
+    for i, label in zip(template.label_indices, labels):
+        podman_args[i] = label
+    return podman_args
+
+
+async def _container_to_args(
+    compose: PodmanCompose,
+    cnt: dict[str, Any],
+    detached: bool,
+    no_deps: bool,
+    create_resources: bool = True,
 ) -> list[str]:
     # TODO: double check -e , --add-host, -v, --read-only
-    dirname = compose.dirname
     name = cnt["name"]
     podman_args = [f"--name={name}"]
 
@@ -1389,22 +1638,8 @@ async def container_to_args(
         podman_args.extend(["--dns-opt", item])
     for item in norm_as_list(cnt.get("dns_search")):
         podman_args.extend(["--dns-search", item])
-    env_file = cnt.get("env_file", [])
-    if isinstance(env_file, (dict, str)):
-        env_file = [env_file]
-    for i in env_file:
-        if isinstance(i, str):
-            i = {"path": i}
-        path = i["path"]
-        required = i.get("required", True)
-        i = os.path.realpath(os.path.join(dirname, path))
-        if not os.path.exists(i):
-            if not required:
-                continue
-            raise ValueError(f"Env file at {i} does not exist")
-        dotenv_dict = {}
-        dotenv_dict = dotenv_to_dict(i)
-        env = norm_as_list(dotenv_dict)
+    for env_file in container_env_files(compose, cnt):
+        env = norm_as_list(dotenv_to_dict(env_file))
         for e in env:
             podman_args.extend(["-e", e])
     env = norm_as_list(cnt.get("environment", {}))
@@ -1423,9 +1658,10 @@ async def container_to_args(
     for i in tmpfs_ls:
         podman_args.extend(["--tmpfs", i])
     for volume in cnt.get("volumes", []):
-        podman_args.extend(await get_mount_args(compose, cnt, volume))
+        podman_args.extend(await get_mount_args(compose, cnt, volume, create_resources))
 
-    await assert_cnt_nets(compose, cnt)
+    if create_resources:
+        await assert_cnt_nets(compose, cnt)
     podman_args.extend(get_net_args(compose, cnt))
 
     log_config = cnt.get("logging")
@@ -1613,15 +1849,39 @@ async def container_to_args(
 
     if not rootfs_mode:
         podman_args.append(cnt["image"])  # command, ..etc.
-    command = cnt.get("command")
-    if command is not None:
-        if isinstance(command, str):
-            podman_args.extend(shlex.split(command))
-        else:
-            podman_args.extend([str(i) for i in command])
+    podman_args.extend(container_command(cnt))
     return podman_args
 
 
+def container_env_files(compose: PodmanCompose, cnt: dict[str, Any]) -> list[str]:
+    """
+    the paths of the env files of the container, without the missing optional ones
+    """
+    env_file = cnt.get("env_file", [])
+    if isinstance(env_file, (dict, str)):
+        env_file = [env_file]
+    paths = []
+    for i in env_file:
+        if isinstance(i, str):
+            i = {"path": i}
+        path = os.path.realpath(os.path.join(compose.dirname, i["path"]))
+        if not os.path.exists(path):
+            if not i.get("required", True):
+                continue
+            raise ValueError(f"Env file at {path} does not exist")
+        paths.append(path)
+    return paths
+
+
+def container_command(cnt: dict[str, Any]) -> list[str]:
+    command = cnt.get("command")
+    if command is None:
+        return []
+    if isinstance(command, str):
+        return shlex.split(command)
+    return [str(i) for i in command]
+
+
 class ServiceDependencyCondition(Enum):
     CONFIGURED = "configured"
     CREATED = "created"
@@ -1761,9 +2021,7 @@ def flat_deps(services: dict[str, Any], with_extends: bool = False) -> None:
 ###################
 
 
-class OverrideTag(yaml.YAMLObject):
-    yaml_dumper = yaml.SafeDumper
-    yaml_loader = yaml.SafeLoader
+class OverrideTag:
     yaml_tag = '!override'
 
     def __init__(self, value: Any) -> None:
@@ -1782,7 +2040,7 @@ class OverrideTag(yaml.YAMLObject):
             self.value = [item.value for item in value]  # type: ignore[union-attr]
 
     @classmethod
-    def from_yaml(cls, loader: Any, node: Any) -> OverrideTag:
+    def from_yaml(cls, _loader: Any, node: Any) -> OverrideTag:
         return OverrideTag(node.value)
 
     @classmethod
@@ -1790,9 +2048,7 @@ class OverrideTag(yaml.YAMLObject):
         return dumper.represent_scalar(cls.yaml_tag, data.value)
 
 
-class ResetTag(yaml.YAMLObject):
-    yaml_dumper = yaml.SafeDumper
-    yaml_loader = yaml.SafeLoader
+class ResetTag:
     yaml_tag = '!reset'
 
     @classmethod
@@ -1800,21 +2056,33 @@ class ResetTag(yaml.YAMLObject):
         return cls.yaml_tag
 
     @classmethod
-    def from_yaml(cls, loader: Any, node: Any) -> ResetTag:
+    def from_yaml(cls, _loader: Any, _node: Any) -> ResetTag:
         return ResetTag()
 
     @classmethod
-    def to_yaml(cls, dumper: Any, data: ResetTag) -> str:
+    def to_yaml(cls, dumper: Any, _data: ResetTag) -> str:
         return dumper.represent_scalar(cls.yaml_tag, '')
 
 
-async def wait_with_timeout(coro: Any, timeout: int | float) -> Any:
+@functools.lru_cache(maxsize=None)
+def register_yaml_tags() -> None:
+    """
+    teach the safe loader and dumper about !override and !reset,
+    deferred until YAML is actually used so that yaml is not imported at startup
+    """
+    for tag_cls in (OverrideTag, ResetTag):
+        yaml.SafeLoader.add_constructor(tag_cls.yaml_tag, tag_cls.from_yaml)
+        yaml.SafeDumper.add_representer(tag_cls, tag_cls.to_yaml)
+
+
+async def wait_with_timeout(coro: Any, timeout: int | float | None) -> Any:
     """
     Asynchronously waits for the given coroutine to complete with a timeout.
 
     Args:
         coro: The coroutine to wait for.
-        timeout (int or float): The maximum number of seconds to wait for.
+        timeout (int, float or None): The maximum number of seconds to wait for, or None
+            to wait forever.
 
     Raises:
         TimeoutError: If the coroutine does not complete within the specified timeout.
@@ -1825,13 +2093,103 @@ async def wait_with_timeout(coro: Any, timeout: int | float) -> Any:
         raise TimeoutError from exc
 
 
+###################
+# podman version cache
+###################
+
+
+def user_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "podman-compose")
+
+
+def podman_binary_stat(podman_path: str) -> dict[str, Any] | None:
+    """
+    identify the podman binary by its resolved path, mtime, inode and size,
+    returns None if it can not be found
+    """
+    if os.path.dirname(podman_path):
+        resolved = podman_path
+    else:
+        resolved = shutil.which(podman_path) or ""
+    try:
+        resolved = os.path.realpath(resolved)
+        st = os.stat(resolved)
+    except (OSError, ValueError):
+        return None
+    return {
+        "path": resolved,
+        "mtime_ns": st.st_mtime_ns,
+        "ino": st.st_ino,
+        "size": st.st_size,
+    }
+
+
+def podman_version_cache_file() -> str:
+    return os.path.join(user_cache_dir(), "podman-version.json")
+
+
+def read_cached_podman_version(binary_stat: dict[str, Any] | None) -> str | None:
+    """
+    returns the cached version of the given podman binary,
+    or None if it is not cached or the binary has changed since
+    """
+    if binary_stat is None:
+        return None
+    try:
+        with open(podman_version_cache_file(), encoding="utf-8") as f:
+            cache = json.load(f)
+        entry = cache[binary_stat["path"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(entry, dict) or any(
+        entry.get(key) != value for key, value in binary_stat.items()
+    ):
+        return None
+    version = entry.get("version")
+    return version if isinstance(version, str) and version else None
+
+
+def write_cached_podman_version(binary_stat: dict[str, Any] | None, version: str) -> None:
+    if binary_stat is None:
+        return
+    fn = podman_version_cache_file()
+    try:
+        with open(fn, encoding="utf-8") as f:
+            cache = json.load(f)
+        if not isinstance(cache, dict):
+            cache = {}
+    except (OSError, ValueError):
+        cache = {}
+    cache[binary_stat["path"]] = {**binary_stat, "version": version}
+    try:
+        os.makedirs(os.path.dirname(fn), exist_ok=True)
+        # write to a temporary file first so that concurrent runs never see a partial file
+        tmp_fn = f"{fn}.{os.getpid()}.tmp"
+        with open(tmp_fn, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_fn, fn)
+    except OSError as e:
+        log.debug("could not write podman version cache %s: %s", fn, e)
+
+
 ###################
 # podman and compose classes
 ###################
 
 
-@dataclass
-class ExistingContainer:
+# the fields of ExistingContainer, one JSON record per line, named like in
+# `podman ps --format json`; .State and .Status of the template are for humans ("Up 2 minutes"),
+# those of the JSON output are in .ListContainer
+PS_RECORD_FORMAT = (
+    '{"Names":{{json .Names}},"Id":{{json .ID}},"ImageID":{{json .ImageID}},'
+    '"State":{{json .ListContainer.State}},"Status":{{json .ListContainer.Status}},'
+    '"Exited":{{json .Exited}},"Labels":{{json .Labels}}}'
+)
+PS_LINE_LIMIT = 2**24
+
+
+class ExistingContainer(NamedTuple):
     name: str
     id: str
     service_name: str
@@ -1840,6 +2198,126 @@ class ExistingContainer:
     exited: bool
     state: str
     status: str
+    number: int = 0
+    # whether `exec` passes the environment of the service
+    has_environment: bool = True
+
+    @classmethod
+    def from_ps(cls, c: dict[str, Any]) -> ExistingContainer:
+        """
+        from a record of `podman ps --format json` or of PS_RECORD_FORMAT
+        """
+        names = c["Names"]
+        labels: dict[str, str] = c.get("Labels") or {}
+        return cls(
+            # the template prints the first name only
+            name=names if isinstance(names, str) else names[0],
+            id=c["Id"],
+            service_name=(
+                labels.get("io.podman.compose.service", "")
+                or labels.get("com.docker.compose.service", "")
+            ),
+            config_hash=labels.get("io.podman.compose.config-hash", ""),
+            image_id=c.get("ImageID", ""),
+            exited=c.get("Exited", False),
+            state=c.get("State", ""),
+            status=c.get("Status", ""),
+            number=try_int(labels.get("com.docker.compose.container-number", ""), fallback=0),
+            has_environment=labels.get("io.podman.compose.environment") != "none",
+        )
+
+
+def ps_record(line: bytes) -> dict[str, Any]:
+    """
+    a line of `podman ps --format PS_RECORD_FORMAT`
+    """
+    try:
+        c = json.loads(line)
+    except ValueError:
+        c = None
+    if not isinstance(c, dict) or not c.get("Names") or not c.get("Id"):
+        text = line.decode(errors="replace").strip()
+        raise PodmanComposeError(f"unexpected container record from podman ps: {text!r}")
+    return c
+
+
+def replica_number(project_name: str, c: ExistingContainer) -> int:
+    """
+    number of the replica, cloned replicas have no container-number label
+    """
+    for sep in ("_", "-"):
+        prefix = f"{project_name}{sep}{c.service_name}{sep}"
+        if c.name.startswith(prefix):
+            return try_int(c.name[len(prefix) :], fallback=c.number)
+    return c.number
+
+
+class ServiceContainer(MutableMapping[str, Any]):
+    """
+    container description which overlays per-replica fields (name, num, labels, ...)
+    over the configuration of its service; the service configuration is shared by
+    all replicas and never written to, assignments and deletions only affect the replica
+    """
+
+    __slots__ = ("_service_desc", "_own", "_deleted")
+
+    def __init__(self, service_desc: dict[str, Any], **own: Any) -> None:
+        self._service_desc = service_desc
+        self._own = own
+        self._deleted: set[str] | None = None
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._own:
+            return self._own[key]
+        if self._deleted is not None and key in self._deleted:
+            raise KeyError(key)
+        return self._service_desc[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._own[key] = value
+        if self._deleted is not None:
+            self._deleted.discard(key)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self._own.pop(key, None)
+        if key in self._service_desc:
+            if self._deleted is None:
+                self._deleted = set()
+            self._deleted.add(key)
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._own:
+            return True
+        if self._deleted is not None and key in self._deleted:
+            return False
+        return key in self._service_desc
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._own
+        for key in self._service_desc:
+            if key not in self._own and (self._deleted is None or key not in self._deleted):
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def overrides(self) -> tuple[tuple[str, str], ...]:
+        """
+        the keys this replica sets or deletes on top of its service, besides the fields
+        every replica has
+        """
+        overrides = [
+            (key, repr(value))
+            for key, value in self._own.items()
+            if key not in ("name", "num", "log_prefix", "labels")
+        ]
+        overrides.extend((key, "<deleted>") for key in sorted(self._deleted or ()))
+        return tuple(overrides)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({dict(self)!r})"
 
 
 class Podman:
@@ -1849,11 +2327,16 @@ class Podman:
         podman_path: str = "podman",
         dry_run: bool = False,
         semaphore: asyncio.Semaphore = asyncio.Semaphore(sys.maxsize),
+        env: dict[str, str] | None = None,
+        cwd: str | None = None,
     ) -> None:
         self.compose = compose
         self.podman_path = podman_path
         self.dry_run = dry_run
         self.semaphore = semaphore
+        # the environment and working directory of podman, those of podman-compose when None
+        self.env = env
+        self.cwd = cwd
 
     async def output(
         self, podman_args: list[str], cmd: str = "", cmd_args: list[str] | None = None
@@ -1864,7 +2347,11 @@ class Podman:
             cmd_ls = [self.podman_path, *podman_args] + xargs + cmd_args
             log.info(str(cmd_ls))
             p = await asyncio.create_subprocess_exec(
-                *cmd_ls, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+                *cmd_ls,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=self.env,
+                cwd=self.cwd,
             )
 
             stdout_data, stderr_data = await p.communicate()
@@ -1945,6 +2432,7 @@ class Podman:
         log_formatter: str | None = None,
         *,
         suppress_output: bool = False,
+        stdin: int | IO[Any] | None = None,
         # Intentionally mutable default argument to hold references to tasks
         task_reference: set[asyncio.Task] = set(),
     ) -> int | None:
@@ -1959,9 +2447,12 @@ class Podman:
             if log_formatter is not None:
                 p = await asyncio.create_subprocess_exec(
                     *cmd_ls,
+                    stdin=stdin,
                     stdout=asyncio.subprocess.PIPE,
                     stderr=asyncio.subprocess.PIPE,
                     close_fds=False,
+                    env=self.env,
+                    cwd=self.cwd,
                 )  # pylint: disable=consider-using-with
 
                 assert p.stdout is not None
@@ -1984,13 +2475,18 @@ class Podman:
             elif suppress_output:
                 p = await asyncio.create_subprocess_exec(
                     *cmd_ls,
+                    stdin=stdin,
                     stdout=subprocess.DEVNULL,
                     stderr=subprocess.DEVNULL,
                     close_fds=False,
+                    env=self.env,
+                    cwd=self.cwd,
                 )  # pylint: disable=consider-using-with
 
             else:
-                p = await asyncio.create_subprocess_exec(*cmd_ls, close_fds=False)  # pylint: disable=consider-using-with
+                p = await asyncio.create_subprocess_exec(  # pylint: disable=consider-using-with
+                    *cmd_ls, stdin=stdin, close_fds=False, env=self.env, cwd=self.cwd
+                )
 
             try:
                 exit_code = await p.wait()
@@ -2043,36 +2539,50 @@ class Podman:
         volumes = output.splitlines()
         return volumes
 
-    async def existing_containers(self, project_name: str) -> dict[str, ExistingContainer]:
-        output = await self.output(
-            [],
-            "ps",
-            [
-                "--filter",
-                f"label=io.podman.compose.project={project_name}",
-                "-a",
-                "--format",
-                "json",
-            ],
-        )
-
-        containers = json.loads(output)
-        return {
-            c.get("Names")[0]: ExistingContainer(
-                name=c.get("Names")[0],
-                id=c.get("Id"),
-                service_name=(
-                    c.get("Labels", {}).get("io.podman.compose.service", "")
-                    or c.get("Labels", {}).get("com.docker.compose.service", "")
-                ),
-                config_hash=c.get("Labels", {}).get("io.podman.compose.config-hash", ""),
-                image_id=c.get("ImageID", ""),
-                exited=c.get("Exited", False),
-                state=c.get("State", ""),
-                status=c.get("Status", ""),
+    async def existing_containers(
+        self, project_name: str, service_name: str | None = None
+    ) -> dict[str, ExistingContainer]:
+        filters = ["--filter", f"label=io.podman.compose.project={project_name}"]
+        if service_name is not None:
+            filters += ["--filter", f"label=com.docker.compose.service={service_name}"]
+        cmd_ls = [
+            self.podman_path,
+            *self.compose.get_podman_args("ps"),
+            *filters,
+            "-a",
+            "--no-trunc",
+            "--format",
+            PS_RECORD_FORMAT,
+        ]
+        containers = {}
+        async with self.semaphore:
+            log.info(str(cmd_ls))
+            p = await asyncio.create_subprocess_exec(
+                *cmd_ls,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                limit=PS_LINE_LIMIT,
+                env=self.env,
+                cwd=self.cwd,
             )
-            for c in containers
-        }
+            assert p.stdout is not None and p.stderr is not None
+            stderr = asyncio.ensure_future(p.stderr.read())
+            try:
+                # the records are parsed while podman is still listing
+                async for line in p.stdout:
+                    if line.strip():
+                        c = ExistingContainer.from_ps(ps_record(line))
+                        containers[c.name] = c
+                await p.wait()
+            finally:
+                if p.returncode is None:
+                    p.kill()
+                    await p.wait()
+                    stderr.cancel()
+        assert p.returncode is not None
+        if p.returncode != 0:
+            raise subprocess.CalledProcessError(p.returncode, " ".join(cmd_ls), stderr=await stderr)
+        return containers
 
 
 def normalize_service(service: dict[str, Any], sub_dir: str = "") -> dict[str, Any]:
@@ -2317,7 +2827,34 @@ def rec_merge(target: dict[str, Any], *sources: dict[str, Any]) -> dict[str, Any
     return ret
 
 
+# keys added to the compose model while parsing, which are not part of the compose file
+PARSE_ANNOTATION_KEYS = frozenset({
+    "_aliases",
+    "_config_hash",
+    "_deps",
+    "_dependents",
+    "_dirname",
+    "_vol",
+})
+
+
+def strip_parse_annotations(value: Any) -> Any:
+    """
+    return a copy of value without the keys added while parsing
+    """
+    if isinstance(value, dict):
+        return {
+            k: strip_parse_annotations(v)
+            for k, v in value.items()
+            if (k.value if isinstance(k, DependField) else k) not in PARSE_ANNOTATION_KEYS
+        }
+    if isinstance(value, list):
+        return [strip_parse_annotations(i) for i in value]
+    return value
+
+
 def load_yaml_or_die(file_path: str, stream: Any) -> dict[str, Any]:
+    register_yaml_tags()
     try:
         return yaml.safe_load(stream)
     except yaml.scanner.ScannerError as e:
@@ -2361,6 +2898,8 @@ def resolve_extends(
                 del from_service["extends"]
             except KeyError:
                 pass
+            # rec_merge() shares nested values, do not let the merge write into the base service
+            from_service = copy.deepcopy(from_service)
         new_service = rec_merge({}, from_service, service)
         services[name] = new_service
 
@@ -2368,7 +2907,7 @@ def resolve_extends(
 def dotenv_to_dict(dotenv_path: str) -> dict[str, str | None]:
     if not os.path.isfile(dotenv_path):
         return {}
-    return dotenv_values(dotenv_path)
+    return dotenv.dotenv_values(dotenv_path)
 
 
 COMPOSE_DEFAULT_LS = [
@@ -2429,11 +2968,23 @@ class PodmanCompose:
         self.podman: Podman
         self.podman_version: str | None = None
         self.environ: dict[str, str] = {}
+        # variables of a project run by `all`, set on top of the environment of podman-compose
+        self.project_environ: dict[str, str] = {}
         self.exit_code = None
         self.commands: dict[str, Any] = {}
         self.global_args = argparse.Namespace()
         self.project_name: str | None = None
+        # container of `exec` and `cp` found without parsing the compose files
+        self.resolved_container: str | None = None
+        self.resolved_environment: dict[str, Any] = {}
+        # socket of the `daemon` of the project and the answers of the daemon to `ps` and `up`
+        self.daemon_socket: str
+        self.daemon_containers: list[dict[str, Any]] | None = None
+        self.daemon_up_to_date = False
         self.dirname: str
+        # files the configuration was read from, watched by `watch`
+        self.compose_files: list[str] = []
+        self.dotenv_files: list[str] = []
         self.pods: list[Any]
         self.containers: list[Any] = []
         self.vols: dict[str, Any] | None = None
@@ -2446,8 +2997,10 @@ class PodmanCompose:
         self.all_services: set[Any] = set()
         self.prefer_volume_over_mount = True
         self.x_podman: dict[PodmanCompose.XPodmanSettingKey, Any] = {}
-        self.merged_yaml: Any
-        self.yaml_hash = ""
+        self._merged_compose: dict[str, Any] = {}
+        self._merged_yaml: str | None = None
+        self._yaml_hash: str | None = None
+        self.container_args_templates: dict[tuple[Any, ...], ContainerArgsTemplate] = {}
         self.console_colors = [
             "\x1b[1;32m",
             "\x1b[1;33m",
@@ -2456,7 +3009,7 @@ class PodmanCompose:
             "\x1b[1;36m",
         ]
 
-    def assert_services(self, services: dict[str, Any]) -> None:
+    def assert_services(self, services: str | Iterable[str]) -> None:
         if isinstance(services, str):
             services = [services]
         given = set(services or [])
@@ -2466,6 +3019,13 @@ class PodmanCompose:
             log.warning("missing services [%s]", missing_csv)
             sys.exit(1)
 
+    def getenv(self, name: str) -> str | None:
+        """
+        a variable of the environment the commands and podman run in
+        """
+        value = self.project_environ.get(name)
+        return value if value is not None else os.getenv(name)
+
     def get_podman_args(self, cmd: str) -> list[str]:
         xargs = []
         for args in self.global_args.podman_args:
@@ -2480,8 +3040,16 @@ class PodmanCompose:
     async def run(self, argv: list[str] | None = None) -> None:
         log.info("podman-compose version: %s", __version__)
         args = self._parse_args(argv)
-        podman_path = args.podman_path
-        if podman_path != "podman":
+        if len(args.project_directory) == 1:
+            try:
+                os.chdir(args.project_directory[0])
+            except OSError as e:
+                log.fatal("Could not change to the project directory: %s", e)
+                sys.exit(1)
+        # before parsing the compose files changes the working directory
+        self.daemon_socket = daemon_socket_path(args)
+        podman_path = args.podman_path
+        if podman_path != "podman":
             if os.path.isfile(podman_path) and os.access(podman_path, os.X_OK):
                 podman_path = os.path.realpath(podman_path)
             else:
@@ -2491,37 +3059,190 @@ class PodmanCompose:
                     sys.exit(1)
         self.podman = Podman(self, podman_path, args.dry_run, asyncio.Semaphore(args.parallel))
 
+        version_probe = None
+        binary_stat = None
         if not args.dry_run:
-            # just to make sure podman is running
-            try:
-                self.podman_version = (await self.podman.output(["--version"], "", [])).decode(
-                    "utf-8"
-                ).strip() or ""
-                self.podman_version = (self.podman_version.split() or [""])[-1]
-            except (subprocess.CalledProcessError, FileNotFoundError) as e:
-                msg = str(e)
-                if isinstance(e, subprocess.CalledProcessError) and e.output:
-                    msg += f": {e.output.decode('utf-8')}"
-                log.error("failed to check if podman is installed: %s", msg)
-                self.podman_version = None
-            if not self.podman_version:
-                log.fatal(
-                    "It seems that you either do not have `podman` installed "
-                    "or the `podman version` command failed."
-                )
-                sys.exit(1)
-            log.info("using podman version: %s", self.podman_version)
-        cmd_name = args.command
-        compose_required = cmd_name != "version" and (
-            cmd_name != "systemd" or args.action != "create-unit"
-        )
-        if compose_required:
-            self._parse_compose_file()
+            binary_stat = podman_binary_stat(podman_path)
+            self.podman_version = read_cached_podman_version(binary_stat)
+            if self.podman_version is None:
+                # just to make sure podman is running, the probe runs while compose files are parsed
+                version_probe = await self._start_podman_version_probe()
+                if version_probe is None:
+                    self._assert_podman_version()
+        try:
+            cmd_name = args.command
+            if len(args.project_directory) > 1:
+                # `all` parses every project and runs the command in it
+                cmd_name = "all"
+            compose_required = cmd_name not in ("version", "apply", "all") and (
+                cmd_name != "systemd" or args.action != "create-unit"
+            )
+            fan_out = getattr(args, "services", None) or getattr(args, "all_replicas", False)
+            if (
+                cmd_name in ("ps", "exec", "cp", "up", "logs")
+                and not args.dry_run
+                and not (cmd_name in ("exec", "cp") and fan_out)
+            ):
+                # a `daemon` of the project answers from memory
+                compose_required = compose_required and not await self._ask_daemon(args)
+            if (
+                cmd_name in ("exec", "cp")
+                and not args.dry_run
+                and not fan_out
+                and self.resolved_container is None
+            ):
+                # the container is looked up by its labels, without parsing the compose files
+                self.resolved_container = await self._resolve_container_fast(args)
+                compose_required = self.resolved_container is None
+            if compose_required:
+                self._parse_compose_file()
+            if version_probe is not None:
+                self.podman_version = await self._finish_podman_version_probe(version_probe)
+                if self.podman_version:
+                    write_cached_podman_version(binary_stat, self.podman_version)
+        finally:
+            if version_probe is not None and version_probe.returncode is None:
+                # parsing failed before the probe was read
+                version_probe.kill()
+                await version_probe.wait()
+        if not args.dry_run:
+            self._assert_podman_version()
         cmd = self.commands[cmd_name]
         retcode = await cmd(self, args)
         if isinstance(retcode, int):
             sys.exit(retcode)
 
+    async def _ask_daemon(self, args: argparse.Namespace) -> bool:
+        """
+        get what the command needs from the project from a running `daemon`, returns False if
+        there is none or the command needs the parsed project
+        """
+        ask = {
+            "ps": self._ask_daemon_ps,
+            "up": self._ask_daemon_up,
+            "logs": self._ask_daemon_logs,
+        }.get(args.command, self._ask_daemon_container)
+        return await ask(args)
+
+    async def _ask_daemon_ps(self, args: argparse.Namespace) -> bool:
+        if not args.quiet and args.format != "json":
+            return False
+        reply = await daemon_request(self.daemon_socket, {"method": "ps"})
+        if reply is None:
+            return False
+        self.daemon_containers = reply["containers"]
+        return True
+
+    async def _ask_daemon_up(self, args: argparse.Namespace) -> bool:
+        defaults = self.command_defaults("up")
+        options = {name for name, value in defaults.items() if getattr(args, name) != value}
+        if not args.detach or options - {"detach", "services", "no_deps", "no_color"}:
+            return False
+        reply = await daemon_request(
+            self.daemon_socket,
+            {"method": "up", "services": args.services, "no_deps": args.no_deps},
+        )
+        self.daemon_up_to_date = reply is not None and reply["up_to_date"]
+        return self.daemon_up_to_date
+
+    async def _ask_daemon_logs(
+        self,
+        args: argparse.Namespace,  # pylint: disable=unused-argument
+    ) -> bool:
+        reply = await daemon_request(self.daemon_socket, {"method": "logs"})
+        if reply is None:
+            return False
+        self.project_name = reply["project_name"]
+        self.container_names_by_service = reply["container_names_by_service"]
+        self.all_services = set(self.container_names_by_service)
+        self.containers = reply["containers"]
+        return True
+
+    async def _ask_daemon_container(self, args: argparse.Namespace) -> bool:
+        if args.command == "exec":
+            service = args.service
+        else:
+            try:
+                service = compose_cp_service(args)
+            except ValueError:
+                return False
+        reply = await daemon_request(
+            self.daemon_socket, {"method": "resolve", "service": service, "index": args.index}
+        )
+        if reply is None or reply["container"] is None:
+            return False
+        self.project_name = reply["project_name"]
+        self.resolved_container = reply["container"]
+        self.resolved_environment = reply["environment"]
+        return True
+
+    async def _resolve_container_fast(self, args: argparse.Namespace) -> str | None:
+        """
+        find the container of `exec` and `cp` with a label-filtered `podman ps`, only works if
+        the project name is given by `-p` or `COMPOSE_PROJECT_NAME` and `exec` needs no
+        environment from the compose files, returns None otherwise
+        """
+        project_name = args.project_name
+        if not project_name:
+            project_name = norm_re.sub("", os.environ.get("COMPOSE_PROJECT_NAME", ""))
+            if not project_name or "$" in os.environ["COMPOSE_PROJECT_NAME"]:
+                return None
+        if args.command == "exec":
+            service, index = args.service, args.index
+        else:
+            try:
+                service, index = compose_cp_service(args), args.index
+            except ValueError:
+                return None
+        try:
+            containers = await self.podman.existing_containers(project_name, service)
+        except (subprocess.CalledProcessError, OSError, ValueError) as e:
+            log.debug("could not look up the container of %s: %s", service, e)
+            return None
+        for c in containers.values():
+            if replica_number(project_name, c) == index:
+                if args.command == "exec" and c.has_environment:
+                    return None
+                log.debug("resolved %s[%d] to %s", service, index, c.name)
+                self.project_name = project_name
+                return c.name
+        return None
+
+    async def _start_podman_version_probe(self) -> asyncio.subprocess.Process | None:
+        """
+        spawn `podman --version` without waiting for it to finish,
+        returns None if podman could not be started
+        """
+        cmd_ls = [self.podman.podman_path, "--version"]
+        log.info(str(cmd_ls))
+        try:
+            return await asyncio.create_subprocess_exec(
+                *cmd_ls, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+        except FileNotFoundError as e:
+            log.error("failed to check if podman is installed: %s", e)
+            return None
+
+    async def _finish_podman_version_probe(self, p: asyncio.subprocess.Process) -> str | None:
+        stdout_data, stderr_data = await p.communicate()
+        if p.returncode != 0:
+            cmd = f"{self.podman.podman_path} --version"
+            msg = str(subprocess.CalledProcessError(p.returncode or 0, cmd, stderr_data))
+            if stderr_data:
+                msg += f": {stderr_data.decode('utf-8')}"
+            log.error("failed to check if podman is installed: %s", msg)
+            return None
+        return (stdout_data.decode("utf-8").split() or [""])[-1]
+
+    def _assert_podman_version(self) -> None:
+        if not self.podman_version:
+            log.fatal(
+                "It seems that you either do not have `podman` installed "
+                "or the `podman version` command failed."
+            )
+            sys.exit(1)
+        log.info("using podman version: %s", self.podman_version)
+
     def config_hash(self, service: dict[str, Any]) -> str:
         """
         Returns a hash of the service configuration.
@@ -2530,11 +3251,63 @@ class PodmanCompose:
         if "_config_hash" in service:
             return service["_config_hash"]
 
+        config_hash = self.base_config_hash(service)
+        # a changed environment secret recreates the containers it is mounted in
+        secret_hashes = {
+            secret_name: secret_content_hash(self, secret_name)
+            for secret_name in self.service_env_secrets(service)
+        }
+        if secret_hashes:
+            config_hash = config_hash_with_secrets(config_hash, secret_hashes)
+        service["_config_hash"] = config_hash
+        return service["_config_hash"]
+
+    def base_config_hash(self, service: dict[str, Any]) -> str:
+        """
+        the hash of the service configuration, without the values of its environment secrets
+        """
         # Use a stable representation of the service configuration
         jsonable_service = self.original_configuration(service)
         config_str = json.dumps(jsonable_service, sort_keys=True)
-        service["_config_hash"] = hashlib.sha256(config_str.encode('utf-8')).hexdigest()
-        return service["_config_hash"]
+        return hashlib.sha256(config_str.encode('utf-8')).hexdigest()
+
+    @property
+    def merged_yaml(self) -> str:
+        """
+        The merged compose model as YAML, dumped on first access.
+        Only `config` needs it, so other commands do not pay for the dump.
+        """
+        if self._merged_yaml is None:
+            register_yaml_tags()
+            self._merged_yaml = yaml.safe_dump(strip_parse_annotations(self._merged_compose))
+        return self._merged_yaml
+
+    @property
+    def yaml_hash(self) -> str:
+        """
+        A hash of the merged compose model, computed on first access.
+        """
+        if self._yaml_hash is None:
+            merged = strip_parse_annotations(self._merged_compose)
+            merged_json_b = json.dumps(
+                self.original_configuration(merged), separators=(",", ":")
+            ).encode("utf-8")
+            self._yaml_hash = hashlib.sha256(merged_json_b).hexdigest()
+        return self._yaml_hash
+
+    def service_env_secrets(self, service: dict[str, Any]) -> list[str]:
+        """
+        the names of the environment secrets mounted in the containers of the service
+        """
+        names = [
+            secret if isinstance(secret, str) else secret.get("source")
+            for secret in service.get("secrets", [])
+        ]
+        return sorted(
+            name
+            for name in set(names)
+            if name and (self.declared_secrets or {}).get(name, {}).get("environment")
+        )
 
     def original_configuration(self, configuration: dict[Any, Any]) -> dict[str, Any]:
         """
@@ -2724,16 +3497,19 @@ class PodmanCompose:
             # No --env-file specified: load the default .env from the
             # compose file's directory
             project_dotenv_file = os.path.realpath(os.path.join(dirname, ".env"))
+            self.dotenv_files = [project_dotenv_file]
             if os.path.exists(project_dotenv_file):
                 dotenv_dict.update(dotenv_to_dict(project_dotenv_file))
         else:
             # User-specified env files are resolved relative to the CWD
             # Later files override earlier ones
+            self.dotenv_files = []
             for env_file in args.env_file:
                 dotenv_path = os.path.realpath(env_file)
                 if not os.path.exists(dotenv_path):
                     log.fatal("Couldn't find env file: %s", dotenv_path)
                     sys.exit(1)
+                self.dotenv_files.append(dotenv_path)
                 dotenv_dict.update(dotenv_to_dict(dotenv_path))
 
         os.environ.update({
@@ -2885,6 +3661,11 @@ class PodmanCompose:
                 # Solution is to remove 'include' key from compose obj. This doesn't break
                 # having `include` present and correctly processed in included files
                 del compose["include"]
+        self.compose_files = [
+            os.path.realpath(filename)
+            for filename in files
+            if filename.strip().split('/')[-1] != '-'
+        ]
         resolved_services = self._resolve_profiles(
             compose.get("services") or {}, target, requested_profiles
         )
@@ -2892,14 +3673,14 @@ class PodmanCompose:
         if not getattr(args, "no_normalize", None):
             compose = normalize_final(compose, self.dirname)
         compose.pop("version", None)
-        self.merged_yaml = yaml.safe_dump(compose)
-        merged_json_b = json.dumps(
-            self.original_configuration(compose), separators=(",", ":")
-        ).encode("utf-8")
-        self.yaml_hash = hashlib.sha256(merged_json_b).hexdigest()
+        # merged_yaml and yaml_hash are derived from this lazily
+        self._merged_compose = compose
+        self.container_args_templates = {}
+        self._merged_yaml = None
+        self._yaml_hash = None
         compose["_dirname"] = dirname
         # debug mode
-        if len(files) > 1:
+        if len(files) > 1 and log.isEnabledFor(logging.DEBUG):
             log.debug(" ** merged:\n%s", json.dumps(self.original_configuration(compose), indent=2))
         # ver = compose.get('version')
 
@@ -2912,6 +3693,8 @@ class PodmanCompose:
             log.warning("WARNING: No services defined")
         # include services with no profile defined or the selected profiles
         services = self._resolve_profiles(services, target, requested_profiles)
+        # the keys added below must not leak into the merged model behind merged_yaml
+        services = {name: dict(srv) for name, srv in services.items()}
 
         # NOTE: maybe add "extends.service" to _deps at this stage
         flat_deps(services, with_extends=True)
@@ -2920,7 +3703,7 @@ class PodmanCompose:
         flat_deps(services)
 
         # networks: [...]
-        nets = compose.get("networks") or {}
+        nets = dict(compose.get("networks") or {})
         if not nets:
             nets["default"] = None
 
@@ -2960,7 +3743,11 @@ class PodmanCompose:
             missing_nets_str = ",".join(missing_nets)
             raise RuntimeError(f"missing networks: {missing_nets_str}")
         # volumes: [...]
-        self.vols = compose.get("volumes", {}) or {}
+        # fix_mount_dict() names the declarations in place, keep the merged model untouched
+        self.vols = {
+            vol_name: dict(vol) if isinstance(vol, dict) else vol
+            for vol_name, vol in (compose.get("volumes", {}) or {}).items()
+        }
         podman_compose_labels = [
             "io.podman.compose.project=" + project_name,
             "io.podman.compose.version=" + __version__,
@@ -2975,13 +3762,18 @@ class PodmanCompose:
         given_containers = []
         container_names_by_service: dict[str, list[str]] = {}
         self.services = services
+        # `up --scale SERVICE=NUM` or `scale SERVICE=NUM [SERVICE=NUM...]`
+        scale_args = args.scale if "scale" in args and args.scale is not None else []
+        scale_overrides = dict(
+            scale_arg.split("=", 1)
+            for scale_arg in ([scale_args] if isinstance(scale_args, str) else scale_args)
+            if "=" in scale_arg
+        )
         for service_name, service_desc in services.items():
             replicas = 1
-            if "scale" in args and args.scale is not None:
+            if service_name in scale_overrides:
                 # Check `--scale` args from CLI command
-                scale_args = args.scale.split('=')
-                if service_name == scale_args[0]:
-                    replicas = try_int(scale_args[1], fallback=1)
+                replicas = try_int(scale_overrides[service_name], fallback=1)
             elif "scale" in service_desc:
                 # Check `scale` value from compose yaml file
                 replicas = try_int(service_desc.get("scale"), fallback=1)
@@ -2994,6 +3786,35 @@ class PodmanCompose:
                 # Note: All conditions are necessary to handle case
                 replicas = try_int(service_desc.get("deploy", {}).get("replicas"), fallback=1)
 
+            # everything but the replica specific fields is shared by all replicas of a service
+            service_cnt = {"pod": pod_name, "service_name": service_name, **service_desc}
+            x_podman = service_desc.get("x-podman")
+            rootfs_mode = x_podman is not None and x_podman.get("rootfs") is not None
+            if "image" not in service_cnt and not rootfs_mode:
+                service_cnt["image"] = self.format_name(service_name)
+            service_cnt["ports"] = norm_ports(service_cnt.get("ports"))
+            service_cnt["_service"] = service_name
+            service_cnt["_project"] = project_name
+            labels_head = norm_as_list(service_cnt.get("labels"))
+            labels_head.extend(podman_compose_labels)
+            labels_head.append(f"io.podman.compose.config-hash={self.config_hash(service_desc)}")
+            labels_tail = [
+                f"io.podman.compose.service={service_name}",
+                f"com.docker.compose.service={service_name}",
+            ]
+            if not service_cnt.get("environment") and not service_cnt.get("env_file"):
+                # `exec` has no environment to pass and can skip parsing the compose files
+                labels_tail.append("io.podman.compose.environment=none")
+            for volume in service_cnt.get("volumes", []):
+                mnt_dict = get_mnt_dict(self, service_cnt, volume)
+                if (
+                    mnt_dict.get("type") == "volume"
+                    and mnt_dict["source"]
+                    and mnt_dict["source"] not in self.vols  # type: ignore[operator]
+                ):
+                    vol_name = mnt_dict["source"]
+                    raise RuntimeError(f"volume [{vol_name}] not defined in top level")
+
             container_names_by_service[service_name] = []
             for num in range(1, replicas + 1):
                 name0 = self.format_name(service_name, str(num))
@@ -3008,41 +3829,18 @@ class PodmanCompose:
                     log_prefix = f"{service_name}_{num}"
                 container_names_by_service[service_name].append(name)
                 # log(service_name,service_desc)
-                cnt = {
-                    "pod": pod_name,
-                    "name": name,
-                    "num": num,
-                    "service_name": service_name,
-                    "log_prefix": log_prefix,
-                    **service_desc,
-                }
-                x_podman = service_desc.get("x-podman")
-                rootfs_mode = x_podman is not None and x_podman.get("rootfs") is not None
-                if "image" not in cnt and not rootfs_mode:
-                    cnt["image"] = self.format_name(service_name)
-                labels = norm_as_list(cnt.get("labels"))
-                cnt["ports"] = norm_ports(cnt.get("ports"))
-                labels.extend(podman_compose_labels)
-                labels.extend([
-                    f"io.podman.compose.config-hash={self.config_hash(service_desc)}",
-                    f"com.docker.compose.container-number={num}",
-                    f"io.podman.compose.service={service_name}",
-                    f"com.docker.compose.service={service_name}",
-                ])
-                cnt["labels"] = labels
-                cnt["_service"] = service_name
-                cnt["_project"] = project_name
+                cnt = ServiceContainer(
+                    service_cnt,
+                    name=name,
+                    num=num,
+                    log_prefix=log_prefix,
+                    labels=[
+                        *labels_head,
+                        f"com.docker.compose.container-number={num}",
+                        *labels_tail,
+                    ],
+                )
                 given_containers.append(cnt)
-                volumes = cnt.get("volumes", [])
-                for volume in volumes:
-                    mnt_dict = get_mnt_dict(self, cnt, volume)
-                    if (
-                        mnt_dict.get("type") == "volume"
-                        and mnt_dict["source"]
-                        and mnt_dict["source"] not in self.vols  # type: ignore[operator]
-                    ):
-                        vol_name = mnt_dict["source"]
-                        raise RuntimeError(f"volume [{vol_name}] not defined in top level")
         self.container_names_by_service = container_names_by_service
         self.all_services = set(container_names_by_service.keys())
         container_by_name = {c["name"]: c for c in given_containers}
@@ -3122,12 +3920,14 @@ class PodmanCompose:
                     target_image = "localhost/" + self.format_name(target_service_name)
 
                 # Replace the context with the docker image reference
-                image_url = "docker://" + quote(target_image)
+                image_url = "docker://" + urllib_parse.quote(target_image)
                 processed.append(f"{context_name}={image_url}")
                 deps.add(target_service_name)
 
-            service["build"]["additional_contexts"] = processed
-            service["build"]["build_deps"] = sorted(list(deps))
+            # copy, the build section is shared with the merged compose model
+            service["build"] = dict(
+                service["build"], additional_contexts=processed, build_deps=sorted(list(deps))
+            )
 
         # Verify that there are no (possibly recursive) circular dependencies between services
         def check_circular(current: str, path: list[str]) -> None:
@@ -3146,16 +3946,46 @@ class PodmanCompose:
         for service_name in services:
             check_circular(service_name, [])
 
-    def _parse_args(self, argv: list[str] | None = None) -> argparse.Namespace:
+    def command_defaults(self, cmd_name: str) -> dict[str, Any]:
+        """
+        the default values of the options of a command, to run it from another command
+        """
+        parser = argparse.ArgumentParser(add_help=False)
+        for cmd_parser in self.commands[cmd_name]._parse_args:  # pylint: disable=protected-access
+            cmd_parser(parser)
+        return vars(parser.parse_args([]))
+
+    def _parse_args(
+        self, argv: list[str] | None = None, namespace: argparse.Namespace | None = None
+    ) -> argparse.Namespace:
+        """
+        the global options and those of the command, options missing from argv keep their value
+        in the namespace if given
+        """
         parser = argparse.ArgumentParser(formatter_class=argparse.RawTextHelpFormatter)
         self._init_global_parser(parser)
         subparsers = parser.add_subparsers(title="command", dest="command")
         _ = subparsers.add_parser("help", help="show help")
+        # Every command is listed, but building all their options is slow. The first pass
+        # only finds out which command is run, then the options of that command are added.
+        # -h is also added later, so that `<command> -h` does not exit in the first pass.
         for cmd_name, cmd in self.commands.items():
-            subparser = subparsers.add_parser(cmd_name, help=cmd.help, description=cmd.desc)  # pylint: disable=protected-access
-            for cmd_parser in cmd._parse_args:  # pylint: disable=protected-access
+            subparsers.add_parser(cmd_name, help=cmd.help, description=cmd.desc, add_help=False)
+        cmd_name = parser.parse_known_args(argv)[0].command
+        if cmd_name in self.commands:
+            subparser = subparsers.choices[cmd_name]
+            subparser.add_argument(
+                "-h",
+                "--help",
+                action="help",
+                default=argparse.SUPPRESS,
+                help="show this help message and exit",
+            )
+            for cmd_parser in self.commands[cmd_name]._parse_args:  # pylint: disable=protected-access
                 cmd_parser(subparser)
-        self.global_args = parser.parse_args(argv)
+        self.global_args = parser.parse_args(argv, namespace)
+        if cmd_name == "exec":
+            self._check_exec_service(subparsers.choices[cmd_name])
 
         compose_env_files = os.environ.get("COMPOSE_ENV_FILES")
         if not self.global_args.env_file and compose_env_files:
@@ -3170,6 +4000,22 @@ class PodmanCompose:
         logging.basicConfig(level=("DEBUG" if self.global_args.verbose else "WARN"))
         return self.global_args
 
+    def _check_exec_service(self, parser: argparse.ArgumentParser) -> None:
+        """
+        `exec` takes a service argument unless --services is given, then the first word is
+        the command
+        """
+        args = self.global_args
+        if not args.services:
+            if args.service is None:
+                parser.error("the following arguments are required: service")
+            return
+        if args.service is not None:
+            args.cnt_command = [args.service, *args.cnt_command]
+            args.service = None
+        if not args.cnt_command:
+            parser.error("a command is required with --services")
+
     @staticmethod
     def _init_global_parser(parser: argparse.ArgumentParser) -> None:
         parser.add_argument("-v", "--version", help="show version", action="store_true")
@@ -3214,6 +4060,14 @@ class PodmanCompose:
             action="append",
             default=[],
         )
+        parser.add_argument(
+            "--project-directory",
+            help="Run in the given project directory, repeat it to run the command in every\n"
+            "project at once",
+            metavar="dir",
+            action="append",
+            default=[],
+        )
         parser.add_argument(
             "-p",
             "--project-name",
@@ -3408,6 +4262,113 @@ async def compose_wait(
     compose.podman.exec([], "wait", cmd_args)
 
 
+# compose restart policies to the Restart= of the systemd service, which takes over restarting
+SYSTEMD_RESTART = {
+    "no": "no",
+    "always": "always",
+    "unless-stopped": "always",
+    "on-failure": "on-failure",
+}
+
+
+def service_dependencies(compose: PodmanCompose, service_name: str) -> tuple[list[str], list[str]]:
+    """
+    the services the service directly requires and the ones it only wants, from its depends_on
+    and links
+    """
+    service = compose.services[service_name]
+    requires: list[str] = []
+    wants: list[str] = []
+    links = [link.split(":")[0] for link in service.get("links", [])]
+    dependencies = {**dict.fromkeys(links, {}), **service.get("depends_on", {})}
+    for dep_name, dep in sorted(dependencies.items()):
+        if dep_name not in compose.container_names_by_service:
+            continue
+        (requires if dep.get("required", True) else wants).append(dep_name)
+    return requires, wants
+
+
+def dependency_conditions(compose: PodmanCompose) -> dict[str, set[str]]:
+    """
+    the conditions the dependents of each service wait for
+    """
+    conditions: dict[str, set[str]] = {}
+    for service in compose.services.values():
+        for dep_name, dep in service.get("depends_on", {}).items():
+            conditions.setdefault(dep_name, set()).add(dep.get("condition", "service_started"))
+    return conditions
+
+
+def systemd_units(compose: PodmanCompose, podman_cmd: str) -> dict[str, str]:
+    """
+    a unit per container running it with `podman start -a`, ordered after the units of the
+    services it depends on, and a target wanting all of them, by file name; the units are
+    prefixed with the project so they do not clash with those of `podman generate systemd`
+    """
+    assert compose.project_name is not None
+    prefix = f"podman-compose-{compose.project_name}"
+    target = f"{prefix}.target"
+
+    def unit_names(service: str) -> list[str]:
+        return [f"{prefix}-{name}.service" for name in compose.container_names_by_service[service]]
+
+    conditions = dependency_conditions(compose)
+    units = {}
+    for cnt in compose.containers:
+        name, service_name = cnt["name"], cnt["_service"]
+        required_services, wanted_services = service_dependencies(compose, service_name)
+        requires = [unit for dep in required_services for unit in unit_names(dep)]
+        wants = [unit for dep in wanted_services for unit in unit_names(dep)]
+        timeout = str_to_seconds(cnt.get("stop_grace_period", STOP_GRACE_PERIOD))
+        service_lines = ["Environment=PODMAN_SYSTEMD_UNIT=%n"]
+        if "service_completed_successfully" in conditions.get(service_name, ()):
+            # the dependents start once it exited successfully
+            service_lines += ["Type=oneshot", "RemainAfterExit=yes"]
+        else:
+            restart = str(cnt.get("restart", "no")).split(":", maxsplit=1)[0]
+            service_lines += ["Type=simple", f"Restart={SYSTEMD_RESTART.get(restart, 'no')}"]
+        service_lines.append(f"ExecStart={podman_cmd} start -a {name}")
+        if "service_healthy" in conditions.get(service_name, ()):
+            service_lines.append(f"ExecStartPost={podman_cmd} wait --condition=healthy {name}")
+        if timeout is not None:
+            service_lines.append(f"ExecStop={podman_cmd} stop -t {timeout} {name}")
+            service_lines.append(f"TimeoutStopSec={timeout + 30}")
+        else:
+            service_lines.append(f"ExecStop={podman_cmd} stop {name}")
+        unit_lines = [
+            f"Description={service_name} of the {compose.project_name} project (podman-compose)",
+            f"PartOf={target}",
+            f"After={' '.join(['network-online.target', *requires, *wants])}",
+            "Wants=network-online.target",
+        ]
+        if requires:
+            unit_lines.append(f"Requires={' '.join(requires)}")
+        if wants:
+            unit_lines.append(f"Wants={' '.join(wants)}")
+        units[f"{prefix}-{name}.service"] = "\n".join([
+            "[Unit]",
+            *unit_lines,
+            "",
+            "[Service]",
+            *service_lines,
+            "",
+        ])
+    all_units = [unit for service in compose.services for unit in unit_names(service)]
+    units[target] = "\n".join([
+        "[Unit]",
+        f"Description={compose.project_name} project (podman-compose)",
+        f"Wants={' '.join(all_units)}",
+        "",
+        "[Install]",
+        "WantedBy=default.target",
+        "",
+    ])
+    return units
+
+
+SYSTEMD_STACKS_DIR = ".config/containers/compose/projects"
+
+
 @cmd_run(podman_compose, "systemd")
 async def compose_systemd(compose: PodmanCompose, args: argparse.Namespace) -> None:
     """
@@ -3417,7 +4378,7 @@ async def compose_systemd(compose: PodmanCompose, args: argparse.Namespace) -> N
     later you can add a compose stack by running `podman-compose systemd -a register`
     then you can start/stop your stack with `systemctl --user start podman-compose@<PROJ>`
     """
-    stacks_dir = ".config/containers/compose/projects"
+    stacks_dir = SYSTEMD_STACKS_DIR
     if args.action == "register":
         proj_name = compose.project_name
         fn = os.path.expanduser(f"~/{stacks_dir}/{proj_name}.env")
@@ -3479,6 +4440,33 @@ you can stop and disable the service with:
         ls = glob.glob(os.path.expanduser(f"~/{stacks_dir}/*.env"))
         for i in ls:
             print(os.path.basename(i[:-4]))
+    elif args.action == "generate-units":
+        podman_path = compose.podman.podman_path
+        podman_cmd = podman_path if os.path.isabs(podman_path) else f"/usr/bin/env {podman_path}"
+        units = systemd_units(compose, podman_cmd)
+        if args.dry_run:
+            for fn, unit in units.items():
+                print(f"# {fn}\n{unit}")
+            return
+        unit_dir = os.path.expanduser(args.unit_dir)
+        os.makedirs(unit_dir, exist_ok=True)
+        for fn, unit in units.items():
+            log.debug("writing [%s]: ...", os.path.join(unit_dir, fn))
+            with open(os.path.join(unit_dir, fn), "w", encoding="utf-8") as f:
+                f.write(unit)
+        target = f"podman-compose-{compose.project_name}.target"
+        print(
+            f"""
+wrote {len(units)} units to {unit_dir}, the containers have to be created once with:
+
+\t\tpodman-compose up --no-start
+
+then the services start in parallel in the order of their dependencies with:
+
+\t\tsystemctl --user daemon-reload
+\t\tsystemctl --user enable --now '{target}'
+"""
+        )
     elif args.action == "create-unit":
         fn = "/etc/systemd/user/podman-compose@.service"
         out = f"""\
@@ -3513,1021 +4501,3509 @@ while in your project type `podman-compose systemd -a register`
             log.warning("Could not write to [%s], use 'sudo'", fn)
 
 
-@cmd_run(podman_compose, "pull", "pull stack images")
-async def compose_pull(compose: PodmanCompose, args: argparse.Namespace) -> int | None:
-    img_containers = [cnt for cnt in compose.containers if "image" in cnt]
-    if args.services:
-        services = set(args.services)
-        img_containers = [cnt for cnt in img_containers if cnt["_service"] in services]
-    images = {cnt["image"] for cnt in img_containers}
-    if not args.force_local:
-        local_images = {cnt["image"] for cnt in img_containers if is_local(cnt)}
-        images -= local_images
-    status = 0
-    statuses = await asyncio.gather(*[compose.podman.run([], "pull", [image]) for image in images])
-    for s in statuses:
-        if s is not None and s != 0:
-            status = s
-    return status
+# `podman run` options with a key of their own in Quadlet .container files, the others are
+# passed with PodmanArgs=, see podman-systemd.unit(5)
+QUADLET_CONTAINER_KEYS = {
+    "--name": "ContainerName",
+    "--rootfs": "Rootfs",
+    "--label": "Label",
+    "--annotation": "Annotation",
+    "-e": "Environment",
+    "-v": "Volume",
+    "--mount": "Mount",
+    "--tmpfs": "Tmpfs",
+    "--network": "Network",
+    "-p": "PublishPort",
+    "--expose": "ExposeHostPort",
+    "--hostname": "HostName",
+    "--add-host": "AddHost",
+    "--dns": "DNS",
+    "--dns-opt": "DNSOption",
+    "--dns-search": "DNSSearch",
+    "--cap-add": "AddCapability",
+    "--cap-drop": "DropCapability",
+    "--device": "AddDevice",
+    "--sysctl": "Sysctl",
+    "--shm-size": "ShmSize",
+    "--userns": "UserNS",
+    "-w": "WorkingDir",
+    "--stop-timeout": "StopTimeout",
+    "--read-only": "ReadOnly",
+    "--init": "RunInit",
+}
+
+QUADLET_NETWORK_KEYS = {
+    "--label": "Label",
+    "--driver": "Driver",
+    "--opt": "Options",
+    "--internal": "Internal",
+    "--ipv6": "IPv6",
+    "--ipam-driver": "IPAMDriver",
+    "--disable-dns": "DisableDNS",
+    "--dns": "DNS",
+    "--subnet": "Subnet",
+    "--gateway": "Gateway",
+    "--ip-range": "IPRange",
+}
+
+QUADLET_VOLUME_KEYS = {"--label": "Label", "--driver": "Driver"}
+
+QUADLET_POD_KEYS = {"--name": "PodName", "-p": "PublishPort"}
+
+# keys whose values Quadlet splits into words like a command line
+QUADLET_WORD_KEYS = {
+    "Label",
+    "Annotation",
+    "Environment",
+    "AddCapability",
+    "DropCapability",
+    "Sysctl",
+    "Exec",
+    "PodmanArgs",
+}
+
+
+# the options without a value in the podman commands of container_to_args,
+# get_network_create_args, get_volume_create_args and get_pod_create_args
+PODMAN_FLAGS_WITHOUT_VALUE = frozenset({
+    "-d",
+    "-i",
+    "-P",
+    "--tty",
+    "--privileged",
+    "--read-only",
+    "--init",
+    "--no-healthcheck",
+    "--no-hosts",
+    "--internal",
+    "--ipv6",
+    "--disable-dns",
+})
+
+
+def split_podman_options(args: list[str]) -> list[tuple[str, str | None, list[str]]]:
+    """
+    the flag, value and words of each option of a podman command line generated by
+    podman-compose, the flags but PODMAN_FLAGS_WITHOUT_VALUE take the next word as their value
+    """
+    options = []
+    i = 0
+    while i < len(args):
+        flag, value, words = args[i], None, args[i : i + 1]
+        if flag.startswith("--") and "=" in flag:
+            flag, value = flag.split("=", 1)
+        elif flag not in PODMAN_FLAGS_WITHOUT_VALUE and i + 1 < len(args):
+            value, words = args[i + 1], args[i : i + 2]
+            i += 1
+        options.append((flag, value, words))
+        i += 1
+    return options
 
 
-@cmd_run(podman_compose, "push", "push stack images")
-async def compose_push(compose: PodmanCompose, args: argparse.Namespace) -> int | None:
-    services = set(args.services)
-    status = 0
-    for cnt in compose.containers:
-        if "build" not in cnt:
-            continue
-        if services and cnt["_service"] not in services:
-            continue
-        s = await compose.podman.run([], "push", [cnt["image"]])
-        if s is not None and s != 0:
-            status = s
-    return status
+def quadlet_value(value: str, words: bool = False) -> str:
+    """
+    escape the specifiers and variables systemd expands in the value of a key, quoting it when
+    the key is split into words
+    """
+    value = value.replace("%", "%%").replace("$", "$$")
+    if words and (not value or re.search(r"[\s\"'\\]", value)):
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        value = f'"{value}"'
+    return value
 
 
-def is_context_git_url(path: str) -> bool:
-    r = urllib.parse.urlparse(path)
-    if r.scheme in ('git', 'http', 'https', 'ssh', 'file', 'rsync'):
-        return True
-    # URL contains a ":" character, a hint of a valid URL
-    # But also detects windows file paths (e.g. "C:\path\to\contextdir") as urls
-    is_path_with_drive_letter = (
-        (os.path.isabs(path) or secondarypathisabs(path))
-        and len(path) > 2
-        and path[1] == ':'
-        and path[2] in ('\\', '/')
+def quadlet_keys(
+    options: list[tuple[str, str | None, list[str]]], keys: dict[str, str]
+) -> list[str]:
+    """
+    the lines of the podman options with a key, followed by PodmanArgs= with the others
+    """
+    lines = []
+    podman_args: list[str] = []
+    for flag, value, words in options:
+        key = keys.get(flag)
+        if key is None:
+            podman_args.extend(words)
+        elif value is None:
+            lines.append(f"{key}=true")
+        else:
+            lines.append(f"{key}={quadlet_value(value, key in QUADLET_WORD_KEYS)}")
+    if podman_args:
+        lines.append("PodmanArgs=" + " ".join(quadlet_value(arg, True) for arg in podman_args))
+    return lines
+
+
+def quadlet_pod(compose: PodmanCompose, pod: dict[str, Any]) -> str:
+    options = []
+    for flag, value, words in split_podman_options(get_pod_create_args(compose, pod)[1:]):
+        if flag == "--infra":
+            log.warning("Quadlet pods always have an infra container, ignoring %s", " ".join(words))
+            continue
+        options.append((flag, value, words))
+    return "\n".join([
+        "[Unit]",
+        f"Description=pod of the {compose.project_name} project (podman-compose)",
+        "",
+        "[Pod]",
+        *quadlet_keys(options, QUADLET_POD_KEYS),
+        "",
+    ])
+
+
+async def quadlet_files(compose: PodmanCompose) -> dict[str, str]:
+    """
+    Quadlet .container, .network, .volume and .pod files of the project by file name, the
+    containers run with the arguments of `up` and start after the units of their dependencies
+    """
+    assert compose.project_name is not None
+    conditions = dependency_conditions(compose)
+    networks: dict[str, dict[str, Any]] = {}
+    volumes: dict[str, dict[str, Any]] = {}
+    files = {f"{pod['name']}.pod": quadlet_pod(compose, pod) for pod in compose.pods}
+    for cnt in compose.containers:
+        name, service_name = cnt["name"], cnt["_service"]
+        podman_args = await container_to_args(
+            compose, cnt, detached=False, no_deps=True, create_resources=False
+        )
+        command = container_command(cnt)
+        image = [cnt["image"]] if cnt.get("x-podman.rootfs") is None else []
+        options = split_podman_options(podman_args[: len(podman_args) - len(command) - len(image)])
+
+        required_services, wanted_services = service_dependencies(compose, service_name)
+        requires = [
+            f"{dep_name}.service"
+            for dep in required_services
+            for dep_name in compose.container_names_by_service[dep]
+        ]
+        wants = [
+            f"{dep_name}.service"
+            for dep in wanted_services
+            for dep_name in compose.container_names_by_service[dep]
+        ]
+        for net_desc, net_name, is_ext in get_cnt_nets(compose, cnt):
+            if not is_ext:
+                networks[net_name] = net_desc
+                requires.append(f"{net_name}-network.service")
+        for volume in cnt.get("volumes", []):
+            mount_dict = get_mnt_dict(compose, cnt, volume)
+            vol = mount_dict.get("_vol")
+            if mount_dict["type"] == "volume" and vol and not vol.get("external"):
+                volumes[vol["name"]] = vol
+                requires.append(f"{vol['name']}-volume.service")
+
+        unit_lines = [
+            f"Description={service_name} of the {compose.project_name} project (podman-compose)"
+        ]
+        if requires or wants:
+            unit_lines.append(f"After={' '.join(requires + wants)}")
+        if requires:
+            unit_lines.append(f"Requires={' '.join(requires)}")
+        if wants:
+            unit_lines.append(f"Wants={' '.join(wants)}")
+        container_lines = [f"Image={quadlet_value(image[0])}"] if image else []
+        service_lines = []
+        if "service_completed_successfully" in conditions.get(service_name, ()):
+            # the dependents start once it exited successfully
+            service_lines += ["Type=oneshot", "RemainAfterExit=yes"]
+        elif cnt.get("restart") is not None:
+            restart = str(cnt["restart"]).split(":", maxsplit=1)[0]
+            service_lines.append(f"Restart={SYSTEMD_RESTART.get(restart, 'no')}")
+        timeout = str_to_seconds(cnt.get("stop_grace_period", STOP_GRACE_PERIOD))
+        if timeout is not None:
+            service_lines.append(f"TimeoutStopSec={timeout + 30}")
+        container_lines += [f"Pod={value}.pod" for flag, value, _ in options if flag == "--pod"]
+        # the service restarts the container, which Quadlet labels with its own unit
+        container_lines += quadlet_keys(
+            [
+                (flag, value, words)
+                for flag, value, words in options
+                if flag not in ("--pod", "--restart")
+                and not (flag == "--label" and str(value).startswith("PODMAN_SYSTEMD_UNIT="))
+            ],
+            QUADLET_CONTAINER_KEYS,
+        )
+        if command:
+            container_lines.append("Exec=" + " ".join(quadlet_value(arg, True) for arg in command))
+        if "service_healthy" in conditions.get(service_name, ()):
+            # the dependents start once it is healthy
+            container_lines.append("Notify=healthy")
+        files[f"{name}.container"] = "\n".join([
+            "[Unit]",
+            *unit_lines,
+            "",
+            "[Container]",
+            *container_lines,
+            "",
+            "[Service]",
+            *service_lines,
+            "",
+            "[Install]",
+            "WantedBy=default.target",
+            "",
+        ])
+    for net_name, net_desc in networks.items():
+        args = get_network_create_args(net_desc, compose.project_name, net_name)
+        files[f"{net_name}.network"] = "\n".join([
+            "[Network]",
+            f"NetworkName={net_name}",
+            *quadlet_keys(split_podman_options(args[1:-1]), QUADLET_NETWORK_KEYS),
+            "",
+        ])
+    for vol_name, vol in volumes.items():
+        args = get_volume_create_args(vol, compose.project_name, vol_name)
+        files[f"{vol_name}.volume"] = "\n".join([
+            "[Volume]",
+            f"VolumeName={vol_name}",
+            *quadlet_keys(split_podman_options(args[1:-1]), QUADLET_VOLUME_KEYS),
+            "",
+        ])
+    return files
+
+
+@cmd_run(podman_compose, "quadlet", "generate Quadlet units of the project")
+async def compose_quadlet(compose: PodmanCompose, args: argparse.Namespace) -> None:
+    files = await quadlet_files(compose)
+    if args.dry_run:
+        for fn, content in files.items():
+            print(f"# {fn}\n{content}")
+        return
+    output = os.path.expanduser(args.output)
+    os.makedirs(output, exist_ok=True)
+    for fn, content in files.items():
+        log.debug("writing [%s]: ...", os.path.join(output, fn))
+        with open(os.path.join(output, fn), "w", encoding="utf-8") as f:
+            f.write(content)
+    units = " ".join(
+        f"'{fn.rsplit('.', 1)[0]}.service'" for fn in files if fn.endswith(".container")
     )
-    if r.scheme != "" and r.netloc == "" and r.path != "" and not is_path_with_drive_letter:
-        return True
-    if r.scheme == "":  # tweak path URL to get username from url parser
-        r = urllib.parse.urlparse("ssh://" + path)
-        if r.username is not None and r.username != "":
-            return True
-    return False
+    print(
+        f"""
+wrote {len(files)} files to {output}, the containers start at boot, or right away with:
 
+\t\tsystemctl --user daemon-reload
+\t\tsystemctl --user start {units}
+"""
+    )
 
-def adjust_build_ssh_key_paths(compose: PodmanCompose, agent_or_key: str) -> str:
-    # when using a custom id for ssh property, path to a local SSH key is provided after "="
-    parts = agent_or_key.split("=", 1)
-    if len(parts) == 1:
-        return agent_or_key
-    name, path = parts
-    path = os.path.expanduser(path)
-    return name + "=" + os.path.join(compose.dirname, path)
 
+# compose restart policies to the restartPolicy of the pod
+KUBE_RESTART_POLICY = {
+    "no": "Never",
+    "always": "Always",
+    "unless-stopped": "Always",
+    "on-failure": "OnFailure",
+}
+
+KUBE_PULL_POLICY = {
+    "always": "Always",
+    "never": "Never",
+    "missing": "IfNotPresent",
+    "if_not_present": "IfNotPresent",
+}
+
+# the options of named volumes podman kube play reads from the annotations of their claim
+KUBE_VOLUME_ANNOTATIONS = {
+    "type": "volume.podman.io/type",
+    "device": "volume.podman.io/device",
+    "o": "volume.podman.io/mount-options",
+}
+
+# the keys of the containers KubeExport maps, or which podman-compose adds when parsing
+KUBE_SERVICE_KEYS = {
+    "name",
+    "num",
+    "log_prefix",
+    "pod",
+    "service_name",
+    "_service",
+    "_project",
+    "_aliases",
+    "_deps",
+    "profiles",
+    "image",
+    "build",
+    "pull_policy",
+    "entrypoint",
+    "command",
+    "environment",
+    "env_file",
+    "labels",
+    "ports",
+    "expose",
+    "volumes",
+    "tmpfs",
+    "secrets",
+    "healthcheck",
+    "restart",
+    "stop_grace_period",
+    "user",
+    "working_dir",
+    "cap_add",
+    "cap_drop",
+    "privileged",
+    "read_only",
+    "tty",
+    "stdin_open",
+    "mem_limit",
+    "mem_reservation",
+    "cpus",
+    "deploy",
+    "scale",
+    "depends_on",
+    "links",
+    "networks",
+    "network_mode",
+    "container_name",
+}
+
+
+def kube_name(*parts: str) -> str:
+    """
+    the parts joined into a name Kubernetes accepts for objects, containers and volumes
+    """
+    name = re.sub(r"[^a-z0-9-]+", "-", "-".join(parts).lower()).strip("-")
+    return name[:63].rstrip("-")
 
-def container_to_build_args(
-    compose: PodmanCompose,
-    cnt: dict[str, Any],
-    args: argparse.Namespace,
-    path_exists: Callable[[str], bool],
-    cleanup_callbacks: list[Callable] | None = None,
-) -> list[str]:
-    build_desc = cnt["build"]
-    if not hasattr(build_desc, "items"):
-        build_desc = {"context": build_desc}
-    ctx = build_desc.get("context", ".")
-    dockerfile = build_desc.get("dockerfile", "")
-    dockerfile_inline = build_desc.get("dockerfile_inline")
-    if dockerfile_inline is not None:
-        dockerfile_inline = str(dockerfile_inline)
-        # Error if both `dockerfile_inline` and `dockerfile` are set
-        if dockerfile and dockerfile_inline:
-            raise OSError("dockerfile_inline and dockerfile can't be used simultaneously")
-        dockerfile = tempfile.NamedTemporaryFile(delete=False, suffix=".containerfile")
-        dockerfile.write(dockerfile_inline.encode())
-        dockerfile.close()
-        dockerfile = dockerfile.name
 
-        def cleanup_temp_dockfile() -> None:
-            if os.path.exists(dockerfile):
-                os.remove(dockerfile)
+def kube_memory(value: Any) -> str | None:
+    """
+    a compose byte value like 512m as a Kubernetes quantity like 512Mi
+    """
+    match = re.fullmatch(r"(\d+)\s*([kmgt]?)b?", str(value).strip().lower())
+    if not match:
+        return None
+    number, unit = match.groups()
+    return number + (f"{unit.upper()}i" if unit else "")
 
-        if cleanup_callbacks is not None:
-            cleanup_callbacks.append(cleanup_temp_dockfile)
 
-    build_args = []
-    # if given context was not recognized as git url, try joining paths to get a file locally
-    if not is_context_git_url(ctx):
-        custom_dockerfile_given = False
-        if dockerfile:
-            dockerfile = os.path.join(ctx, dockerfile)
-            custom_dockerfile_given = True
-        else:
-            dockerfile_alts = [
-                "Containerfile",
-                "ContainerFile",
-                "containerfile",
-                "Dockerfile",
-                "DockerFile",
-                "dockerfile",
-            ]
-            for dockerfile in dockerfile_alts:
-                dockerfile = os.path.join(ctx, dockerfile)
-                if path_exists(dockerfile):
-                    break
+def kube_probe(healthcheck: dict[str, Any]) -> dict[str, Any] | None:
+    test = healthcheck.get("test")
+    if healthcheck.get("disable") or not test or test == ["NONE"]:
+        return None
+    if isinstance(test, str):
+        command = ["/bin/sh", "-c", test]
+    elif test[0] == "CMD-SHELL":
+        command = ["/bin/sh", "-c", " ".join(test[1:])]
+    elif test[0] == "CMD":
+        command = [str(arg) for arg in test[1:]]
+    else:
+        command = [str(arg) for arg in test]
+    probe: dict[str, Any] = {"exec": {"command": command}}
+    for key, field in (
+        ("start_period", "initialDelaySeconds"),
+        ("interval", "periodSeconds"),
+        ("timeout", "timeoutSeconds"),
+    ):
+        seconds = str_to_seconds(healthcheck.get(key))
+        if seconds:
+            probe[field] = seconds
+    if healthcheck.get("retries") is not None:
+        probe["failureThreshold"] = int(healthcheck["retries"])
+    return probe
+
+
+class KubeExport:
+    """
+    the project as the documents of a multi-document Kubernetes YAML for `podman kube play`: the
+    services are the containers of a single pod, or of the pod template of a deployment, their
+    env files ConfigMaps, their named volumes PersistentVolumeClaims and their secrets Secrets;
+    what Kubernetes cannot express is collected in `unmapped`
+    """
 
-        if path_exists(dockerfile):
-            # normalize dockerfile path, as the user could have provided unpredictable file formats
-            dockerfile = os.path.normpath(dockerfile)
-            build_args.extend(["-f", dockerfile])
+    def __init__(self, compose: PodmanCompose, kind: str = "Pod") -> None:
+        assert compose.project_name is not None
+        self.compose = compose
+        self.project_name = compose.project_name
+        self.kind = kind
+        self.unmapped: list[str] = []
+        self.config_maps: list[dict[str, Any]] = []
+        self.secrets: dict[str, dict[str, Any]] = {}
+        self.claims: dict[str, dict[str, Any]] = {}
+        self.volumes: dict[str, dict[str, Any]] = {}
+
+    def report(self, service: str | None, message: str) -> None:
+        self.unmapped.append(f"service {service}: {message}" if service else message)
+
+    def documents(self) -> list[dict[str, Any]]:
+        compose = self.compose
+        first: dict[str, dict[str, Any]] = {}
+        for cnt in compose.containers:
+            first.setdefault(cnt["_service"], cnt)
+        levels = dependency_levels(compose, first)
+        conditions = dependency_conditions(compose)
+        # the services others wait to complete run before them, as init containers
+        init_services = {
+            name for name in first if "service_completed_successfully" in conditions.get(name, ())
+        }
+        containers = []
+        init_containers = []
+        restart_policies = set()
+        for service_name in sorted(first, key=lambda name: (levels[name], name)):
+            cnt = first[service_name]
+            replicas = len(compose.container_names_by_service[service_name])
+            if replicas > 1:
+                self.report(service_name, f"runs once instead of {replicas} times in the pod")
+            self.check_dependencies(cnt, init_services)
+            if service_name in init_services:
+                init_containers.append(self.container(cnt))
+                continue
+            containers.append(self.container(cnt))
+            restart = str(cnt.get("restart", "no")).split(":", maxsplit=1)[0]
+            restart_policies.add(KUBE_RESTART_POLICY.get(restart, "Never"))
+        if len(restart_policies) > 1:
+            self.report(None, "the services restart differently, the pod restarts all of them")
+        seen_ports: dict[tuple[Any, Any], str] = {}
+        for container in containers:
+            for port in container.get("ports", []):
+                key = (port["containerPort"], port.get("protocol", "TCP"))
+                if key in seen_ports:
+                    self.report(
+                        container["name"],
+                        f"listens on port {key[0]} of the pod like {seen_ports[key]}",
+                    )
+                seen_ports.setdefault(key, container["name"])
+        if len(compose.networks) > 1:
+            self.report(None, "networks are not mapped, all services share the network of the pod")
+
+        spec: dict[str, Any] = {
+            "restartPolicy": restart_policies.pop() if len(restart_policies) == 1 else "Always",
+            # the services reach each other by name through the network of the pod
+            "hostAliases": [{"ip": "127.0.0.1", "hostnames": self.hostnames(first.values())}],
+        }
+        grace_periods = [
+            str_to_seconds(cnt.get("stop_grace_period", STOP_GRACE_PERIOD)) or 0
+            for cnt in first.values()
+        ]
+        if grace_periods:
+            spec["terminationGracePeriodSeconds"] = max(grace_periods)
+        if init_containers:
+            spec["initContainers"] = init_containers
+        spec["containers"] = containers
+        if self.volumes:
+            spec["volumes"] = list(self.volumes.values())
+        name = kube_name(self.project_name)
+        labels = {"app": name}
+        if self.kind == "Deployment":
+            workload = {
+                "apiVersion": "apps/v1",
+                "kind": "Deployment",
+                "metadata": {"name": name, "labels": labels},
+                "spec": {
+                    "replicas": 1,
+                    "selector": {"matchLabels": labels},
+                    "template": {"metadata": {"labels": labels}, "spec": spec},
+                },
+            }
         else:
-            if custom_dockerfile_given:
-                # custom dockerfile name was also not found in the file system
-                raise OSError(f"Dockerfile not found in {dockerfile}")
-            raise OSError(f"Dockerfile not found in {ctx}")
+            workload = {
+                "apiVersion": "v1",
+                "kind": "Pod",
+                "metadata": {"name": name, "labels": labels},
+                "spec": spec,
+            }
+        return [*self.config_maps, *self.secrets.values(), *self.claims.values(), workload]
+
+    def check_dependencies(self, cnt: dict[str, Any], init_services: set[str]) -> None:
+        service_name = cnt["_service"]
+        for dep_name, dep in cnt.get("depends_on", {}).items():
+            condition = dep.get("condition", "service_started")
+            if service_name in init_services and dep_name not in init_services:
+                self.report(service_name, f"runs before {dep_name} although it depends on it")
+            elif condition == "service_healthy":
+                self.report(service_name, f"does not wait for {dep_name} to be healthy")
+
+    def hostnames(self, cnts: Iterable[dict[str, Any]]) -> list[str]:
+        names = set()
+        for cnt in cnts:
+            names.add(cnt["_service"])
+            names.update(cnt.get("_aliases", []))
+            if cnt.get("container_name"):
+                names.add(cnt["container_name"])
+            nets = cnt.get("networks")
+            for net_config in nets.values() if isinstance(nets, dict) else []:
+                names.update((net_config or {}).get("aliases", []))
+        return sorted(names)
+
+    def container(self, cnt: dict[str, Any]) -> dict[str, Any]:
+        service_name = cnt["_service"]
+        unknown = [
+            key for key in cnt if not isinstance(key, DependField) and key not in KUBE_SERVICE_KEYS
+        ]
+        for key in sorted(unknown):
+            self.report(service_name, f"{key} is not mapped")
+        if cnt.get("build"):
+            self.report(service_name, f"build is not mapped, {cnt['image']} has to be built first")
+        if cnt.get("network_mode"):
+            self.report(service_name, "network_mode is not mapped, it uses the network of the pod")
+        if self.compose.services[service_name].get("labels"):
+            self.report(service_name, "labels are not mapped")
+
+        container: dict[str, Any] = {"name": kube_name(service_name), "image": cnt["image"]}
+        pull_policy = cnt.get("pull_policy")
+        if pull_policy in KUBE_PULL_POLICY:
+            container["imagePullPolicy"] = KUBE_PULL_POLICY[pull_policy]
+        elif pull_policy is not None:
+            self.report(service_name, f"pull_policy {pull_policy} is not mapped")
+        entrypoint = cnt.get("entrypoint")
+        if entrypoint is not None:
+            container["command"] = (
+                shlex.split(entrypoint)
+                if isinstance(entrypoint, str)
+                else [str(arg) for arg in entrypoint]
+            )
+        command = container_command(cnt)
+        if command:
+            container["args"] = command
+        if cnt.get("working_dir"):
+            container["workingDir"] = cnt["working_dir"]
+        container.update(self.environment(cnt))
+        ports = self.ports(cnt)
+        if ports:
+            container["ports"] = ports
+        volume_mounts = self.volume_mounts(cnt)
+        if volume_mounts:
+            container["volumeMounts"] = volume_mounts
+        probe = kube_probe(cnt.get("healthcheck") or {})
+        if probe:
+            container["livenessProbe"] = probe
+        resources = self.resources(cnt)
+        if resources:
+            container["resources"] = resources
+        security_context = self.security_context(cnt)
+        if security_context:
+            container["securityContext"] = security_context
+        if cnt.get("tty"):
+            container["tty"] = True
+        if cnt.get("stdin_open"):
+            container["stdin"] = True
+        return container
+
+    def environment(self, cnt: dict[str, Any]) -> dict[str, Any]:
+        """
+        the env of the container, and a ConfigMap with its env files it takes envFrom
+        """
+        result: dict[str, Any] = {}
+        data: dict[str, str] = {}
+        for env_file in container_env_files(self.compose, cnt):
+            data.update({key: value or "" for key, value in dotenv_to_dict(env_file).items()})
+        if data:
+            name = kube_name(self.project_name, cnt["_service"], "env")
+            self.config_maps.append({
+                "apiVersion": "v1",
+                "kind": "ConfigMap",
+                "metadata": {"name": name},
+                "data": data,
+            })
+            result["envFrom"] = [{"configMapRef": {"name": name}}]
+        env = []
+        for item in norm_as_list(cnt.get("environment", {})):
+            name, sep, value = item.partition("=")
+            if not sep:
+                # passed from the environment of podman-compose
+                if name not in self.compose.environ:
+                    continue
+                value = self.compose.environ[name]
+            env.append({"name": name, "value": value})
+        if env:
+            result["env"] = env
+        return result
 
-    elif dockerfile:
-        build_args.extend(["-f", dockerfile])
+    def ports(self, cnt: dict[str, Any]) -> list[dict[str, Any]]:
+        service_name = cnt["_service"]
+        ports = []
+        for port in [*norm_ports(cnt.get("ports")), *map(str, cnt.get("expose", []))]:
+            spec, _, protocol = port.partition("/")
+            host_ip, host, container = "", "", spec
+            parts = spec.rsplit(":", 2)
+            if len(parts) == 3:
+                host_ip, host, container = parts
+            elif len(parts) == 2:
+                host, container = parts
+            try:
+                container_ports = port_range(container)
+                host_ports = port_range(host) if host else []
+            except ValueError:
+                self.report(service_name, f"port {port} is not mapped")
+                continue
+            if host_ports and len(host_ports) != len(container_ports):
+                self.report(service_name, f"port {port} is not mapped, the ranges differ")
+                continue
+            if ":" in spec and not host:
+                self.report(
+                    service_name, f"port {port} is not published, random host ports are not mapped"
+                )
+            for i, container_port in enumerate(container_ports):
+                entry: dict[str, Any] = {"containerPort": container_port}
+                if host_ports:
+                    entry["hostPort"] = host_ports[i]
+                if host_ip:
+                    entry["hostIP"] = host_ip.strip("[]")
+                if protocol:
+                    entry["protocol"] = protocol.upper()
+                ports.append(entry)
+        return ports
+
+    def volume_mounts(self, cnt: dict[str, Any]) -> list[dict[str, Any]]:
+        service_name = cnt["_service"]
+        volume_mounts = []
+        for i, volume in enumerate(cnt.get("volumes", [])):
+            mount_dict = get_mnt_dict(self.compose, cnt, volume)
+            mount_type = mount_dict["type"]
+            if mount_type == "volume":
+                vol = mount_dict["_vol"]
+                name = kube_name(vol["name"])
+                # the claim is named like the volume, so that the pod uses the same data as `up`
+                self.volumes[name] = {
+                    "name": name,
+                    "persistentVolumeClaim": {"claimName": vol["name"]},
+                }
+                if not vol.get("external"):
+                    self.claims[vol["name"]] = self.claim(service_name, vol)
+            elif mount_type == "bind":
+                name = kube_name(service_name, f"bind{i}")
+                source = os.path.realpath(
+                    os.path.join(self.compose.dirname, os.path.expanduser(mount_dict["source"]))
+                )
+                path_type = "File" if os.path.isfile(source) else "DirectoryOrCreate"
+                self.volumes[name] = {"name": name, "hostPath": {"path": source, "type": path_type}}
+            elif mount_type == "tmpfs":
+                name = kube_name(service_name, f"tmpfs{i}")
+                self.volumes[name] = {"name": name, "emptyDir": {"medium": "Memory"}}
+            else:
+                self.report(
+                    service_name, f"{mount_type} mount on {mount_dict['target']} is not mapped"
+                )
+                continue
+            volume_mount: dict[str, Any] = {"name": name, "mountPath": mount_dict["target"]}
+            if mount_dict.get("read_only"):
+                volume_mount["readOnly"] = True
+            volume_mounts.append(volume_mount)
+        for i, tmpfs in enumerate(norm_as_list(cnt.get("tmpfs"))):
+            name = kube_name(service_name, f"tmpfs-{i}")
+            self.volumes[name] = {"name": name, "emptyDir": {"medium": "Memory"}}
+            volume_mounts.append({"name": name, "mountPath": tmpfs.split(":", 1)[0]})
+        for secret in cnt.get("secrets", []):
+            secret_mount = self.secret_mount(cnt, secret)
+            if secret_mount:
+                volume_mounts.append(secret_mount)
+        return volume_mounts
+
+    def claim(self, service_name: str, vol: dict[str, Any]) -> dict[str, Any]:
+        annotations = {}
+        if vol.get("driver"):
+            annotations["volume.podman.io/driver"] = vol["driver"]
+        for opt, value in (vol.get("driver_opts") or {}).items():
+            if opt in KUBE_VOLUME_ANNOTATIONS:
+                annotations[KUBE_VOLUME_ANNOTATIONS[opt]] = str(value)
+            else:
+                self.report(
+                    service_name, f"driver_opts {opt} of volume {vol['name']} is not mapped"
+                )
+        metadata: dict[str, Any] = {"name": vol["name"]}
+        labels = norm_as_dict(vol.get("labels"))
+        if labels:
+            metadata["labels"] = {key: value or "" for key, value in labels.items()}
+        if annotations:
+            metadata["annotations"] = annotations
+        return {
+            "apiVersion": "v1",
+            "kind": "PersistentVolumeClaim",
+            "metadata": metadata,
+            "spec": {
+                "accessModes": ["ReadWriteOnce"],
+                "resources": {"requests": {"storage": "1Gi"}},
+            },
+        }
 
-    build_args.extend(["-t", cnt["image"]])
+    def secret_mount(
+        self, cnt: dict[str, Any], secret: str | dict[str, Any]
+    ) -> dict[str, Any] | None:
+        service_name = cnt["_service"]
+        declared_secrets = self.compose.declared_secrets or {}
+        secret_name = secret if isinstance(secret, str) else secret.get("source")
+        if not secret_name or secret_name not in declared_secrets:
+            raise ValueError(f'ERROR: undeclared secret: "{secret}", service: {service_name}')
+        declared_secret = declared_secrets[secret_name]
+        options = secret if isinstance(secret, dict) else {}
+        if declared_secret.get("file"):
+            path = os.path.join(self.compose.dirname, os.path.expanduser(declared_secret["file"]))
+            with open(os.path.realpath(path), "rb") as f:
+                data = f.read()
+        elif declared_secret.get("environment"):
+            value = self.compose.getenv(declared_secret["environment"])
+            if value is None:
+                raise ValueError(
+                    f"Environment variable '{declared_secret['environment']}' required"
+                    f" by secret '{secret_name}' is not set in the process environment."
+                )
+            data = value.encode()
+        else:
+            self.report(service_name, f"external secret {secret_name} is not mapped")
+            return None
+        if options.get("uid") or options.get("gid"):
+            self.report(service_name, f"the uid and gid of secret {secret_name} are not mapped")
+        name = kube_name(self.project_name, secret_name)
+        self.secrets.setdefault(
+            name,
+            {
+                "apiVersion": "v1",
+                "kind": "Secret",
+                "metadata": {"name": name},
+                "type": "Opaque",
+                "data": {secret_name: base64.b64encode(data).decode()},
+            },
+        )
+        item: dict[str, Any] = {"key": secret_name, "path": secret_name}
+        mode = options.get("mode")
+        if mode is not None:
+            item["mode"] = int(mode, 8) if isinstance(mode, str) else int(mode)
+        volume_name = kube_name("secret", service_name, secret_name)
+        self.volumes[volume_name] = {
+            "name": volume_name,
+            "secret": {"secretName": name, "items": [item]},
+        }
+        target = options.get("target") or secret_name
+        return {
+            "name": volume_name,
+            "mountPath": target if target.startswith("/") else f"/run/secrets/{target}",
+            "subPath": secret_name,
+            "readOnly": True,
+        }
 
-    if "platform" in cnt:
-        build_args.extend(["--platform", cnt["platform"]])
-    for secret in build_desc.get("secrets", []):
-        build_args.extend(get_secret_args(compose, cnt, secret, podman_is_building=True))
-    for i in build_desc.get("extra_hosts", []):
-        build_args.extend(["--add-host", i])
-    for tag in build_desc.get("tags", []):
-        build_args.extend(["-t", tag])
-    labels = build_desc.get("labels", [])
-    if isinstance(labels, dict):
-        labels = [f"{k}={v}" for (k, v) in labels.items()]
-    for label in labels:
-        build_args.extend(["--label", label])
-    for additional_ctx in build_desc.get("additional_contexts", {}):
-        build_args.extend([f"--build-context={additional_ctx}"])
-    if "target" in build_desc:
-        build_args.extend(["--target", build_desc["target"]])
-    for agent_or_key in norm_as_list(build_desc.get("ssh", {})):
-        agent_or_key = adjust_build_ssh_key_paths(compose, agent_or_key)
-        build_args.extend(["--ssh", agent_or_key])
-    container_to_ulimit_build_args(cnt, build_args)
-    if getattr(args, "no_cache", None):
-        build_args.append("--no-cache")
+    def resources(self, cnt: dict[str, Any]) -> dict[str, Any]:
+        service_name = cnt["_service"]
+        deploy = cnt.get("deploy") or {}
+        for key in sorted(set(deploy) - {"resources", "replicas"}):
+            self.report(service_name, f"deploy.{key} is not mapped")
+        deploy_resources = deploy.get("resources") or {}
+        limits = deploy_resources.get("limits") or {}
+        reservations = deploy_resources.get("reservations") or {}
+        resources: dict[str, Any] = {}
+        for field, memory, cpus in (
+            (
+                "limits",
+                cnt.get("mem_limit", limits.get("memory")),
+                cnt.get("cpus", limits.get("cpus")),
+            ),
+            (
+                "requests",
+                cnt.get("mem_reservation", reservations.get("memory")),
+                reservations.get("cpus"),
+            ),
+        ):
+            values = {}
+            if memory is not None:
+                quantity = kube_memory(memory)
+                if quantity is None:
+                    self.report(service_name, f"memory {memory} is not mapped")
+                else:
+                    values["memory"] = quantity
+            if cpus is not None:
+                values["cpu"] = str(cpus)
+            if values:
+                resources[field] = values
+        return resources
+
+    def security_context(self, cnt: dict[str, Any]) -> dict[str, Any]:
+        context: dict[str, Any] = {}
+        user = cnt.get("user")
+        if user is not None:
+            uid, _, gid = str(user).partition(":")
+            if uid.isdigit() and (not gid or gid.isdigit()):
+                context["runAsUser"] = int(uid)
+                if gid:
+                    context["runAsGroup"] = int(gid)
+            else:
+                self.report(cnt["_service"], f"user {user} is not mapped, only numeric ids are")
+        capabilities = {}
+        if cnt.get("cap_add"):
+            capabilities["add"] = list(cnt["cap_add"])
+        if cnt.get("cap_drop"):
+            capabilities["drop"] = list(cnt["cap_drop"])
+        if capabilities:
+            context["capabilities"] = capabilities
+        if cnt.get("privileged"):
+            context["privileged"] = True
+        if cnt.get("read_only"):
+            context["readOnlyRootFilesystem"] = True
+        return context
+
+
+def port_range(value: str) -> list[int]:
+    start, _, end = value.partition("-")
+    return list(range(int(start), int(end or start) + 1))
+
+
+@cmd_run(podman_compose, "kube", "generate Kubernetes YAML of the project for podman kube play")
+async def compose_kube(compose: PodmanCompose, args: argparse.Namespace) -> None:
+    export = KubeExport(compose, args.kind)
+    documents = export.documents()
+    for message in export.unmapped:
+        log.warning("not mapped to Kubernetes: %s", message)
+    content = yaml.safe_dump_all(documents, sort_keys=False)
+    if args.output == "-":
+        sys.stdout.write(content)
+        return
+    log.debug("writing [%s]: ...", args.output)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(content)
+    print(
+        f"""
+wrote {len(documents)} documents to {args.output}, bring the project up with:
+
+\t\tpodman kube play {shlex.quote(args.output)}
+"""
+    )
 
-    pull_policy = getattr(args, "pull", None)
-    if pull_policy:
-        build_args.append(f"--pull={pull_policy}")
 
-    args_list = norm_as_list(build_desc.get("args", {}))
-    for build_arg in args_list + args.build_arg:
-        build_args.extend((
-            "--build-arg",
-            build_arg,
-        ))
-    for cache_img in build_desc.get("cache_from", []):
-        build_args.extend(["--cache-from", cache_img])
-    for cache_img in build_desc.get("cache_to", []):
-        build_args.extend(["--cache-to", cache_img])
-    build_args.append(ctx)
-    return build_args
+PLAN_VERSION = 1
 
 
-async def build_one(compose: PodmanCompose, args: argparse.Namespace, cnt: dict) -> int | None:
-    if "build" not in cnt:
-        return None
-    if getattr(args, "if_not_exists", None):
-        try:
-            img_id = await compose.podman.output(
-                [], "inspect", ["-t", "image", "-f", "{{.Id}}", cnt["image"]]
+async def execution_plan(compose: PodmanCompose) -> dict[str, Any]:
+    """
+    the steps of `up -d` with their podman command lines computed, each with the steps it comes
+    after, for apply_plan() to run without the compose files
+    """
+    assert compose.project_name is not None
+    project_name = compose.project_name
+    steps: dict[str, dict[str, Any]] = {}
+
+    def argv(cmd: str, cmd_args: list[str]) -> list[str]:
+        return compose.get_podman_args(cmd) + cmd_args
+
+    def add(step_id: str, after: Iterable[str] = (), **fields: Any) -> str:
+        if step_id not in steps:
+            steps[step_id] = {"id": step_id, "after": list(dict.fromkeys(after)), **fields}
+        return step_id
+
+    def add_resource(kind: str, name: str, exists: list[str], create: list[str] | None) -> str:
+        if create is None:
+            return add(
+                f"{kind} {name}",
+                run=argv(kind, [*exists, name]),
+                error=f"External {kind} [{name}] does not exist. "
+                f"Create it first with: podman {kind} create '{name}'",
             )
-        except subprocess.CalledProcessError:
-            img_id = None
-        if img_id:
-            return None
+        return add(f"{kind} {name}", run=argv(kind, create), skip_if=argv(kind, [*exists, name]))
+
+    def add_condition(name: str, condition: ServiceDependencyCondition) -> str:
+        if condition == ServiceDependencyCondition.CREATED:
+            return f"create {name}"
+        if condition == ServiceDependencyCondition.RUNNING:
+            return f"start {name}"
+        if condition == ServiceDependencyCondition.SERVICE_COMPLETED_SUCCESSFULLY:
+            # podman wait prints the exit code
+            return add(
+                f"completed {name}",
+                [f"start {name}"],
+                run=argv("wait", [name]),
+                expect_output="0",
+            )
+        return add(
+            f"{condition.value} {name}",
+            [f"start {name}"],
+            run=argv("wait", [f"--condition={condition.value}", name]),
+        )
 
-    cleanup_callbacks: list[Callable] = []
-    build_args = container_to_build_args(
-        compose, cnt, args, os.path.exists, cleanup_callbacks=cleanup_callbacks
-    )
-    status = await compose.podman.run([], "build", build_args)
-    for c in cleanup_callbacks:
-        c()
-    return status
+    secrets = []
+    for secret_name, secret in (compose.declared_secrets or {}).items():
+        if secret.get("environment"):
+            name = f"{project_name}_{secret_name}"
+            secret_args = ["create", "--replace"]
+            secret_args += ["--label", f"io.podman.compose.project={project_name}"]
+            secret_args += ["--env", name, secret["environment"]]
+            # the value is only read from the environment of apply, which labels its hash
+            # and compares it with the label of the existing secret
+            secrets.append(
+                add(
+                    f"secret {name}",
+                    run=argv("secret", secret_args),
+                    skip_if=argv(
+                        "secret",
+                        [
+                            "inspect",
+                            "--format",
+                            '{{index .Spec.Labels "io.podman.compose.secret-hash"}}',
+                            name,
+                        ],
+                    ),
+                    secret={"name": secret_name, "environment": secret["environment"]},
+                )
+            )
+    for pod in compose.pods:
+        add_resource("pod", pod["name"], ["exists"], get_pod_create_args(compose, pod))
 
+    for cnt in compose.containers:
+        name = cnt["name"]
+        after = list(secrets)
+        if cnt.get("pod"):
+            after.append(f"pod {cnt['pod']}")
+        if cnt.get("x-podman.rootfs") is None:
+            image = cnt["image"]
+            pull_policy = cnt.get("pull_policy", "missing")
+            if cnt.get("build") or pull_policy in ("never", "build"):
+                after.append(
+                    add(
+                        f"image {image}",
+                        run=argv("image", ["exists", image]),
+                        error=f"image {image} has to be built or pulled before applying the plan",
+                    )
+                )
+            elif pull_policy == "always":
+                after.append(add(f"image {image}", run=argv("pull", [image])))
+            else:
+                after.append(
+                    add(
+                        f"image {image}",
+                        run=argv("pull", [image]),
+                        skip_if=argv("image", ["exists", image]),
+                    )
+                )
+        for net_desc, net_name, is_ext in get_cnt_nets(compose, cnt):
+            create = None if is_ext else get_network_create_args(net_desc, project_name, net_name)
+            after.append(add_resource("network", net_name, ["exists"], create))
+        for volume in cnt.get("volumes", []):
+            mount_dict = get_mnt_dict(compose, cnt, volume)
+            vol = mount_dict.get("_vol")
+            if mount_dict["type"] == "bind":
+                if mount_dict.get("bind", {}).get("create_host_path", True):
+                    path = bind_mount_source(compose, mount_dict)
+                    after.append(add(f"directory {path}", mkdir=path))
+            elif mount_dict["type"] == "volume" and vol and vol.get("name"):
+                create = None
+                if not vol.get("external"):
+                    create = get_volume_create_args(vol, project_name, vol["name"])
+                after.append(add_resource("volume", vol["name"], ["inspect"], create))
+        # podman create checks that the containers of --requires exist
+        for dep in sorted(cnt["_deps"], key=lambda dep: dep.name):
+            after.extend(
+                f"create {n}" for n in compose.container_names_by_service.get(dep.name, [])
+            )
+        podman_args = await container_to_args(compose, cnt, detached=False, create_resources=False)
+        service = compose.services[cnt["_service"]]
+        env_secrets = compose.service_env_secrets(service)
+        if env_secrets:
+            # the values of the secrets are only read from the environment of apply, which
+            # combines their hashes with the base hash into the config hash
+            assert compose.declared_secrets is not None
+            config_hash: dict[str, Any] = {
+                "config_hash": {
+                    "base": compose.base_config_hash(service),
+                    "secrets": {
+                        secret_name: compose.declared_secrets[secret_name]["environment"]
+                        for secret_name in env_secrets
+                    },
+                }
+            }
+        else:
+            config_hash = {"skip_if_output": compose.config_hash(service)}
+        add(
+            f"create {name}",
+            after,
+            run=argv("create", ["--replace", *podman_args]),
+            # an up to date container is kept
+            skip_if=argv(
+                "container",
+                [
+                    "inspect",
+                    "--format",
+                    '{{index .Config.Labels "io.podman.compose.config-hash"}}',
+                    name,
+                ],
+            ),
+            **config_hash,
+        )
+    for cnt in compose.containers:
+        name = cnt["name"]
+        after = [f"create {name}"]
+        for dep in sorted(cnt["_deps"], key=lambda dep: dep.name):
+            for dep_name in compose.container_names_by_service.get(dep.name, []):
+                after.append(add_condition(dep_name, dep.condition))
+        add(f"start {name}", after, run=argv("start", [name]))
+
+    # the steps a step comes after are before it
+    ordered: dict[str, dict[str, Any]] = {}
+    levels = {step_id: 0 for step_id in steps}
+    pending = dict(steps)
+    while pending:
+        ready = [step for step in pending.values() if all(dep in ordered for dep in step["after"])]
+        if not ready:
+            raise ValueError(f"the steps {', '.join(sorted(pending))} depend on each other")
+        for step in ready:
+            levels[step["id"]] = max((levels[dep] + 1 for dep in step["after"]), default=0)
+            ordered[step["id"]] = pending.pop(step["id"])
+    return {
+        "version": PLAN_VERSION,
+        "project_name": project_name,
+        "steps": sorted(ordered.values(), key=lambda step: levels[step["id"]]),
+    }
 
-@cmd_run(podman_compose, "build", "build stack images")
-async def compose_build(compose: PodmanCompose, args: argparse.Namespace) -> int:
-    pending_builds: dict[str, list[Any]] = {}
 
-    def _add_build(cnt: dict[str, Any]) -> None:
-        cur_builds = pending_builds.get(cnt["service_name"])
-        if cur_builds:
-            cur_builds.append(cnt)
-        else:
-            pending_builds[cnt["service_name"]] = [cnt]
+async def plan_step_done(compose: PodmanCompose, step: dict[str, Any]) -> bool:
+    if not step.get("skip_if"):
+        return False
+    try:
+        output = (await compose.podman.output([], "", step["skip_if"])).decode().strip()
+    except subprocess.CalledProcessError:
+        return False
+    return output == step.get("skip_if_output", output)
 
-    if args.services:
-        container_names_by_service = compose.container_names_by_service
-        compose.assert_services(args.services)
-        for service in args.services:
-            cnt = compose.container_by_name[container_names_by_service[service][0]]
-            _add_build(cnt)
-    else:
-        for cnt in compose.containers:
-            _add_build(cnt)
 
-    # Continue building until there are no more pending tasks
-    while pending_builds:
-        # Find the tasks that are not waiting for any dependencies
-        current_builds = []
-        currently_built_services = []
-        for service_name, containers in pending_builds.items():
-            cur_srv = compose.services[service_name]
-            build_deps = cur_srv.get("build", {}).get("build_deps", [])
-            # Check if the task depends on any pending builds
-            if set(build_deps).isdisjoint(pending_builds):
-                for c in containers:
-                    current_builds.append(asyncio.create_task(build_one(compose, args, c)))
-                currently_built_services.append(service_name)
+def environment_secret_hash(compose: PodmanCompose, secret_name: str, environment: str) -> str:
+    value = compose.getenv(environment)
+    if value is None:
+        raise ValueError(f"Environment variable '{environment}' is not set")
+    return secret_value_hash(secret_name, value)
 
-        # This should not happen because we check for circular references during the compose
-        # file parsing. But just in case...
-        if not current_builds:
-            log.error("Found no buildable services due to additional_context dependencies")
-            return 1
 
-        status = 0
-        for t in asyncio.as_completed(current_builds):
-            s = await t
-            if s is not None and s != 0:
-                status = s
-        if status != 0:
-            return status
+def resolve_plan_step(compose: PodmanCompose, step: dict[str, Any]) -> dict[str, Any]:
+    """
+    the step with the hashes of the secret values in the environment of apply filled in: the
+    label of a secret and the config hash of a container mounting environment secrets, both
+    compared with the label of the existing one
+    """
+    if "secret" in step:
+        content_hash = environment_secret_hash(
+            compose, step["secret"]["name"], step["secret"]["environment"]
+        )
+        # the label goes before `--env NAME VARIABLE`
+        secret_label = ["--label", f"io.podman.compose.secret-hash={content_hash}"]
+        run = step["run"][:-3] + secret_label + step["run"][-3:]
+        if secret_create_replaces(compose):
+            return {**step, "run": run, "skip_if_output": content_hash}
+        # an older podman removes the existing secret first
+        i = run.index("secret")
+        return {
+            **step,
+            "remove": [*run[:i], "secret", "rm", run[-2]],
+            "run": [arg for arg in run if arg != "--replace"],
+            "skip_if_output": content_hash,
+        }
+    if "config_hash" in step:
+        secret_hashes: dict[str, str | None] = {
+            secret_name: environment_secret_hash(compose, secret_name, environment)
+            for secret_name, environment in step["config_hash"]["secrets"].items()
+        }
+        config_hash = config_hash_with_secrets(step["config_hash"]["base"], secret_hashes)
+        label = "io.podman.compose.config-hash="
+        return {
+            **step,
+            "run": [
+                f"{label}{config_hash}" if arg.startswith(label) else arg for arg in step["run"]
+            ],
+            "skip_if_output": config_hash,
+        }
+    return step
 
-        for service_name in currently_built_services:
-            # noinspection PyAsyncCall
-            pending_builds.pop(service_name)
 
-    return 0
+async def run_plan_step(
+    compose: PodmanCompose, step: dict[str, Any], after: list[asyncio.Future]
+) -> bool:
+    if not all(await asyncio.gather(*after)):
+        log.error("%s: skipped, a step it comes after failed", step["id"])
+        return False
+    try:
+        step = resolve_plan_step(compose, step)
+        if "mkdir" in step:
+            os.makedirs(step["mkdir"], exist_ok=True)
+        elif await plan_step_done(compose, step):
+            log.debug("%s: skipped, nothing to do", step["id"])
+        else:
+            if "remove" in step:
+                try:
+                    await compose.podman.output([], "", step["remove"])
+                except subprocess.CalledProcessError:
+                    log.debug("%s: nothing to remove", step["id"])
+            output = (await compose.podman.output([], "", step["run"])).decode().strip()
+            expected = step.get("expect_output")
+            if expected is not None and output != expected:
+                log.error("%s: podman printed %r instead of %r", step["id"], output, expected)
+                return False
+    except (OSError, ValueError) as e:
+        log.error("%s: %s", step["id"], e)
+        return False
+    except subprocess.CalledProcessError as e:
+        # Podman.output() passes the error output of podman as output
+        stderr = e.stderr or e.output or b""
+        log.error("%s: %s", step["id"], step.get("error") or stderr.decode().strip())
+        return False
+    return True
 
 
-async def pod_exists(compose: PodmanCompose, name: str) -> bool:
-    exit_code = await compose.podman.run([], "pod", ["exists", name])
-    return exit_code == 0
+async def apply_plan(compose: PodmanCompose, plan: dict[str, Any]) -> int:
+    """
+    run the steps of an execution_plan(), each as soon as the steps it comes after succeeded,
+    skipping those whose skip_if command succeeds with the skip_if_output if given
+    """
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(f"unsupported plan version {plan.get('version')}, expected {PLAN_VERSION}")
+    seen: set[str] = set()
+    for step in plan["steps"]:
+        unknown = [dep for dep in step["after"] if dep not in seen]
+        if unknown:
+            raise ValueError(f"step {step['id']} comes after the unknown or later {unknown}")
+        seen.add(step["id"])
+    tasks: dict[str, asyncio.Future] = {}
+    for step in plan["steps"]:
+        after = [tasks[dep] for dep in step["after"]]
+        tasks[step["id"]] = asyncio.ensure_future(run_plan_step(compose, step, after))
+    results = await asyncio.gather(*tasks.values())
+    return 0 if all(results) else 1
+
+
+@cmd_run(podman_compose, "plan", "write the steps of `up -d` to a file for apply")
+async def compose_plan(compose: PodmanCompose, args: argparse.Namespace) -> None:
+    content = json.dumps(await execution_plan(compose), indent=2) + "\n"
+    if args.output == "-":
+        sys.stdout.write(content)
+        return
+    log.debug("writing [%s]: ...", args.output)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(content)
 
 
-async def create_pods(compose: PodmanCompose) -> None:
-    for pod in compose.pods:
-        if await pod_exists(compose, pod["name"]):
-            continue
+@cmd_run(podman_compose, "apply", "run the steps of a plan without reading the compose files")
+async def compose_apply(compose: PodmanCompose, args: argparse.Namespace) -> int:
+    if args.plan == "-":
+        plan = json.load(sys.stdin)
+    else:
+        with open(args.plan, encoding="utf-8") as f:
+            plan = json.load(f)
+    if args.dry_run:
+        for step in plan["steps"]:
+            print(step["id"], shlex.join(step["run"]) if "run" in step else step)
+        return 0
+    return await apply_plan(compose, plan)
 
-        podman_args = [
-            "create",
-            "--name=" + pod["name"],
-        ] + compose.resolve_pod_args()
 
-        ports = pod.get("ports", [])
-        if isinstance(ports, str):
-            ports = [ports]
-        for i in ports:
-            podman_args.extend(["-p", str(i)])
-        await compose.podman.run([], "pod", podman_args)
+def registered_projects() -> dict[str, dict[str, str]]:
+    """
+    the environment of every project registered with `systemd -a register` by project name
+    """
+    projects = {}
+    for fn in sorted(glob.glob(os.path.expanduser(f"~/{SYSTEMD_STACKS_DIR}/*.env"))):
+        environ = dotenv_to_dict(fn)
+        projects[os.path.basename(fn)[:-4]] = {k: v for k, v in environ.items() if v is not None}
+    return projects
 
 
-class DependField(str, Enum):
-    DEPENDENCIES = "_deps"
-    DEPENDENTS = "_dependents"
+async def run_project(
+    compose: PodmanCompose, environ: dict[str, str], args: argparse.Namespace
+) -> int:
+    """
+    parse a project with the environment variables set and run the command of args in it,
+    using the podman runner of compose; the command and podman run with the variables and in
+    the directory of the project too
+    """
+    project = PodmanCompose()
+    project.commands = compose.commands
+    project.global_args = copy.deepcopy(args)
+    project.podman_version = compose.podman_version
+    project.project_environ = environ
+    cwd = os.getcwd()
+    saved_environ = dict(os.environ)
+    # parsing changes the working directory and reads the environment, it does not await, so
+    # no other project runs meanwhile
+    try:
+        os.environ.update(environ)
+        project._parse_compose_file()  # pylint: disable=protected-access
+        project.podman = Podman(
+            project,
+            compose.podman.podman_path,
+            compose.podman.dry_run,
+            compose.podman.semaphore,
+            env=dict(os.environ),
+            cwd=os.getcwd(),
+        )
+    finally:
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(saved_environ)
+    retcode = await project.commands[args.command](project, project.global_args)
+    return retcode if isinstance(retcode, int) else 0
 
 
-def get_excluded(
+async def run_projects(
+    compose: PodmanCompose, projects: dict[str, dict[str, str]], args: argparse.Namespace
+) -> int:
+    """
+    run the command of args in all projects at once, each parsed with its environment variables,
+    and print the result of every project
+    """
+
+    async def run_one(name: str, environ: dict[str, str]) -> int:
+        try:
+            return await run_project(compose, environ, args)
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else int(e.code is not None)
+        except Exception as e:
+            log.error("%s: %s", name, e)
+            return 1
+
+    retcodes = await asyncio.gather(*(run_one(name, env) for name, env in projects.items()))
+    rows = [["PROJECT", "RESULT"]]
+    for name, retcode in zip(projects, retcodes):
+        rows.append([name, "done" if retcode == 0 else f"exit code {retcode}"])
+    print_table(rows)
+    return 0 if not any(retcodes) else 1
+
+
+@cmd_run(
+    podman_compose,
+    "all",
+    "run a command in every project registered with `systemd -a register` at once",
+)
+async def compose_all(compose: PodmanCompose, args: argparse.Namespace) -> int:
+    """
+    run a command in several projects at once, sharing one podman runner and its --parallel limit
+
+    `podman-compose all up -d` runs `up -d` in every project registered with
+    `podman-compose systemd -a register`, `podman-compose --project-directory a
+    --project-directory b up -d` in the given directories.
+    """
+    if args.command == "all":
+        if args.project_directory:
+            log.error("all runs in the registered projects, it does not take --project-directory")
+            return 1
+        projects = registered_projects()
+        if not projects:
+            log.error("no project is registered, register one with `systemd -a register`")
+            return 1
+        args = compose._parse_args(args.command_args, copy.deepcopy(args))  # pylint: disable=protected-access
+        if args.command in ("all", "version"):
+            log.error("%s can not run in every project", args.command)
+            return 1
+    else:
+        missing = [path for path in args.project_directory if not os.path.isdir(path)]
+        if missing:
+            log.error("missing project directories: %s", missing)
+            return 1
+        projects = {
+            path: {"COMPOSE_PROJECT_DIR": os.path.realpath(path)} for path in args.project_directory
+        }
+    if args.project_name:
+        log.error("the projects of one command can not have the same name given by -p")
+        return 1
+    return await run_projects(compose, projects, args)
+
+
+@cmd_run(podman_compose, "pull", "pull stack images")
+async def compose_pull(compose: PodmanCompose, args: argparse.Namespace) -> int | None:
+    img_containers = [cnt for cnt in compose.containers if "image" in cnt]
+    if args.services:
+        services = set(args.services)
+        img_containers = [cnt for cnt in img_containers if cnt["_service"] in services]
+    images = {cnt["image"] for cnt in img_containers}
+    if not args.force_local:
+        local_images = {cnt["image"] for cnt in img_containers if is_local(cnt)}
+        images -= local_images
+    status = 0
+    statuses = await asyncio.gather(*[compose.podman.run([], "pull", [image]) for image in images])
+    for s in statuses:
+        if s is not None and s != 0:
+            status = s
+    return status
+
+
+@cmd_run(podman_compose, "push", "push stack images")
+async def compose_push(compose: PodmanCompose, args: argparse.Namespace) -> int | None:
+    services = set(args.services)
+    status = 0
+    for cnt in compose.containers:
+        if "build" not in cnt:
+            continue
+        if services and cnt["_service"] not in services:
+            continue
+        s = await compose.podman.run([], "push", [cnt["image"]])
+        if s is not None and s != 0:
+            status = s
+    return status
+
+
+def is_context_git_url(path: str) -> bool:
+    r = urllib_parse.urlparse(path)
+    if r.scheme in ('git', 'http', 'https', 'ssh', 'file', 'rsync'):
+        return True
+    # URL contains a ":" character, a hint of a valid URL
+    # But also detects windows file paths (e.g. "C:\path\to\contextdir") as urls
+    is_path_with_drive_letter = (
+        (os.path.isabs(path) or secondarypathisabs(path))
+        and len(path) > 2
+        and path[1] == ':'
+        and path[2] in ('\\', '/')
+    )
+    if r.scheme != "" and r.netloc == "" and r.path != "" and not is_path_with_drive_letter:
+        return True
+    if r.scheme == "":  # tweak path URL to get username from url parser
+        r = urllib_parse.urlparse("ssh://" + path)
+        if r.username is not None and r.username != "":
+            return True
+    return False
+
+
+def adjust_build_ssh_key_paths(compose: PodmanCompose, agent_or_key: str) -> str:
+    # when using a custom id for ssh property, path to a local SSH key is provided after "="
+    parts = agent_or_key.split("=", 1)
+    if len(parts) == 1:
+        return agent_or_key
+    name, path = parts
+    path = os.path.expanduser(path)
+    return name + "=" + os.path.join(compose.dirname, path)
+
+
+def container_to_build_args(
     compose: PodmanCompose,
+    cnt: dict[str, Any],
     args: argparse.Namespace,
-    dep_field: DependField = DependField.DEPENDENCIES,
-) -> set[str]:
-    excluded = set()
+    path_exists: Callable[[str], bool],
+    cleanup_callbacks: list[Callable] | None = None,
+) -> list[str]:
+    build_desc = cnt["build"]
+    if not hasattr(build_desc, "items"):
+        build_desc = {"context": build_desc}
+    ctx = build_desc.get("context", ".")
+    dockerfile = build_desc.get("dockerfile", "")
+    dockerfile_inline = build_desc.get("dockerfile_inline")
+    if dockerfile_inline is not None:
+        dockerfile_inline = str(dockerfile_inline)
+        # Error if both `dockerfile_inline` and `dockerfile` are set
+        if dockerfile and dockerfile_inline:
+            raise OSError("dockerfile_inline and dockerfile can't be used simultaneously")
+        dockerfile = tempfile.NamedTemporaryFile(delete=False, suffix=".containerfile")
+        dockerfile.write(dockerfile_inline.encode())
+        dockerfile.close()
+        dockerfile = dockerfile.name
+
+        def cleanup_temp_dockfile() -> None:
+            if os.path.exists(dockerfile):
+                os.remove(dockerfile)
+
+        if cleanup_callbacks is not None:
+            cleanup_callbacks.append(cleanup_temp_dockfile)
+
+    build_args = []
+    # if given context was not recognized as git url, try joining paths to get a file locally
+    if not is_context_git_url(ctx):
+        custom_dockerfile_given = False
+        if dockerfile:
+            dockerfile = os.path.join(ctx, dockerfile)
+            custom_dockerfile_given = True
+        else:
+            dockerfile_alts = [
+                "Containerfile",
+                "ContainerFile",
+                "containerfile",
+                "Dockerfile",
+                "DockerFile",
+                "dockerfile",
+            ]
+            for dockerfile in dockerfile_alts:
+                dockerfile = os.path.join(ctx, dockerfile)
+                if path_exists(dockerfile):
+                    break
+
+        if path_exists(dockerfile):
+            # normalize dockerfile path, as the user could have provided unpredictable file formats
+            dockerfile = os.path.normpath(dockerfile)
+            build_args.extend(["-f", dockerfile])
+        else:
+            if custom_dockerfile_given:
+                # custom dockerfile name was also not found in the file system
+                raise OSError(f"Dockerfile not found in {dockerfile}")
+            raise OSError(f"Dockerfile not found in {ctx}")
+
+    elif dockerfile:
+        build_args.extend(["-f", dockerfile])
+
+    build_args.extend(["-t", cnt["image"]])
+
+    if "platform" in cnt:
+        build_args.extend(["--platform", cnt["platform"]])
+    for secret in build_desc.get("secrets", []):
+        build_args.extend(get_secret_args(compose, cnt, secret, podman_is_building=True))
+    for i in build_desc.get("extra_hosts", []):
+        build_args.extend(["--add-host", i])
+    for tag in build_desc.get("tags", []):
+        build_args.extend(["-t", tag])
+    labels = build_desc.get("labels", [])
+    if isinstance(labels, dict):
+        labels = [f"{k}={v}" for (k, v) in labels.items()]
+    for label in labels:
+        build_args.extend(["--label", label])
+    for additional_ctx in build_desc.get("additional_contexts", {}):
+        build_args.extend([f"--build-context={additional_ctx}"])
+    if "target" in build_desc:
+        build_args.extend(["--target", build_desc["target"]])
+    for agent_or_key in norm_as_list(build_desc.get("ssh", {})):
+        agent_or_key = adjust_build_ssh_key_paths(compose, agent_or_key)
+        build_args.extend(["--ssh", agent_or_key])
+    container_to_ulimit_build_args(cnt, build_args)
+    if getattr(args, "no_cache", None):
+        build_args.append("--no-cache")
+
+    pull_policy = getattr(args, "pull", None)
+    if pull_policy:
+        build_args.append(f"--pull={pull_policy}")
+
+    args_list = norm_as_list(build_desc.get("args", {}))
+    for build_arg in args_list + args.build_arg:
+        build_args.extend((
+            "--build-arg",
+            build_arg,
+        ))
+    for cache_img in build_desc.get("cache_from", []):
+        build_args.extend(["--cache-from", cache_img])
+    for cache_img in build_desc.get("cache_to", []):
+        build_args.extend(["--cache-to", cache_img])
+    build_args.append(ctx)
+    return build_args
+
+
+async def build_one(compose: PodmanCompose, args: argparse.Namespace, cnt: dict) -> int | None:
+    if "build" not in cnt:
+        return None
+    if getattr(args, "if_not_exists", None):
+        try:
+            img_id = await compose.podman.output(
+                [], "inspect", ["-t", "image", "-f", "{{.Id}}", cnt["image"]]
+            )
+        except subprocess.CalledProcessError:
+            img_id = None
+        if img_id:
+            return None
+
+    cleanup_callbacks: list[Callable] = []
+    build_args = container_to_build_args(
+        compose, cnt, args, os.path.exists, cleanup_callbacks=cleanup_callbacks
+    )
+    status = await compose.podman.run([], "build", build_args)
+    for c in cleanup_callbacks:
+        c()
+    return status
+
+
+@cmd_run(podman_compose, "build", "build stack images")
+async def compose_build(compose: PodmanCompose, args: argparse.Namespace) -> int:
+    pending_builds: dict[str, list[Any]] = {}
+
+    def _add_build(cnt: dict[str, Any]) -> None:
+        cur_builds = pending_builds.get(cnt["service_name"])
+        if cur_builds:
+            cur_builds.append(cnt)
+        else:
+            pending_builds[cnt["service_name"]] = [cnt]
+
     if args.services:
-        excluded = set(compose.services)
+        container_names_by_service = compose.container_names_by_service
+        compose.assert_services(args.services)
         for service in args.services:
-            # we need 'getattr' as compose_down_parse does not configure 'no_deps'
-            if service in compose.services and not getattr(args, "no_deps", False):
-                excluded -= set(x.name for x in compose.services[service].get(dep_field, set()))
-            excluded.discard(service)
-    log.debug("** excluding: %s", excluded)
-    return excluded
+            cnt = compose.container_by_name[container_names_by_service[service][0]]
+            _add_build(cnt)
+    else:
+        for cnt in compose.containers:
+            _add_build(cnt)
+
+    # Continue building until there are no more pending tasks
+    while pending_builds:
+        # Find the tasks that are not waiting for any dependencies
+        current_builds = []
+        currently_built_services = []
+        for service_name, containers in pending_builds.items():
+            cur_srv = compose.services[service_name]
+            build_deps = cur_srv.get("build", {}).get("build_deps", [])
+            # Check if the task depends on any pending builds
+            if set(build_deps).isdisjoint(pending_builds):
+                for c in containers:
+                    current_builds.append(asyncio.create_task(build_one(compose, args, c)))
+                currently_built_services.append(service_name)
+
+        # This should not happen because we check for circular references during the compose
+        # file parsing. But just in case...
+        if not current_builds:
+            log.error("Found no buildable services due to additional_context dependencies")
+            return 1
+
+        status = 0
+        for t in asyncio.as_completed(current_builds):
+            s = await t
+            if s is not None and s != 0:
+                status = s
+        if status != 0:
+            return status
+
+        for service_name in currently_built_services:
+            # noinspection PyAsyncCall
+            pending_builds.pop(service_name)
+
+    return 0
+
+
+async def pod_exists(compose: PodmanCompose, name: str) -> bool:
+    exit_code = await compose.podman.run([], "pod", ["exists", name])
+    return exit_code == 0
+
+
+def get_pod_create_args(compose: PodmanCompose, pod: dict[str, Any]) -> list[str]:
+    podman_args = [
+        "create",
+        "--name=" + pod["name"],
+    ] + compose.resolve_pod_args()
+
+    ports = pod.get("ports", [])
+    if isinstance(ports, str):
+        ports = [ports]
+    for i in ports:
+        podman_args.extend(["-p", str(i)])
+    return podman_args
+
+
+async def create_pods(compose: PodmanCompose) -> None:
+    for pod in compose.pods:
+        if await pod_exists(compose, pod["name"]):
+            continue
+
+        await compose.podman.run([], "pod", get_pod_create_args(compose, pod))
+
+
+class DependField(str, Enum):
+    DEPENDENCIES = "_deps"
+    DEPENDENTS = "_dependents"
+
+
+def get_excluded(
+    compose: PodmanCompose,
+    args: argparse.Namespace,
+    dep_field: DependField = DependField.DEPENDENCIES,
+) -> set[str]:
+    excluded = set()
+    if args.services:
+        excluded = set(compose.services)
+        for service in args.services:
+            # we need 'getattr' as compose_down_parse does not configure 'no_deps'
+            if service in compose.services and not getattr(args, "no_deps", False):
+                excluded -= set(x.name for x in compose.services[service].get(dep_field, set()))
+            excluded.discard(service)
+    log.debug("** excluding: %s", excluded)
+    return excluded
+
+
+def dependency_levels(
+    compose: PodmanCompose,
+    services: Iterable[str],
+    dep_field: DependField = DependField.DEPENDENCIES,
+) -> dict[str, int]:
+    """
+    assign every service the number of the wave it is handled in, so that it comes after
+    the services of `dep_field` it is related to: use DEPENDENCIES for the start order
+    and DEPENDENTS for the stop order; services in a dependency loop share the last wave
+    """
+    pending = set(services)
+    levels: dict[str, int] = {}
+    level = 0
+    while pending:
+        wave = {
+            name
+            for name in pending
+            if not any(
+                dep.name in pending
+                for dep in compose.services[name].get(dep_field, set())
+                if dep.name != name
+            )
+        }
+        if not wave:
+            # dependency loop, handle the rest together
+            wave = pending
+        for name in wave:
+            levels[name] = level
+        pending -= wave
+        level += 1
+    return levels
+
+
+async def run_in_dependency_order(
+    compose: PodmanCompose,
+    services: Iterable[str],
+    dep_field: DependField,
+    action: Callable[[str], Awaitable[None]],
+) -> None:
+    """
+    run `action` for every service as soon as it has finished for the services of `dep_field`
+    the service is related to, without waiting for the whole previous wave
+    """
+    levels = dependency_levels(compose, services, dep_field)
+    done = {service: asyncio.Event() for service in levels}
+
+    async def run(service: str) -> None:
+        for dep in compose.services[service].get(dep_field, set()):
+            if dep.name in done and levels[dep.name] < levels[service]:
+                await done[dep.name].wait()
+        await action(service)
+        done[service].set()
+
+    await asyncio.gather(*[asyncio.create_task(run(service), name=service) for service in levels])
+
+
+async def _validate_completed_successfully(
+    compose: PodmanCompose, container_names: list[str]
+) -> None:
+    # Poll until all containers have left the 'created' state
+    # This prevents podman wait from racing against container startup
+    last_log_time = 0.0
+    while True:
+        try:
+            statuses_raw = await compose.podman.output(
+                [], "inspect", ["--format={{.State.Status}}"] + container_names
+            )
+            statuses = statuses_raw.decode().split()
+            if all(s != "created" for s in statuses if s):
+                break
+        except subprocess.CalledProcessError as exc:
+            log.debug(
+                "podman inspect failed while polling for created states: %s",
+                exc,
+            )
+
+        now = asyncio.get_event_loop().time()
+        if now - last_log_time >= 1.0:
+            log.debug(
+                "Waiting for dependency containers to leave 'created' state: %s",
+                ', '.join(container_names),
+            )
+            last_log_time = now
+        await asyncio.sleep(0.05)
+
+    # podman does not actually support value "service_completed_successfully"
+    # default value "stopped" is sent instead
+    await compose.podman.output([], "wait", ["--condition=stopped"] + container_names)
+
+    for container_name in container_names:
+        try:
+            inspect_output = await compose.podman.output([], "inspect", [container_name])
+        except subprocess.CalledProcessError as exc:
+            raise RuntimeError(
+                f"Container {container_name} disappeared after waiting for stop"
+            ) from exc
+        container_info = json.loads(inspect_output)[0]
+
+        exit_code = container_info.get("State", {}).get("ExitCode", -1)
+        if exit_code != 0:
+            error_msg = (
+                f"Container {container_name} didn't complete successfully: exit code {exit_code}"
+            )
+            log.error(error_msg)
+            raise RuntimeError(error_msg)
+
+
+async def check_dep_conditions(compose: PodmanCompose, deps: set) -> None:
+    """Enforce that all specified conditions in deps are met"""
+    if not deps:
+        return
+
+    for condition in ServiceDependencyCondition:
+        deps_cd = []
+        for d in deps:
+            if d.condition == condition:
+                if (
+                    d.condition
+                    in (ServiceDependencyCondition.HEALTHY, ServiceDependencyCondition.UNHEALTHY)
+                ) and (
+                    compose.podman_version is not None
+                    and strverscmp_lt(compose.podman_version, "4.6.0")
+                ):
+                    log.warning(
+                        "Ignored %s condition check due to podman %s doesn't support %s!",
+                        d.name,
+                        compose.podman_version,
+                        condition.value,
+                    )
+                    continue
+
+                deps_cd.extend(compose.container_names_by_service[d.name])
+
+        if deps_cd:
+            await asyncio.gather(
+                *(wait_container_condition(compose, cnt, condition) for cnt in deps_cd)
+            )
+
+
+async def wait_container_condition(
+    compose: PodmanCompose, d_cnt: str, condition: ServiceDependencyCondition
+) -> None:
+    """wait until the container meets the condition, retrying when podman wait fails"""
+    while True:
+        try:
+            if condition == ServiceDependencyCondition.SERVICE_COMPLETED_SUCCESSFULLY:
+                await _validate_completed_successfully(compose, [d_cnt])
+            else:
+                await compose.podman.output([], "wait", [f"--condition={condition.value}", d_cnt])
+            log.debug(
+                "dependency for condition %s has been fulfilled on container %s",
+                condition.value,
+                d_cnt,
+            )
+            break
+        except subprocess.CalledProcessError as _exc:
+            output = list(((_exc.stdout or b"") + (_exc.stderr or b"")).decode().split('\n'))
+            log.debug(
+                'Podman wait returned an error (%d) when executing "%s": %s',
+                _exc.returncode,
+                _exc.cmd,
+                output,
+            )
+        await asyncio.sleep(1)
+
+
+async def run_container(
+    compose: PodmanCompose,
+    name: str,
+    deps: set,
+    command: tuple,
+    log_formatter: str | None = None,
+    suppress_output: bool = False,
+) -> int | None:
+    """runs a container after waiting for its dependencies to be fulfilled"""
+
+    # wait for the dependencies to be fulfilled
+    if "start" in command:
+        log.debug("Checking dependencies prior to container %s start", name)
+        await check_dep_conditions(compose, deps)
+
+    # start the container
+    log.debug("Starting task for container %s", name)
+    return await compose.podman.run(  # type: ignore[misc]
+        *command, log_formatter=log_formatter, suppress_output=suppress_output
+    )
+
+
+def deps_from_container(args: argparse.Namespace, cnt: dict) -> set:
+    if args.no_deps:
+        return set()
+    return cnt['_deps']
+
+
+def get_service_info(compose: PodmanCompose, service: str) -> tuple[dict, int] | None:
+    for index, cnt in enumerate(compose.containers):
+        service_name = cnt["_service"]
+        if service == service_name:
+            return (cnt, index)
+    return None
+
+
+def create_format_logs_task(
+    compose: PodmanCompose,
+    args: argparse.Namespace,
+    service: str,
+    podman_args: list,
+    max_service_length: int,
+) -> asyncio.Task | None:
+    result = get_service_info(compose, service)
+    if result is None:
+        return None
+
+    container, index = result
+    # Add colored service prefix to output by piping output through sed
+    if args.no_log_prefix:
+        log_formatter = None
+    else:
+        color_idx = index % len(compose.console_colors)
+        if args.no_color:  # monochrome output
+            color = '\x1b[0m'
+        else:
+            color = compose.console_colors[color_idx]
+
+        log_prefix = container["log_prefix"]
+        space_suffix = " " * (max_service_length - len(log_prefix) + 1)
+        log_formatter = f"{color}[{log_prefix}]{space_suffix}|\x1b[0m"
+
+    target_service = compose.container_names_by_service[service]
+    return asyncio.create_task(
+        compose.podman.run([], "logs", podman_args + target_service, log_formatter=log_formatter)
+    )
+
+
+@dataclass
+class PullImageSettings:
+    POLICY_PRIORITY: ClassVar[dict[str, int]] = {
+        "always": 3,
+        "newer": 2,
+        "missing": 1,
+        "never": 0,
+        "build": 0,
+    }
+
+    image: str
+    policy: str = "missing"
+    quiet: bool = False
+
+    ignore_pull_error: bool = False
+
+    def __post_init__(self) -> None:
+        if self.policy not in self.POLICY_PRIORITY:
+            log.debug("Pull policy %s is not valid, using 'missing' instead", self.policy)
+            self.policy = "missing"
+
+    def update_policy(self, new_policy: str) -> None:
+        if new_policy not in self.POLICY_PRIORITY:
+            log.debug("Pull policy %s is not valid, ignoring it", new_policy)
+            return
+
+        if self.POLICY_PRIORITY[new_policy] > self.POLICY_PRIORITY[self.policy]:
+            self.policy = new_policy
+
+
+def settings_to_pull_args(settings: PullImageSettings) -> list[str]:
+    args = ["--policy", settings.policy]
+    if settings.quiet:
+        args.append("--quiet")
+
+    args.append(settings.image)
+    return args
+
+
+async def pull_image(podman: Podman, settings: PullImageSettings) -> int | None:
+    if settings.policy in ("never", "build"):
+        log.debug("Skipping pull of image %s due to policy %s", settings.image, settings.policy)
+        return 0
+
+    ret = await podman.run([], "pull", settings_to_pull_args(settings))
+    return ret if not settings.ignore_pull_error else 0
+
+
+async def pull_images(
+    podman: Podman,
+    args: argparse.Namespace,
+    services: list[dict[str, Any]],
+) -> int | None:
+    pull_tasks = []
+    settings: dict[str, PullImageSettings] = {}
+    for pull_service in services:
+        if not is_local(pull_service):
+            image = str(pull_service.get("image", ""))
+            policy = getattr(args, "pull", None) or pull_service.get("pull_policy", "missing")
+
+            if image in settings:
+                settings[image].update_policy(policy)
+            else:
+                settings[image] = PullImageSettings(
+                    image, policy, getattr(args, "quiet_pull", False)
+                )
+
+            if "build" in pull_service:
+                # From https://github.com/compose-spec/compose-spec/blob/main/build.md#using-build-and-image
+                # When both image and build are specified,
+                # we should try to pull the image first,
+                # and then build it if it does not exist.
+                # we should not stop here if pull fails.
+                settings[image].ignore_pull_error = True
+
+    for s in settings.values():
+        pull_tasks.append(pull_image(podman, s))
+
+    if pull_tasks:
+        ret = await asyncio.gather(*pull_tasks)
+        return next((r for r in ret if not r), 0)
+
+    return 0
+
+
+async def prepare_images(
+    compose: PodmanCompose, args: argparse.Namespace, excluded: set[str]
+) -> int | None:
+
+    # When creating containers, podman create internally invokes podman pull with the default
+    # policy of --pull=missing.
+    # To minimize downtime during container up command, we explicitly run podman pull before
+    # tearing down the old container, ensuring the image is already cached when we subsequently
+    # call podman create.
+    # However, the pull --policy flag was only introduced to podman in version 5.6.0, so we can
+    # only perform this pre-teardown optimization when using podman >= 5.6.0.
+    if compose.podman_version is not None and not strverscmp_lt(compose.podman_version, "5.6.0"):
+        log.info("pulling images: ...")
+
+        pull_services = [v for k, v in compose.services.items() if k not in excluded]
+        err = await pull_images(compose.podman, args, pull_services)
+        if err:
+            log.error("Pull image failed")
+            return err
+
+    log.info("building images: ...")
+
+    if not args.no_build:
+        # `podman build` does not cache, so don't always build
+        build_args = argparse.Namespace(if_not_exists=(not args.build), **args.__dict__)
+        build_exit_code = await compose.commands["build"](compose, build_args)
+        if build_exit_code != 0:
+            log.error("Build command failed")
+            return build_exit_code
+
+    return 0
 
 
-async def _validate_completed_successfully(
-    compose: PodmanCompose, container_names: list[str]
+async def wait_for_container_running_healthy(
+    compose: PodmanCompose, args: argparse.Namespace
 ) -> None:
-    # Poll until all containers have left the 'created' state
-    # This prevents podman wait from racing against container startup
-    last_log_time = 0.0
-    while True:
-        try:
-            statuses_raw = await compose.podman.output(
-                [], "inspect", ["--format={{.State.Status}}"] + container_names
+    if compose.podman_version is not None and strverscmp_lt(compose.podman_version, "4.6.0"):
+        log.warning("Ignore --wait due to podman %s doesn't support it!", compose.podman_version)
+        return
+
+    log.info("waiting for all containers to be running|healthy")
+
+    # distinguish between containers that have a healthcheck and those that don't
+    cnt_with_healthcheck = []
+    cnt_without_healthcheck = []
+    for cnt in compose.containers:
+        if "healthcheck" in cnt:
+            cnt_with_healthcheck.append(cnt["name"])
+        else:
+            cnt_without_healthcheck.append(cnt["name"])
+
+    async def run_podman_wait() -> None:
+        # wait for running state of containers without a healthcheck
+        if cnt_without_healthcheck:
+            await compose.podman.run(
+                [],
+                "wait",
+                [
+                    "--condition=running",
+                    "--ignore",
+                    *cnt_without_healthcheck,
+                ],
             )
-            statuses = statuses_raw.decode().split()
-            if all(s != "created" for s in statuses if s):
-                break
-        except subprocess.CalledProcessError as exc:
-            log.debug(
-                "podman inspect failed while polling for created states: %s",
-                exc,
+        # wait for healthy state of containers with a healthcheck
+        if cnt_with_healthcheck:
+            await compose.podman.run(
+                [],
+                "wait",
+                [
+                    "--condition=healthy",
+                    "--ignore",
+                    *cnt_with_healthcheck,
+                ],
             )
 
-        now = asyncio.get_event_loop().time()
-        if now - last_log_time >= 1.0:
-            log.debug(
-                "Waiting for dependency containers to leave 'created' state: %s",
-                ', '.join(container_names),
-            )
-            last_log_time = now
-        await asyncio.sleep(0.05)
+    # if --wait-timeout is not set None is used, which means no timeout
+    # https://docs.python.org/3/library/asyncio-task.html#asyncio.wait_for
+    # the CancelledError is handled in the compose.podman.run() method
+    await wait_with_timeout(run_podman_wait(), timeout=args.wait_timeout)
 
-    # podman does not actually support value "service_completed_successfully"
-    # default value "stopped" is sent instead
-    await compose.podman.output([], "wait", ["--condition=stopped"] + container_names)
 
-    for container_name in container_names:
+def has_fixed_host_port(port: str) -> bool:
+    # [[host_ip:]host_port:]container_port[/protocol]
+    parts = port.split("/", 1)[0].rsplit(":", 2)
+    return len(parts) > 1 and bool(parts[-2])
+
+
+def can_replace_start_first(
+    compose: PodmanCompose, service: str, existing_containers: dict[str, ExistingContainer]
+) -> bool:
+    """
+    whether a new replica of the service can run next to the old one while replacing it
+    """
+    service_desc = compose.services[service]
+    if service_desc.get("container_name") or compose.pods:
+        return False
+    if service_desc.get("network_mode") == "host":
+        return False
+    if any(has_fixed_host_port(port) for port in norm_ports(service_desc.get("ports"))):
+        return False
+    # --requires ties existing dependents to the old container, which can not be removed then
+    dependents = {dep.name for dep in service_desc.get(DependField.DEPENDENTS, set())}
+    return not any(c.service_name in dependents for c in existing_containers.values())
+
+
+async def replace_container_start_first(
+    compose: PodmanCompose, args: argparse.Namespace, cnt: dict[str, Any]
+) -> int | None:
+    """
+    create and start the new container under a temporary name, wait for it to be
+    running|healthy, then remove the old container and give its name to the new one
+    """
+    name = cnt["name"]
+    tmp_name = f"{name}_replacement"
+    podman_args = await container_to_args(compose, cnt, detached=False, no_deps=args.no_deps)
+    podman_args[0] = f"--name={tmp_name}"
+    # left over by an interrupted replacement
+    await compose.podman.run([], "rm", ["--force", "--ignore", tmp_name])
+    exit_code = await compose.podman.run([], "create", podman_args)
+    if exit_code:
+        return exit_code
+    exit_code = await run_container(
+        compose, tmp_name, deps_from_container(args, cnt), ([], "start", [tmp_name])
+    )
+    if not exit_code and not args.dry_run:
+        condition = ServiceDependencyCondition.RUNNING
+        if "healthcheck" in cnt and not (
+            compose.podman_version is not None and strverscmp_lt(compose.podman_version, "4.6.0")
+        ):
+            condition = ServiceDependencyCondition.HEALTHY
+        timeout = getattr(args, "wait_timeout", None)
+        if timeout is None:
+            timeout = readiness_timeout(cnt)
         try:
-            inspect_output = await compose.podman.output([], "inspect", [container_name])
-        except subprocess.CalledProcessError as exc:
-            raise RuntimeError(
-                f"Container {container_name} disappeared after waiting for stop"
-            ) from exc
-        container_info = json.loads(inspect_output)[0]
+            await wait_with_timeout(wait_container_condition(compose, tmp_name, condition), timeout)
+        except TimeoutError:
+            log.error(
+                "%s did not become %s within %d seconds, keeping %s",
+                tmp_name,
+                condition.value,
+                timeout,
+                name,
+            )
+            exit_code = 1
+    if exit_code:
+        await compose.podman.run([], "rm", ["--force", tmp_name])
+        return exit_code
+    stop_args = get_stop_timeout_args(compose, args, name)
+    await compose.podman.run([], "stop", [*stop_args, name])
+    await compose.podman.run([], "rm", [name])
+    return await compose.podman.run([], "rename", [tmp_name, name])
 
-        exit_code = container_info.get("State", {}).get("ExitCode", -1)
-        if exit_code != 0:
-            error_msg = (
-                f"Container {container_name} didn't complete successfully: exit code {exit_code}"
+
+async def replace_services_start_first(
+    compose: PodmanCompose,
+    args: argparse.Namespace,
+    services: set[str],
+    existing_containers: dict[str, ExistingContainer],
+) -> list[int | None]:
+    """
+    replace the existing replicas of each service one after the other, services in parallel
+    """
+
+    async def replace_service(service: str) -> list[int | None]:
+        exit_codes = []
+        for cnt in compose.containers:
+            if cnt["_service"] == service and cnt["name"] in existing_containers:
+                if getattr(args, "no_hosts", False):
+                    cnt["x-podman.no_hosts"] = True
+                exit_codes.append(await replace_container_start_first(compose, args, cnt))
+        return exit_codes
+
+    results = await asyncio.gather(*[replace_service(service) for service in sorted(services)])
+    return [exit_code for exit_codes in results for exit_code in exit_codes]
+
+
+async def create_containers_by_cloning(
+    compose: PodmanCompose,
+    args: argparse.Namespace,
+    containers: list[dict[str, Any]],
+) -> list[int | None]:
+    """
+    create the first replica of each service and clone the other replicas concurrently,
+    services are handled one after the other as --requires needs the dependencies to exist
+
+    `podman container clone` can not override labels, so the replicas are cloned from a
+    template container without the container-number label, which is removed afterwards;
+    the number of a cloned replica is read from its name
+    """
+    exit_codes: list[int | None] = []
+    containers_by_service: dict[str, list[dict[str, Any]]] = {}
+    for cnt in containers:
+        containers_by_service.setdefault(cnt["_service"], []).append(cnt)
+
+    for service, service_containers in containers_by_service.items():
+        first = compose.container_names_by_service[service][0]
+        clones = []
+        for cnt in service_containers:
+            if cnt["name"] != first and "container_name" not in cnt:
+                clones.append(cnt)
+                continue
+            podman_args = await container_to_args(
+                compose, cnt, detached=False, no_deps=args.no_deps
             )
-            log.error(error_msg)
-            raise RuntimeError(error_msg)
+            exit_codes.append(await compose.podman.run([], "create", podman_args))
+        if not clones:
+            continue
 
+        template = f"{first}_template"
+        podman_args = await container_to_args(
+            compose, clones[0], detached=False, no_deps=args.no_deps
+        )
+        podman_args[0] = f"--name={template}"
+        number_label = podman_args.index(f"com.docker.compose.container-number={clones[0]['num']}")
+        del podman_args[number_label - 1 : number_label + 1]
+        # left over by an interrupted up
+        await compose.podman.run([], "rm", ["--force", "--ignore", template])
+        if await compose.podman.run([], "create", podman_args):
+            for cnt in clones:
+                podman_args = await container_to_args(
+                    compose, cnt, detached=False, no_deps=args.no_deps
+                )
+                exit_codes.append(await compose.podman.run([], "create", podman_args))
+            continue
 
-async def check_dep_conditions(compose: PodmanCompose, deps: set) -> None:
-    """Enforce that all specified conditions in deps are met"""
-    if not deps:
-        return
+        exit_codes.extend(
+            await asyncio.gather(*[
+                compose.podman.run(
+                    [],
+                    "container",
+                    [
+                        "clone",
+                        *([f"--pod={cnt['pod']}"] if cnt.get("pod") else []),
+                        template,
+                        cnt["name"],
+                    ],
+                )
+                for cnt in clones
+            ])
+        )
+        await compose.podman.run([], "rm", [template])
+    return exit_codes
 
-    for condition in ServiceDependencyCondition:
-        deps_cd = []
-        for d in deps:
-            if d.condition == condition:
+
+@cmd_run(podman_compose, "up", "Create and start the entire stack or some of its services")
+async def compose_up(compose: PodmanCompose, args: argparse.Namespace) -> int | None:  # pylint: disable=too-many-return-statements
+    if compose.daemon_up_to_date:
+        log.info("the daemon of the project found every container up to date")
+        return 0
+    excluded = get_excluded(compose, args)
+    no_attach_services = set(args.no_attach)
+    unknown_no_attach_services = no_attach_services - set(compose.services)
+    if unknown_no_attach_services:
+        log.error("no such service: %s", sorted(unknown_no_attach_services)[0])
+        return 1
+
+    assert compose.project_name is not None, "Project name must be set before running up command"
+    # the containers are listed while the images are prepared
+    existing_task = asyncio.ensure_future(compose.podman.existing_containers(compose.project_name))
+    try:
+        exit_code = await prepare_images(compose, args, excluded)
+        if exit_code != 0:
+            log.error("Prepare images failed")
+            if not args.dry_run:
+                return exit_code
+        existing_containers = await existing_task
+    finally:
+        # the listing is stopped and its error retrieved if the images could not be prepared
+        existing_task.cancel()
+        await asyncio.gather(existing_task, return_exceptions=True)
+
+    # if needed, tear down existing containers
+
+    recreate_services: set[str] = set()
+    replace_services: set[str] = set()
+    running_services = {c.service_name for c in existing_containers.values() if not c.exited}
+
+    await create_secrets_from_environment(compose)
+
+    if existing_containers:
+        if args.force_recreate and args.no_recreate:
+            log.error(
+                "Cannot use --force-recreate and --no-recreate at the same time, "
+                "please remove one of them"
+            )
+            return 1
+
+        if not args.no_recreate:
+            requested_services = set(args.services) if args.services else set()
+            always_recreate_deps = getattr(args, "always_recreate_deps", False)
+
+            # resolve current local image IDs for services with running containers
+            current_image_ids: dict[str, str] = {}
+            for c in existing_containers.values():
                 if (
-                    d.condition
-                    in (ServiceDependencyCondition.HEALTHY, ServiceDependencyCondition.UNHEALTHY)
-                ) and (
-                    compose.podman_version is not None
-                    and strverscmp_lt(compose.podman_version, "4.6.0")
+                    c.service_name in excluded
+                    or c.service_name not in compose.services
+                    or not c.image_id
                 ):
-                    log.warning(
-                        "Ignored %s condition check due to podman %s doesn't support %s!",
-                        d.name,
-                        compose.podman_version,
-                        condition.value,
-                    )
                     continue
+                service = compose.services[c.service_name]
+                image = service.get("image")
+                if image and image not in current_image_ids:
+                    try:
+                        img_id = await compose.podman.output(
+                            [], "inspect", ["-t", "image", "-f", "{{.Id}}", image]
+                        )
+                        current_image_ids[image] = img_id.decode().strip()
+                    except subprocess.CalledProcessError:
+                        pass
 
-                deps_cd.extend(compose.container_names_by_service[d.name])
+            for c in existing_containers.values():
+                if (
+                    c.service_name in excluded
+                    or c.service_name not in compose.services  # orphaned container
+                ):
+                    continue
 
-        if deps_cd:
+                service = compose.services[c.service_name]
+                force_this = args.force_recreate and (
+                    not requested_services
+                    or c.service_name in requested_services
+                    or always_recreate_deps
+                )
 
-            async def wait_one(
-                d_cnt: str, condition: ServiceDependencyCondition = condition
-            ) -> None:
-                while True:
-                    try:
-                        if condition == ServiceDependencyCondition.SERVICE_COMPLETED_SUCCESSFULLY:
-                            await _validate_completed_successfully(compose, [d_cnt])
-                        else:
-                            await compose.podman.output(
-                                [], "wait", [f"--condition={condition.value}", d_cnt]
-                            )
-                        log.debug(
-                            "dependency for condition %s has been fulfilled on container %s",
-                            condition.value,
-                            d_cnt,
-                        )
-                        break
-                    except subprocess.CalledProcessError as _exc:
-                        output = list(
-                            ((_exc.stdout or b"") + (_exc.stderr or b"")).decode().split('\n')
-                        )
-                        log.debug(
-                            'Podman wait returned an error (%d) when executing "%s": %s',
-                            _exc.returncode,
-                            _exc.cmd,
-                            output,
+                image_changed = False
+                image = service.get("image")
+                if image and c.image_id:
+                    local_id = current_image_ids.get(image, "")
+                    if local_id and local_id != c.image_id:
+                        log.info(
+                            "Image changed for service %s (%s), will recreate",
+                            c.service_name,
+                            image,
                         )
-                    await asyncio.sleep(1)
-
-            await asyncio.gather(*(wait_one(cnt) for cnt in deps_cd))
+                        image_changed = True
 
+                if force_this or image_changed or c.config_hash != compose.config_hash(service):
+                    recreate_services.add(c.service_name)
 
-async def run_container(
-    compose: PodmanCompose,
-    name: str,
-    deps: set,
-    command: tuple,
-    log_formatter: str | None = None,
-    suppress_output: bool = False,
-) -> int | None:
-    """runs a container after waiting for its dependencies to be fulfilled"""
+                    # Running dependents of service are removed by down command
+                    # so we need to recreate and start them too
+                    dependents = {
+                        dep.name
+                        for dep in service.get(DependField.DEPENDENTS, [])
+                        if dep.name in running_services
+                    }
+                    if dependents:
+                        log.debug(
+                            "Service %s's dependents should be recreated and running again: %s",
+                            c.service_name,
+                            dependents,
+                        )
+                        recreate_services.update(dependents)
+                        excluded = excluded - dependents
 
-    # wait for the dependencies to be fulfilled
-    if "start" in command:
-        log.debug("Checking dependencies prior to container %s start", name)
-        await check_dep_conditions(compose, deps)
+        if getattr(args, "replace_strategy", "stop-first") == "start-first" and not args.no_start:
+            replace_services = {
+                service
+                for service in recreate_services
+                if can_replace_start_first(compose, service, existing_containers)
+            }
+            recreate_services -= replace_services
+            log.debug("Services to replace start-first: %s", replace_services)
 
-    # start the container
-    log.debug("Starting task for container %s", name)
-    return await compose.podman.run(  # type: ignore[misc]
-        *command, log_formatter=log_formatter, suppress_output=suppress_output
-    )
+        log.debug("** excluding update: %s", excluded)
+        log.debug("Prepare to recreate services: %s", recreate_services)
 
+        teardown_needed = bool(recreate_services)
 
-def deps_from_container(args: argparse.Namespace, cnt: dict) -> set:
-    if args.no_deps:
-        return set()
-    return cnt['_deps']
+        if teardown_needed:
+            log.info("tearing down existing containers: ...")
+            down_args = argparse.Namespace(
+                **dict(args.__dict__, volumes=False, rmi=None, services=recreate_services)
+            )
+            await compose.commands["down"](compose, down_args)
+            log.info("tearing down existing containers: done\n\n")
 
+    await create_pods(compose)
 
-def get_service_info(compose: PodmanCompose, service: str) -> tuple[dict, int] | None:
-    for index, cnt in enumerate(compose.containers):
-        service_name = cnt["_service"]
-        if service == service_name:
-            return (cnt, index)
-    return None
+    log.info("creating missing containers: ...")
 
+    create_error_codes: list[int | None] = []
+    missing_containers = []
+    for cnt in compose.containers:
+        if cnt["_service"] in excluded or (
+            cnt["name"] in existing_containers and cnt["_service"] not in recreate_services
+        ):
+            log.debug("** skipping create: %s", cnt["name"])
+            continue
+        if getattr(args, "no_hosts", False):
+            cnt["x-podman.no_hosts"] = True
+        missing_containers.append(cnt)
+    if getattr(args, "replica_strategy", "create") == "clone":
+        create_error_codes = await create_containers_by_cloning(compose, args, missing_containers)
+    else:
+        for cnt in missing_containers:
+            podman_args = await container_to_args(
+                compose, cnt, detached=False, no_deps=args.no_deps
+            )
+            exit_code = await compose.podman.run([], "create", podman_args)
+            create_error_codes.append(exit_code)
+
+    replace_error_codes: list[int | None] = []
+    if replace_services:
+        log.info("replacing containers (start-first): ...")
+        replace_error_codes = await replace_services_start_first(
+            compose, args, replace_services, existing_containers
+        )
+        create_error_codes.extend(replace_error_codes)
 
-def create_format_logs_task(
-    compose: PodmanCompose,
-    args: argparse.Namespace,
-    service: str,
-    podman_args: list,
-    max_service_length: int,
-) -> asyncio.Task | None:
-    result = get_service_info(compose, service)
-    if result is None:
+    if args.dry_run:
         return None
 
-    container, index = result
-    # Add colored service prefix to output by piping output through sed
-    if args.no_log_prefix:
-        log_formatter = None
-    else:
-        color_idx = index % len(compose.console_colors)
-        if args.no_color:  # monochrome output
-            color = '\x1b[0m'
-        else:
-            color = compose.console_colors[color_idx]
-
-        log_prefix = container["log_prefix"]
-        space_suffix = " " * (max_service_length - len(log_prefix) + 1)
-        log_formatter = f"{color}[{log_prefix}]{space_suffix}|\x1b[0m"
+    if args.no_start:
+        # return first error code from create calls, if any
+        return next((code for code in create_error_codes if code is not None and code != 0), 0)
 
-    target_service = compose.container_names_by_service[service]
-    return asyncio.create_task(
-        compose.podman.run([], "logs", podman_args + target_service, log_formatter=log_formatter)
-    )
+    if args.detach:
+        log.info("starting containers (detached): ...")
+        start_error_codes: list[int | None] = []
+        for cnt in compose.containers:
+            if cnt["_service"] in excluded:
+                log.debug("** skipping start: %s", cnt["name"])
+                continue
+            exit_code = await run_container(
+                compose, cnt["name"], deps_from_container(args, cnt), ([], "start", [cnt["name"]])
+            )
+            start_error_codes.append(exit_code)
+        # a failed replacement keeps the old container running, but up still fails
+        start_error_codes.extend(replace_error_codes)
 
+        if args.wait:
+            await wait_for_container_running_healthy(compose, args)
 
-@dataclass
-class PullImageSettings:
-    POLICY_PRIORITY: ClassVar[dict[str, int]] = {
-        "always": 3,
-        "newer": 2,
-        "missing": 1,
-        "never": 0,
-        "build": 0,
-    }
+        # return first error code from start calls, if any
+        return next((code for code in start_error_codes if code is not None and code != 0), 0)
 
-    image: str
-    policy: str = "missing"
-    quiet: bool = False
+    log.info("starting containers (attached): ...")
 
-    ignore_pull_error: bool = False
+    # TODO: handle already existing
+    # TODO: if error creating do not enter loop
+    # TODO: colors if sys.stdout.isatty()
+    exit_code_from = args.__dict__.get("exit_code_from")
+    if exit_code_from:
+        args.abort_on_container_exit = True
 
-    def __post_init__(self) -> None:
-        if self.policy not in self.POLICY_PRIORITY:
-            log.debug("Pull policy %s is not valid, using 'missing' instead", self.policy)
-            self.policy = "missing"
+    max_service_length = 0
+    for cnt in compose.containers:
+        curr_length = len(cnt["_service"])
+        max_service_length = curr_length if curr_length > max_service_length else max_service_length
 
-    def update_policy(self, new_policy: str) -> None:
-        if new_policy not in self.POLICY_PRIORITY:
-            log.debug("Pull policy %s is not valid, ignoring it", new_policy)
-            return
+    tasks: set[asyncio.Task] = set()
 
-        if self.POLICY_PRIORITY[new_policy] > self.POLICY_PRIORITY[self.policy]:
-            self.policy = new_policy
+    async def handle_sigint() -> None:
+        log.info("Caught SIGINT or Ctrl+C, shutting down...")
+        try:
+            log.info("Shutting down gracefully, please wait...")
+            down_args = argparse.Namespace(**dict(args.__dict__, volumes=False, rmi=None))
+            await compose.commands["down"](compose, down_args)
+        except Exception as e:
+            log.error("Error during shutdown: %s", e)
+        finally:
+            for task in tasks:
+                task.cancel()
 
+    if sys.platform != 'win32':
+        loop = asyncio.get_event_loop()
+        loop.add_signal_handler(signal.SIGINT, lambda: asyncio.create_task(handle_sigint()))
 
-def settings_to_pull_args(settings: PullImageSettings) -> list[str]:
-    args = ["--policy", settings.policy]
-    if settings.quiet:
-        args.append("--quiet")
+    for i, cnt in enumerate(compose.containers):
+        # Add colored service prefix to output by piping output through sed
+        color_idx = i % len(compose.console_colors)
+        color = compose.console_colors[color_idx]
+        space_suffix = " " * (max_service_length - len(cnt["_service"]) + 1)
+        log_formatter = "{}[{}]{}|\x1b[0m".format(color, cnt["_service"], space_suffix)
+        if cnt["_service"] in excluded:
+            log.debug("** skipping: %s", cnt["name"])
+            continue
 
-    args.append(settings.image)
-    return args
+        if cnt["_service"] in no_attach_services:
+            tasks.add(
+                asyncio.create_task(
+                    run_container(
+                        compose,
+                        cnt["name"],
+                        deps_from_container(args, cnt),
+                        ([], "start", ["-a", cnt["name"]]),
+                        suppress_output=True,
+                    ),
+                    name=cnt["_service"],
+                )
+            )
+            continue
 
+        tasks.add(
+            asyncio.create_task(
+                run_container(
+                    compose,
+                    cnt["name"],
+                    deps_from_container(args, cnt),
+                    ([], "start", ["-a", cnt["name"]]),
+                    log_formatter=log_formatter,
+                ),
+                name=cnt["_service"],
+            )
+        )
 
-async def pull_image(podman: Podman, settings: PullImageSettings) -> int | None:
-    if settings.policy in ("never", "build"):
-        log.debug("Skipping pull of image %s due to policy %s", settings.image, settings.policy)
-        return 0
+    def _task_cancelled(task: Task) -> bool:
+        if task.cancelled():
+            return True
+        # Task.cancelling() is new in python 3.11
+        if sys.version_info >= (3, 11) and task.cancelling():
+            return True
+        return False
 
-    ret = await podman.run([], "pull", settings_to_pull_args(settings))
-    return ret if not settings.ignore_pull_error else 0
+    exit_code = 0
+    exiting = False
+    first_failed_task = None
 
+    while tasks:
+        done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
 
-async def pull_images(
-    podman: Podman,
-    args: argparse.Namespace,
-    services: list[dict[str, Any]],
-) -> int | None:
-    pull_tasks = []
-    settings: dict[str, PullImageSettings] = {}
-    for pull_service in services:
-        if not is_local(pull_service):
-            image = str(pull_service.get("image", ""))
-            policy = getattr(args, "pull", None) or pull_service.get("pull_policy", "missing")
+        if args.abort_on_container_failure and first_failed_task is None:
+            # Generally a single returned item when using asyncio.FIRST_COMPLETED, but that's not
+            # guaranteed. If multiple tasks finish at the exact same time the choice of which
+            # finished "first" is arbitrary
+            for t in done:
+                if t.result() != 0:
+                    first_failed_task = t
 
-            if image in settings:
-                settings[image].update_policy(policy)
+        if args.abort_on_container_exit or first_failed_task:
+            if not exiting:
+                # If 2 containers exit at the exact same time, the cancellation of the other ones
+                # cause the status to overwrite. Sleeping for 1 seems to fix this and make it match
+                # docker-compose
+                await asyncio.sleep(1)
+                for t in tasks:
+                    if not _task_cancelled(t):
+                        t.cancel()
+            t_: Task
+            exiting = True
+            if first_failed_task:
+                # Matches docker-compose behaviour, where the exit code of the task that triggered
+                # the cancellation is always propagated when aborting on failure
+                exit_code = first_failed_task.result()
             else:
-                settings[image] = PullImageSettings(
-                    image, policy, getattr(args, "quiet_pull", False)
-                )
+                for t_ in done:
+                    if t_.get_name() == exit_code_from:
+                        exit_code = t_.result()
+    return exit_code
+
+
+def get_volume_names(compose: PodmanCompose, cnt: dict) -> list[str]:
+    basedir = compose.dirname
+    srv_name = cnt["_service"]
+    ls = []
+    for volume in cnt.get("volumes", []):
+        if isinstance(volume, str):
+            volume = parse_short_mount(volume, basedir)
+        volume = fix_mount_dict(compose, volume, srv_name)
+        mount_type = volume["type"]
+        if mount_type != "volume":
+            continue
+        volume_name = volume.get("_vol", {}).get("name")
+        ls.append(volume_name)
+    return ls
+
 
-            if "build" in pull_service:
-                # From https://github.com/compose-spec/compose-spec/blob/main/build.md#using-build-and-image
-                # When both image and build are specified,
-                # we should try to pull the image first,
-                # and then build it if it does not exist.
-                # we should not stop here if pull fails.
-                settings[image].ignore_pull_error = True
+async def compose_down_in_order(
+    compose: PodmanCompose,
+    args: argparse.Namespace,
+    containers: list[Any],
+    excluded: set[str],
+) -> None:
+    podman_args: list[str] = []
+    timeout_global = getattr(args, "timeout", None)
+    names_by_service: dict[str, list[str]] = {}
+    for cnt in containers:
+        if cnt["_service"] in excluded:
+            continue
+        names_by_service.setdefault(cnt["_service"], []).append(cnt["name"])
+    rm_tasks = []
 
-    for s in settings.values():
-        pull_tasks.append(pull_image(podman, s))
+    async def stop_service(service: str) -> None:
+        names = names_by_service[service]
+        podman_stop_args = [*podman_args]
+        timeout = timeout_global
+        if timeout is None:
+            timeout_str = compose.services[service].get("stop_grace_period", STOP_GRACE_PERIOD)
+            timeout = str_to_seconds(timeout_str)
+        if timeout is not None:
+            podman_stop_args.extend(["-t", str(timeout)])
+        await compose.podman.run([], "stop", [*podman_stop_args, *names])
+        # the dependencies do not wait for the removal
+        rm_tasks.append(asyncio.create_task(compose.podman.run([], "rm", names)))
 
-    if pull_tasks:
-        ret = await asyncio.gather(*pull_tasks)
-        return next((r for r in ret if not r), 0)
+    await run_in_dependency_order(compose, names_by_service, DependField.DEPENDENTS, stop_service)
+    await asyncio.gather(*rm_tasks)
 
-    return 0
 
+async def get_project_containers(compose: PodmanCompose) -> list[tuple[str, str]]:
+    """
+    returns image and name of all containers of the project, including orphans
+    """
+    project_containers = (
+        (
+            await compose.podman.output(
+                [],
+                "ps",
+                [
+                    "--filter",
+                    f"label=io.podman.compose.project={compose.project_name}",
+                    "-a",
+                    "--format",
+                    "{{ .Image }} {{ .Names }}",
+                ],
+            )
+        )
+        .decode("utf-8")
+        .splitlines()
+    )
+    return [(item.split()[0], item.split()[1]) for item in project_containers]
 
-async def prepare_images(
-    compose: PodmanCompose, args: argparse.Namespace, excluded: set[str]
-) -> int | None:
 
-    # When creating containers, podman create internally invokes podman pull with the default
-    # policy of --pull=missing.
-    # To minimize downtime during container up command, we explicitly run podman pull before
-    # tearing down the old container, ensuring the image is already cached when we subsequently
-    # call podman create.
-    # However, the pull --policy flag was only introduced to podman in version 5.6.0, so we can
-    # only perform this pre-teardown optimization when using podman >= 5.6.0.
-    if compose.podman_version is not None and not strverscmp_lt(compose.podman_version, "5.6.0"):
-        log.info("pulling images: ...")
+async def compose_down_orphans(compose: PodmanCompose, args: argparse.Namespace) -> set[str]:
+    """
+    stop and remove the remaining containers of the project, returns their images
+    """
+    podman_args: list[str] = []
+    orphaned_images = set()
+    if args.remove_orphans:
+        orphaned_containers = await get_project_containers(compose)
+        orphaned_images = {image for image, _ in orphaned_containers}
+        names = sorted({name for _, name in orphaned_containers})
+        if names:
+            await compose.podman.run([], "stop", [*podman_args, *names])
+            await compose.podman.run([], "rm", names)
+    return orphaned_images
 
-        pull_services = [v for k, v in compose.services.items() if k not in excluded]
-        err = await pull_images(compose.podman, args, pull_services)
-        if err:
-            log.error("Pull image failed")
-            return err
 
-    log.info("building images: ...")
+async def compose_down_fast(
+    compose: PodmanCompose, args: argparse.Namespace, containers: list[Any]
+) -> set[str]:
+    """
+    tear down the whole project with pod level or multi-container calls instead of
+    stopping and removing service by service, returns the images of orphaned containers
+    """
+    timeout = getattr(args, "timeout", None)
+    if timeout is None:
+        timeouts = [
+            str_to_seconds(cnt.get("stop_grace_period", STOP_GRACE_PERIOD)) for cnt in containers
+        ]
+        timeout = max((t for t in timeouts if t is not None), default=None)
+    stop_args = ["-t", str(timeout)] if timeout is not None else []
+    names = [cnt["name"] for cnt in containers]
 
-    if not args.no_build:
-        # `podman build` does not cache, so don't always build
-        build_args = argparse.Namespace(if_not_exists=(not args.build), **args.__dict__)
-        build_exit_code = await compose.commands["build"](compose, build_args)
-        if build_exit_code != 0:
-            log.error("Build command failed")
-            return build_exit_code
+    orphaned_images = set()
+    orphaned_names = []
+    if args.remove_orphans:
+        for image, name in await get_project_containers(compose):
+            if name not in compose.container_by_name:
+                orphaned_images.add(image)
+                orphaned_names.append(name)
+
+    if compose.pods:
+        for pod in compose.pods:
+            await compose.podman.run([], "pod", ["stop", *stop_args, pod["name"]])
+            await compose.podman.run([], "pod", ["rm", "-f", pod["name"]])
+        if orphaned_names:
+            # orphans from outside the pod
+            await compose.podman.run([], "rm", ["-f", "--ignore", *stop_args, *orphaned_names])
+    elif names or orphaned_names:
+        await compose.podman.run([], "rm", ["-f", *stop_args, *names, *orphaned_names])
+    return orphaned_images
 
-    return 0
 
+@cmd_run(podman_compose, "down", "tear down entire stack")
+async def compose_down(compose: PodmanCompose, args: argparse.Namespace) -> None:
+    excluded = get_excluded(compose, args, DependField.DEPENDENTS)
+    containers = list(reversed(compose.containers))
 
-async def wait_for_container_running_healthy(
-    compose: PodmanCompose, args: argparse.Namespace
-) -> None:
-    if compose.podman_version is not None and strverscmp_lt(compose.podman_version, "4.6.0"):
-        log.warning("Ignore --wait due to podman %s doesn't support it!", compose.podman_version)
+    fast = getattr(args, "fast", False) and not args.services
+    if fast:
+        orphaned_images = await compose_down_fast(compose, args, containers)
+    else:
+        await compose_down_in_order(compose, args, containers, excluded)
+        orphaned_images = await compose_down_orphans(compose, args)
+    if args.volumes:
+        vol_names_to_keep = set()
+        for cnt in containers:
+            if cnt["_service"] not in excluded:
+                continue
+            vol_names_to_keep.update(get_volume_names(compose, cnt))
+        log.debug("keep %s", vol_names_to_keep)
+        volume_names = [
+            volume_name
+            for volume_name in await compose.podman.volume_ls()
+            if volume_name not in vol_names_to_keep
+        ]
+        if volume_names:
+            await compose.podman.run([], "volume", ["rm", *volume_names])
+    if args.rmi:
+        images_to_remove = set()
+        for cnt in containers:
+            if cnt["_service"] in excluded:
+                continue
+            if args.rmi == "local" and not is_local(cnt):
+                continue
+            images_to_remove.add(cnt["image"])
+        images_to_remove.update(orphaned_images)
+        log.debug("images to remove: %s", images_to_remove)
+        await compose.podman.run([], "rmi", ["--ignore", "--force"] + list(images_to_remove))
+
+    if excluded:
         return
+    if not fast:
+        for pod in compose.pods:
+            await compose.podman.run([], "pod", ["rm", pod["name"]])
+    for network in await compose.podman.network_ls():
+        await compose.podman.run([], "network", ["rm", network])
 
-    log.info("waiting for all containers to be running|healthy")
 
-    # distinguish between containers that have a healthcheck and those that don't
-    cnt_with_healthcheck = []
-    cnt_without_healthcheck = []
-    for cnt in compose.containers:
-        if "healthcheck" in cnt:
-            cnt_with_healthcheck.append(cnt["name"])
-        else:
-            cnt_without_healthcheck.append(cnt["name"])
+@cmd_run(podman_compose, "scale", "Scale services, only adding or removing the difference")
+async def compose_scale(compose: PodmanCompose, args: argparse.Namespace) -> int:
+    desired: dict[str, int] = {}
+    for scale_arg in args.scale:
+        service, _, num = scale_arg.partition("=")
+        replicas = try_int(num, fallback=None)
+        if service not in compose.services or replicas is None or replicas < 0:
+            log.error("invalid scale argument %s, expected SERVICE=NUM", scale_arg)
+            return 1
+        if replicas > 1 and compose.services[service].get("container_name"):
+            log.error("service %s has a container_name and can not be scaled", service)
+            return 1
+        desired[service] = replicas
 
-    async def run_podman_wait() -> None:
-        # wait for running state of containers without a healthcheck
-        if cnt_without_healthcheck:
-            await compose.podman.run(
-                [],
-                "wait",
-                [
-                    "--condition=running",
-                    "--ignore",
-                    *cnt_without_healthcheck,
-                ],
-            )
-        # wait for healthy state of containers with a healthcheck
-        if cnt_with_healthcheck:
-            await compose.podman.run(
-                [],
-                "wait",
-                [
-                    "--condition=healthy",
-                    "--ignore",
-                    *cnt_with_healthcheck,
-                ],
+    assert compose.project_name is not None, "Project name must be set before scaling"
+    existing_containers = await compose.podman.existing_containers(compose.project_name)
+    # compose.containers already holds the desired replicas of the scaled services
+    missing = [
+        cnt
+        for cnt in compose.containers
+        if cnt["_service"] in desired and cnt["name"] not in existing_containers
+    ]
+
+    surplus: dict[str, list[str]] = {}
+    for c in sorted(
+        existing_containers.values(),
+        key=lambda c: replica_number(compose.project_name or "", c),
+        reverse=True,
+    ):
+        if c.service_name in desired and c.name not in compose.container_by_name:
+            surplus.setdefault(c.service_name, []).append(c.name)
+    for service in desired:
+        log.info(
+            "scaling %s: %d to create, %d to remove",
+            service,
+            len([cnt for cnt in missing if cnt["_service"] == service]),
+            len(surplus.get(service, [])),
+        )
+
+    async def remove_surplus(service: str, names: list[str]) -> int | None:
+        timeout = getattr(args, "timeout", None)
+        if timeout is None:
+            timeout = str_to_seconds(
+                compose.services[service].get("stop_grace_period", STOP_GRACE_PERIOD)
             )
+        stop_args = ["-t", str(timeout)] if timeout is not None else []
+        await compose.podman.run([], "stop", [*stop_args, *names])
+        return await compose.podman.run([], "rm", names)
 
-    # if --wait-timeout is not set None is used, which means no timeout
-    # https://docs.python.org/3/library/asyncio-task.html#asyncio.wait_for
-    # the CancelledError is handled in the compose.podman.run() method
-    await wait_with_timeout(run_podman_wait(), timeout=args.wait_timeout)
+    async def add_missing(cnt: dict[str, Any]) -> int | None:
+        podman_args = await container_to_args(compose, cnt, detached=False, no_deps=args.no_deps)
+        exit_code = await compose.podman.run([], "create", podman_args)
+        if exit_code or args.no_start:
+            return exit_code
+        return await run_container(
+            compose, cnt["name"], deps_from_container(args, cnt), ([], "start", [cnt["name"]])
+        )
 
+    if missing:
+        await create_pods(compose)
+    exit_codes = await asyncio.gather(
+        *[remove_surplus(service, names) for service, names in surplus.items()],
+        *[add_missing(cnt) for cnt in missing],
+    )
+    return next((code for code in exit_codes if code), 0)
 
-@cmd_run(podman_compose, "up", "Create and start the entire stack or some of its services")
-async def compose_up(compose: PodmanCompose, args: argparse.Namespace) -> int | None:  # pylint: disable=too-many-return-statements
-    excluded = get_excluded(compose, args)
-    no_attach_services = set(args.no_attach)
-    unknown_no_attach_services = no_attach_services - set(compose.services)
-    if unknown_no_attach_services:
-        log.error("no such service: %s", sorted(unknown_no_attach_services)[0])
-        return 1
 
-    exit_code = await prepare_images(compose, args, excluded)
-    if exit_code != 0:
-        log.error("Prepare images failed")
-        if not args.dry_run:
-            return exit_code
+class FileWatcher:
+    """
+    waits for changes of a set of files and of every file below a set of directory trees, with
+    inotify on the directories containing them where available and by polling their stat
+    otherwise; files which do not exist yet are watched too
+    """
 
-    # if needed, tear down existing containers
+    # see inotify(7)
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_IGNORED = 0x8000
+    IN_ISDIR = 0x40000000
+    IN_MASK = (
+        IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    )
+    EVENT_HEADER = struct.Struct("iIII")
 
-    assert compose.project_name is not None, "Project name must be set before running up command"
-    existing_containers = await compose.podman.existing_containers(compose.project_name)
-    recreate_services: set[str] = set()
-    running_services = {c.service_name for c in existing_containers.values() if not c.exited}
+    def __init__(
+        self,
+        paths: Iterable[str],
+        trees: Iterable[str] = (),
+        poll_interval: float = 1.0,
+        use_inotify: bool = True,
+    ) -> None:
+        self.poll_interval = poll_interval
+        self.paths: set[str] = set()
+        self.trees: set[str] = set()
+        self._stats: dict[str, tuple[int, int, int] | None] = {}
+        self._changes: asyncio.Queue[str] = asyncio.Queue()
+        self._libc: Any = None
+        self._inotify_fd: int | None = None
+        self._watches: dict[int, str] = {}
+        self._poll_task: asyncio.Task | None = None
+        if use_inotify:
+            self._init_inotify()
+        self.set_paths(paths, trees)
 
-    await create_secrets_from_environment(compose)
+    @property
+    def uses_inotify(self) -> bool:
+        return self._inotify_fd is not None
 
-    if existing_containers:
-        if args.force_recreate and args.no_recreate:
-            log.error(
-                "Cannot use --force-recreate and --no-recreate at the same time, "
-                "please remove one of them"
-            )
-            return 1
+    def _init_inotify(self) -> None:
+        if not sys.platform.startswith("linux"):
+            return
+        try:
+            libc = ctypes.CDLL(ctypes_util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            log.debug("inotify is not available: %s", e)
+            return
+        if fd < 0:
+            log.debug("inotify is not available: %s", os.strerror(ctypes.get_errno()))
+            return
+        self._libc = libc
+        self._inotify_fd = fd
+        asyncio.get_running_loop().add_reader(fd, self._read_events)
 
-        if not args.no_recreate:
-            requested_services = set(args.services) if args.services else set()
-            always_recreate_deps = getattr(args, "always_recreate_deps", False)
+    @staticmethod
+    def _stat(path: str) -> tuple[int, int, int] | None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _in_trees(self, path: str) -> bool:
+        return any(path == tree or path.startswith(tree + os.sep) for tree in self.trees)
+
+    def _snapshot(self) -> dict[str, tuple[int, int, int] | None]:
+        stats = {path: self._stat(path) for path in self.paths}
+        for tree in self.trees:
+            for directory, dirnames, filenames in os.walk(tree):
+                for name in dirnames:
+                    # the mtime of a directory changes with its entries, which are reported
+                    # themselves, so only a created or replaced directory is a change
+                    st = self._stat(os.path.join(directory, name))
+                    stats[os.path.join(directory, name)] = st and (0, 0, st[2])
+                for name in filenames:
+                    stats[os.path.join(directory, name)] = self._stat(os.path.join(directory, name))
+        return stats
+
+    def set_paths(self, paths: Iterable[str], trees: Iterable[str] = ()) -> None:
+        self.paths = {os.path.realpath(path) for path in paths}
+        self.trees = {os.path.realpath(tree) for tree in trees}
+        self._stats = self._snapshot()
+        if self._inotify_fd is not None:
+            directories = {os.path.dirname(path) for path in self.paths}
+            for tree in self.trees:
+                directories.update(directory for directory, _, _ in os.walk(tree))
+            for directory in directories - set(self._watches.values()):
+                if not self._add_watch(directory):
+                    break
+        if self._inotify_fd is None and self._poll_task is None:
+            self._poll_task = asyncio.create_task(self._poll())
+
+    def _add_watch(self, directory: str) -> bool:
+        assert self._inotify_fd is not None
+        wd = self._libc.inotify_add_watch(self._inotify_fd, os.fsencode(directory), self.IN_MASK)
+        if wd < 0:
+            if self._in_trees(directory) and not os.path.isdir(directory):
+                # removed since it was listed, its removal is reported by its parent
+                return True
+            log.debug("could not watch %s, polling instead", directory)
+            self._close_inotify()
+            return False
+        self._watches[wd] = directory
+        return True
 
-            # resolve current local image IDs for services with running containers
-            current_image_ids: dict[str, str] = {}
-            for c in existing_containers.values():
-                if (
-                    c.service_name in excluded
-                    or c.service_name not in compose.services
-                    or not c.image_id
-                ):
-                    continue
-                service = compose.services[c.service_name]
-                image = service.get("image")
-                if image and image not in current_image_ids:
-                    try:
-                        img_id = await compose.podman.output(
-                            [], "inspect", ["-t", "image", "-f", "{{.Id}}", image]
-                        )
-                        current_image_ids[image] = img_id.decode().strip()
-                    except subprocess.CalledProcessError:
-                        pass
+    def _read_events(self) -> None:
+        assert self._inotify_fd is not None
+        try:
+            data = os.read(self._inotify_fd, 65536)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & self.IN_IGNORED:
+                # the directory was removed
+                self._watches.pop(wd, None)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, name)
+            if path in self.paths:
+                self._changes.put_nowait(path)
+            elif self._in_trees(path):
+                self._changes.put_nowait(path)
+                if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    self._watch_new_directory(path)
+            if self._inotify_fd is None:
+                # fell back to polling
+                self._poll_task = asyncio.create_task(self._poll())
+                return
+
+    def _watch_new_directory(self, path: str) -> None:
+        # files may have been created in it before it is watched
+        for directory, dirnames, filenames in os.walk(path):
+            if not self._add_watch(directory):
+                return
+            for name in dirnames + filenames:
+                self._changes.put_nowait(os.path.join(directory, name))
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            stats = self._snapshot()
+            for path in sorted(stats.keys() | self._stats.keys()):
+                if stats.get(path) != self._stats.get(path):
+                    self._changes.put_nowait(path)
+            self._stats = stats
+
+    async def wait(self, debounce: float = 0.2) -> set[str]:
+        """
+        wait for a change, then collect the changes which follow it within the debounce window
+        """
+        changed = {await self._changes.get()}
+        while True:
+            try:
+                changed.add(await asyncio.wait_for(self._changes.get(), debounce))
+            except asyncio.TimeoutError:
+                return changed
 
-            for c in existing_containers.values():
-                if (
-                    c.service_name in excluded
-                    or c.service_name not in compose.services  # orphaned container
-                ):
-                    continue
+    def _close_inotify(self) -> None:
+        if self._inotify_fd is not None:
+            asyncio.get_running_loop().remove_reader(self._inotify_fd)
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+            self._watches = {}
 
-                service = compose.services[c.service_name]
-                force_this = args.force_recreate and (
-                    not requested_services
-                    or c.service_name in requested_services
-                    or always_recreate_deps
-                )
+    def close(self) -> None:
+        self._close_inotify()
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
 
-                image_changed = False
-                image = service.get("image")
-                if image and c.image_id:
-                    local_id = current_image_ids.get(image, "")
-                    if local_id and local_id != c.image_id:
-                        log.info(
-                            "Image changed for service %s (%s), will recreate",
-                            c.service_name,
-                            image,
-                        )
-                        image_changed = True
 
-                if force_this or image_changed or c.config_hash != compose.config_hash(service):
-                    recreate_services.add(c.service_name)
+def get_watched_files(compose: PodmanCompose) -> tuple[set[str], dict[str, set[str]]]:
+    """
+    the files the compose files need to be parsed again for when they change, and the services
+    using each env_file, which is only read when a container is created
+    """
+    config_files = {*compose.compose_files, *compose.dotenv_files}
+    env_files: dict[str, set[str]] = {}
+    for service_name, service in compose.services.items():
+        extends = service.get("extends")
+        if isinstance(extends, dict) and extends.get("file"):
+            config_files.add(os.path.realpath(extends["file"]))
+        env_file = service.get("env_file", [])
+        if isinstance(env_file, (dict, str)):
+            env_file = [env_file]
+        for item in env_file:
+            path = item if isinstance(item, str) else item["path"]
+            path = os.path.realpath(os.path.join(compose.dirname, path))
+            env_files.setdefault(path, set()).add(service_name)
+    return config_files, env_files
+
+
+# ignored by every develop.watch rule: version control and editors' temporary files
+WATCH_DEFAULT_IGNORE = (".git", ".*.swp", ".*.swx", "*~", "4913")
+
+
+@dataclass
+class WatchRule:
+    """
+    a `develop.watch` entry of a service, with its path resolved
+    """
+
+    ACTIONS: ClassVar[tuple[str, ...]] = ("sync", "rebuild", "sync+restart")
 
-                    # Running dependents of service are removed by down command
-                    # so we need to recreate and start them too
-                    dependents = {
-                        dep.name
-                        for dep in service.get(DependField.DEPENDENTS, [])
-                        if dep.name in running_services
-                    }
-                    if dependents:
-                        log.debug(
-                            "Service %s's dependents should be recreated and running again: %s",
-                            c.service_name,
-                            dependents,
-                        )
-                        recreate_services.update(dependents)
-                        excluded = excluded - dependents
+    service: str
+    action: str
+    path: str
+    target: str | None
+    ignore: list[str]
 
-        log.debug("** excluding update: %s", excluded)
-        log.debug("Prepare to recreate services: %s", recreate_services)
+    def relpath(self, path: str) -> str | None:
+        """
+        the path relative to the watched path, None if the rule does not cover or ignores it
+        """
+        if path == self.path:
+            return ""
+        if not path.startswith(self.path + os.sep):
+            return None
+        rel = path[len(self.path) + 1 :]
+        if watch_path_ignored(rel, self.ignore):
+            return None
+        return rel
 
-        teardown_needed = bool(recreate_services)
+    def container_path(self, rel: str) -> str:
+        assert self.target is not None
+        return posixpath.join(self.target, rel.replace(os.sep, "/")) if rel else self.target
 
-        if teardown_needed:
-            log.info("tearing down existing containers: ...")
-            down_args = argparse.Namespace(
-                **dict(args.__dict__, volumes=False, rmi=None, services=recreate_services)
+
+def watch_path_ignored(rel: str, patterns: Iterable[str]) -> bool:
+    """
+    whether the path or one of its parent directories matches the .dockerignore like patterns,
+    relative to the watched path; the last matching pattern wins and "!" re-includes paths
+    """
+    parts = rel.split(os.sep)
+    if any(fnmatch.fnmatchcase(part, p) for part in parts for p in WATCH_DEFAULT_IGNORE):
+        return True
+    prefixes = ["/".join(parts[: i + 1]) for i in range(len(parts))]
+    ignored = False
+    for pattern in patterns:
+        negated = pattern.startswith("!")
+        pattern = pattern.lstrip("!").strip("/")
+        alternatives = [pattern, pattern[3:]] if pattern.startswith("**/") else [pattern]
+        if any(fnmatch.fnmatchcase(prefix, p) for prefix in prefixes for p in alternatives):
+            ignored = not negated
+    return ignored
+
+
+def get_watch_rules(compose: PodmanCompose) -> list[WatchRule]:
+    rules = []
+    for service_name, service in compose.services.items():
+        for item in service.get("develop", {}).get("watch", []):
+            action = item.get("action")
+            if action not in WatchRule.ACTIONS:
+                raise ValueError(f"{service_name}: unsupported develop.watch action: {action}")
+            if not item.get("path"):
+                raise ValueError(f"{service_name}: develop.watch rules require a path")
+            if action != "rebuild" and not item.get("target"):
+                raise ValueError(f"{service_name}: develop.watch action {action} requires a target")
+            if action == "rebuild" and "build" not in service:
+                raise ValueError(f"{service_name}: develop.watch action rebuild requires build")
+            ignore = item.get("ignore", [])
+            rules.append(
+                WatchRule(
+                    service=service_name,
+                    action=action,
+                    path=os.path.realpath(os.path.join(compose.dirname, item["path"])),
+                    target=item.get("target"),
+                    ignore=[ignore] if isinstance(ignore, str) else list(ignore),
+                )
             )
-            await compose.commands["down"](compose, down_args)
-            log.info("tearing down existing containers: done\n\n")
+    return rules
 
-    await create_pods(compose)
 
-    log.info("creating missing containers: ...")
+def match_watch_rules(
+    rules: list[WatchRule], paths: Iterable[str]
+) -> tuple[set[str], dict[str, dict[str, str]], set[str]]:
+    """
+    the services to rebuild, the changed host paths to sync to each service by container path
+    and the services to restart after syncing
+    """
+    rebuild: set[str] = set()
+    syncs: dict[str, dict[str, str]] = {}
+    restart: set[str] = set()
+    for rule in rules:
+        for path in paths:
+            rel = rule.relpath(path)
+            if rel is None:
+                continue
+            if rule.action == "rebuild":
+                rebuild.add(rule.service)
+            else:
+                syncs.setdefault(rule.service, {})[rule.container_path(rel)] = path
+                if rule.action == "sync+restart":
+                    restart.add(rule.service)
+    return rebuild, syncs, restart
 
-    create_error_codes: list[int | None] = []
-    for cnt in compose.containers:
-        if cnt["_service"] in excluded or (
-            cnt["name"] in existing_containers and cnt["_service"] not in recreate_services
-        ):
-            log.debug("** skipping create: %s", cnt["name"])
-            continue
-        if getattr(args, "no_hosts", False):
-            cnt["x-podman.no_hosts"] = True
-        podman_args = await container_to_args(compose, cnt, detached=False, no_deps=args.no_deps)
-        exit_code = await compose.podman.run([], "create", podman_args)
-        create_error_codes.append(exit_code)
 
-    if args.dry_run:
-        return None
+async def sync_watched_files(
+    compose: PodmanCompose, service: str, files: dict[str, str], restart: bool
+) -> int:
+    """
+    copy the host files, given by their container path, to every replica of the service as a
+    single tar stream, remove the container paths of the deleted ones and restart if asked to
+    """
+    deleted = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive = os.path.join(tmp_dir, "sync.tar")
+        with tarfile.open(archive, "w") as tar:
+            for container_path, path in sorted(files.items()):
+                try:
+                    # a directory is reported with its entries
+                    tar.add(path, arcname=container_path.lstrip("/"), recursive=False)
+                except FileNotFoundError:
+                    deleted.append(container_path)
+        copied = len(files) - len(deleted)
+
+        async def sync(container_name: str) -> int | None:
+            if deleted:
+                exit_code = await compose.podman.run(
+                    [], "exec", [container_name, "rm", "-rf", "--", *deleted]
+                )
+                if exit_code:
+                    return exit_code
+            if copied:
+                with open(archive, "rb") as f:
+                    exit_code = await compose.podman.run(
+                        [], "cp", ["-", f"{container_name}:/"], stdin=f
+                    )
+                if exit_code:
+                    return exit_code
+            if restart:
+                return await compose.podman.run([], "restart", [container_name])
+            return 0
 
-    if args.no_start:
-        # return first error code from create calls, if any
-        return next((code for code in create_error_codes if code is not None and code != 0), 0)
+        container_names = compose.container_names_by_service[service]
+        exit_codes = await asyncio.gather(*[sync(name) for name in container_names])
+    failed = [name for name, exit_code in zip(container_names, exit_codes) if exit_code]
+    if failed:
+        log.error("syncing %s failed for: %s", service, failed)
+    return next((exit_code for exit_code in exit_codes if exit_code), 0)
 
-    if args.detach:
-        log.info("starting containers (detached): ...")
-        start_error_codes: list[int | None] = []
-        for cnt in compose.containers:
-            if cnt["_service"] in excluded:
-                log.debug("** skipping start: %s", cnt["name"])
+
+@cmd_run(
+    podman_compose,
+    "watch",
+    "Watch the configuration and the develop.watch paths and update the services which changed",
+)
+async def compose_watch(compose: PodmanCompose, args: argparse.Namespace) -> int:
+    up_defaults = compose.command_defaults("up")
+
+    async def up(services: Iterable[str], force_recreate: bool, **overrides: Any) -> None:
+        up_args = argparse.Namespace(**{
+            **vars(args),
+            **up_defaults,
+            "detach": True,
+            "services": sorted(services),
+            "force_recreate": force_recreate,
+            **overrides,
+        })
+        await compose.commands["up"](compose, up_args)
+
+    def config_hashes() -> dict[str, str]:
+        return {name: compose.config_hash(service) for name, service in compose.services.items()}
+
+    def watched_paths() -> tuple[list[str], list[str]]:
+        paths = [*config_files, *env_files]
+        trees: list[str] = []
+        for rule in rules:
+            (trees if os.path.isdir(rule.path) else paths).append(rule.path)
+        return paths, trees
+
+    rules = [
+        rule
+        for rule in get_watch_rules(compose)
+        if not args.services or rule.service in args.services
+    ]
+    if not args.no_up:
+        await up(args.services, force_recreate=False)
+    hashes = config_hashes()
+    config_files, env_files = get_watched_files(compose)
+    watcher = FileWatcher(
+        *watched_paths(), poll_interval=args.poll_interval, use_inotify=not args.poll
+    )
+    log.info(
+        "watching %d files and %d directories, inotify: %s",
+        len(watcher.paths),
+        len(watcher.trees),
+        watcher.uses_inotify,
+    )
+    try:
+        while True:
+            changed_files = await watcher.wait(args.debounce)
+            log.info("changed: %s", sorted(changed_files))
+            # env files are read when the containers are created, they do not change the hash
+            changed = {name for path in changed_files for name in env_files.get(path, ())}
+            if changed_files & config_files:
+                try:
+                    compose._parse_compose_file()  # pylint: disable=protected-access
+                    new_rules = [
+                        rule
+                        for rule in get_watch_rules(compose)
+                        if not args.services or rule.service in args.services
+                    ]
+                except (Exception, SystemExit) as e:
+                    # the file may be in the middle of being edited
+                    log.error("could not parse the configuration, waiting for changes: %s", e)
+                    continue
+                new_hashes = config_hashes()
+                changed.update(name for name, h in new_hashes.items() if hashes.get(name) != h)
+                removed = hashes.keys() - new_hashes.keys()
+                if removed:
+                    log.warning("services no longer defined are left as is: %s", sorted(removed))
+                hashes = new_hashes
+                rules = new_rules
+                config_files, env_files = get_watched_files(compose)
+                watcher.set_paths(*watched_paths())
+            if args.services:
+                changed &= set(args.services)
+
+            rebuild, syncs, restart = match_watch_rules(rules, changed_files)
+            rebuild -= changed
+            # recreated containers get the current files with their image or their mounts
+            for service in rebuild | changed:
+                syncs.pop(service, None)
+
+            if not changed and not rebuild and not syncs:
+                log.info("no service changed")
                 continue
-            exit_code = await run_container(
-                compose, cnt["name"], deps_from_container(args, cnt), ([], "start", [cnt["name"]])
-            )
-            start_error_codes.append(exit_code)
+            for service, files in sorted(syncs.items()):
+                print(f"syncing {service}: {len(files)} changed paths")
+            await asyncio.gather(*[
+                sync_watched_files(compose, service, files, service in restart)
+                for service, files in syncs.items()
+            ])
+            if rebuild:
+                print(f"rebuilding: {', '.join(sorted(rebuild))}")
+                await up(rebuild, force_recreate=True, build=True, no_deps=True)
+            if changed:
+                print(f"recreating: {', '.join(sorted(changed))}")
+                await up(changed, force_recreate=True)
+    finally:
+        watcher.close()
 
-        if args.wait:
-            await wait_for_container_running_healthy(compose, args)
 
-        # return first error code from start calls, if any
-        return next((code for code in start_error_codes if code is not None and code != 0), 0)
+# seconds a command waits for the daemon before it parses the project itself
+DAEMON_TIMEOUT = 2.0
+# lines of the daemon protocol hold the `podman ps` records of the whole project
+DAEMON_LINE_LIMIT = 2**24
 
-    log.info("starting containers (attached): ...")
 
-    # TODO: handle already existing
-    # TODO: if error creating do not enter loop
-    # TODO: colors if sys.stdout.isatty()
-    exit_code_from = args.__dict__.get("exit_code_from")
-    if exit_code_from:
-        args.abort_on_container_exit = True
+def daemon_socket_path(args: argparse.Namespace) -> str:
+    """
+    the socket of the `daemon` started in the same directory with the same options affecting
+    the project, so that a command finds only a daemon which parsed the project as it would
+    """
+    key = json.dumps([
+        os.getcwd(),
+        args.file,
+        args.project_name,
+        args.env_file,
+        args.profile,
+        args.in_pod,
+        args.pod_args,
+        args.podman_path,
+        *(
+            os.environ.get(name)
+            for name in (
+                "COMPOSE_FILE",
+                "COMPOSE_PROJECT_NAME",
+                "COMPOSE_PROJECT_DIR",
+                "COMPOSE_PROFILES",
+                "COMPOSE_PATH_SEPARATOR",
+            )
+        ),
+    ])
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        socket_dir = os.path.join(runtime_dir, "podman-compose")
+    else:
+        socket_dir = os.path.join(tempfile.gettempdir(), f"podman-compose-{os.getuid()}")
+    return os.path.join(socket_dir, hashlib.sha256(key.encode()).hexdigest()[:16] + ".sock")
 
-    max_service_length = 0
-    for cnt in compose.containers:
-        curr_length = len(cnt["_service"])
-        max_service_length = curr_length if curr_length > max_service_length else max_service_length
 
-    tasks: set[asyncio.Task] = set()
+def is_private_dir(path: str) -> bool:
+    """
+    whether path is a directory, not a symlink, owned by the user and accessible only to them,
+    the socket directory in the shared temporary directory could be made by another user
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return (
+        stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and stat.S_IMODE(st.st_mode) == 0o700
+    )
 
-    async def handle_sigint() -> None:
-        log.info("Caught SIGINT or Ctrl+C, shutting down...")
+
+async def daemon_request(socket_path: str, request: dict[str, Any]) -> dict[str, Any] | None:
+    """
+    send a request to the daemon listening on the socket, returns None if there is none or
+    it could not answer
+    """
+    if not os.path.exists(socket_path):
+        return None
+    if not is_private_dir(os.path.dirname(socket_path)):
+        log.warning(
+            "not asking the daemon on %s, its directory is not private to the user", socket_path
+        )
+        return None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(socket_path, limit=DAEMON_LINE_LIMIT), DAEMON_TIMEOUT
+        )
         try:
-            log.info("Shutting down gracefully, please wait...")
-            down_args = argparse.Namespace(**dict(args.__dict__, volumes=False, rmi=None))
-            await compose.commands["down"](compose, down_args)
-        except Exception as e:
-            log.error("Error during shutdown: %s", e)
+            writer.write(json.dumps(request).encode() + b"\n")
+            line = await asyncio.wait_for(reader.readline(), DAEMON_TIMEOUT)
         finally:
-            for task in tasks:
-                task.cancel()
+            writer.close()
+        reply = json.loads(line)
+    except (OSError, asyncio.TimeoutError, ValueError) as e:
+        log.debug("the daemon on %s did not answer: %s", socket_path, e)
+        return None
+    if "error" in reply:
+        log.debug("the daemon on %s could not answer: %s", socket_path, reply["error"])
+        return None
+    return reply
 
-    if sys.platform != 'win32':
-        loop = asyncio.get_event_loop()
-        loop.add_signal_handler(signal.SIGINT, lambda: asyncio.create_task(handle_sigint()))
 
-    for i, cnt in enumerate(compose.containers):
-        # Add colored service prefix to output by piping output through sed
-        color_idx = i % len(compose.console_colors)
-        color = compose.console_colors[color_idx]
-        space_suffix = " " * (max_service_length - len(cnt["_service"]) + 1)
-        log_formatter = "{}[{}]{}|\x1b[0m".format(color, cnt["_service"], space_suffix)
-        if cnt["_service"] in excluded:
-            log.debug("** skipping: %s", cnt["name"])
-            continue
+class ProjectDaemon:
+    """
+    keeps the parsed project, its containers and the image IDs of its services in memory, up to
+    date with `podman events` and the changes of the compose files, and answers the requests of
+    the other commands on a unix socket, one JSON object per line
+    """
 
-        if cnt["_service"] in no_attach_services:
-            tasks.add(
-                asyncio.create_task(
-                    run_container(
-                        compose,
-                        cnt["name"],
-                        deps_from_container(args, cnt),
-                        ([], "start", ["-a", cnt["name"]]),
-                        suppress_output=True,
-                    ),
-                    name=cnt["_service"],
-                )
-            )
-            continue
+    # events come in bursts, e.g. create, init and start of every container of `up`
+    REFRESH_DELAY = 0.1
 
-        tasks.add(
-            asyncio.create_task(
-                run_container(
-                    compose,
-                    cnt["name"],
-                    deps_from_container(args, cnt),
-                    ([], "start", ["-a", cnt["name"]]),
-                    log_formatter=log_formatter,
-                ),
-                name=cnt["_service"],
-            )
-        )
+    def __init__(self, compose: PodmanCompose, socket_path: str) -> None:
+        self.compose = compose
+        self.socket_path = socket_path
+        self.records: list[dict[str, Any]] = []
+        self.containers: dict[str, ExistingContainer] = {}
+        self.image_ids: dict[str, str] = {}
+        self._stale = asyncio.Event()
+        self._refresh_lock = asyncio.Lock()
 
-    def _task_cancelled(task: Task) -> bool:
-        if task.cancelled():
-            return True
-        # Task.cancelling() is new in python 3.11
-        if sys.version_info >= (3, 11) and task.cancelling():
-            return True
-        return False
+    @property
+    def project_name(self) -> str:
+        assert self.compose.project_name is not None
+        return self.compose.project_name
 
-    exit_code = 0
-    exiting = False
-    first_failed_task = None
+    async def refresh(self) -> None:
+        async with self._refresh_lock:
+            self._stale.clear()
+            images = {s["image"] for s in self.compose.services.values() if s.get("image")}
 
-    while tasks:
-        done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            async def image_id(image: str) -> str | None:
+                try:
+                    output = await self.compose.podman.output(
+                        [], "inspect", ["-t", "image", "-f", "{{.Id}}", image]
+                    )
+                except subprocess.CalledProcessError:
+                    return None
+                return output.decode().strip()
+
+            image_ids_future = asyncio.gather(*[image_id(image) for image in images])
+            # the containers are read like `up` reads them, the records are kept as podman
+            # prints them for `ps --format json`
+            containers, output = await asyncio.gather(
+                self.compose.podman.existing_containers(self.project_name),
+                self.compose.podman.output(
+                    [],
+                    "ps",
+                    ["--filter", f"label=io.podman.compose.project={self.project_name}", "-a"]
+                    + ["--format", "json"],
+                ),
+            )
+            image_ids = await image_ids_future
+            self.records = json.loads(output)
+            self.containers = containers
+            self.image_ids = {image: id for image, id in zip(images, image_ids) if id is not None}
 
-        if args.abort_on_container_failure and first_failed_task is None:
-            # Generally a single returned item when using asyncio.FIRST_COMPLETED, but that's not
-            # guaranteed. If multiple tasks finish at the exact same time the choice of which
-            # finished "first" is arbitrary
-            for t in done:
-                if t.result() != 0:
-                    first_failed_task = t
+    async def _refresh_when_stale(self) -> None:
+        while True:
+            await self._stale.wait()
+            await asyncio.sleep(self.REFRESH_DELAY)
+            try:
+                await self.refresh()
+            except (subprocess.CalledProcessError, OSError, ValueError, PodmanComposeError) as e:
+                log.warning("could not refresh the containers: %s", e)
 
-        if args.abort_on_container_exit or first_failed_task:
-            if not exiting:
-                # If 2 containers exit at the exact same time, the cancellation of the other ones
-                # cause the status to overwrite. Sleeping for 1 seems to fix this and make it match
-                # docker-compose
+    async def _follow_events(self) -> None:
+        while True:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    self.compose.podman.podman_path,
+                    *["events", "--format", "json", "--filter", "type=container"],
+                    *["--filter", "type=image"],
+                    stdout=asyncio.subprocess.PIPE,
+                )
+            except OSError as e:
+                log.error("could not follow podman events: %s", e)
                 await asyncio.sleep(1)
-                for t in tasks:
-                    if not _task_cancelled(t):
-                        t.cancel()
-            t_: Task
-            exiting = True
-            if first_failed_task:
-                # Matches docker-compose behaviour, where the exit code of the task that triggered
-                # the cancellation is always propagated when aborting on failure
-                exit_code = first_failed_task.result()
-            else:
-                for t_ in done:
-                    if t_.get_name() == exit_code_from:
-                        exit_code = t_.result()
-    return exit_code
+                continue
+            assert process.stdout is not None
+            # the containers may have changed before the events were followed
+            self._stale.set()
+            try:
+                async for line in process.stdout:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    attributes = event.get("Attributes") or {}
+                    if (
+                        event.get("Type") != "container"
+                        or attributes.get("io.podman.compose.project") == self.project_name
+                    ):
+                        self._stale.set()
+            finally:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+            log.warning("podman events exited with %s, restarting it", await process.wait())
+            await asyncio.sleep(1)
+
+    async def _reload_on_change(self) -> None:
+        config_files, env_files = get_watched_files(self.compose)
+        watcher = FileWatcher([*config_files, *env_files])
+        try:
+            while True:
+                changed_files = await watcher.wait()
+                if not changed_files & config_files:
+                    continue
+                try:
+                    self.compose._parse_compose_file()  # pylint: disable=protected-access
+                except (Exception, SystemExit) as e:
+                    # the file may be in the middle of being edited
+                    log.error("could not parse the configuration, keeping the last one: %s", e)
+                    continue
+                log.info("reloaded the configuration")
+                config_files, env_files = get_watched_files(self.compose)
+                watcher.set_paths([*config_files, *env_files])
+                # the images of the services may have changed
+                self._stale.set()
+        finally:
+            watcher.close()
 
+    def _resolve(self, service: str, index: int) -> dict[str, Any]:
+        for c in self.containers.values():
+            if c.service_name == service and replica_number(self.project_name, c) == index:
+                cnt = self.compose.container_by_name.get(c.name, {})
+                return {"container": c.name, "environment": cnt.get("environment", {})}
+        return {"container": None, "environment": {}}
 
-def get_volume_names(compose: PodmanCompose, cnt: dict) -> list[str]:
-    basedir = compose.dirname
-    srv_name = cnt["_service"]
-    ls = []
-    for volume in cnt.get("volumes", []):
-        if isinstance(volume, str):
-            volume = parse_short_mount(volume, basedir)
-        volume = fix_mount_dict(compose, volume, srv_name)
-        mount_type = volume["type"]
-        if mount_type != "volume":
-            continue
-        volume_name = volume.get("_vol", {}).get("name")
-        ls.append(volume_name)
-    return ls
+    def _up_to_date(self, services: list[str], no_deps: bool) -> bool:
+        """
+        whether `up -d` of the services would neither create, recreate nor start a container
+        """
+        compose = self.compose
+        selected = set(services or compose.services)
+        if not selected <= compose.services.keys():
+            return False
+        if not no_deps:
+            for service in list(selected):
+                selected.update(dep.name for dep in compose.services[service].get("_deps", ()))
+        for service in selected:
+            names = compose.container_names_by_service.get(service, [])
+            if {c.name for c in self.containers.values() if c.service_name == service} != set(
+                names
+            ):
+                return False
+            config_hash = compose.config_hash(compose.services[service])
+            image = compose.services[service].get("image")
+            for name in names:
+                c = self.containers[name]
+                if c.state != "running" or c.config_hash != config_hash:
+                    return False
+                if image and self.image_ids.get(image) != c.image_id:
+                    return False
+        return True
 
+    async def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        if self._stale.is_set():
+            # answer with the containers after the last event
+            await self.refresh()
+        method = request.get("method")
+        if method == "ping":
+            return {"project_name": self.project_name}
+        if method == "ps":
+            return {"containers": self.records}
+        if method == "resolve":
+            return {
+                "project_name": self.project_name,
+                **self._resolve(request["service"], request["index"]),
+            }
+        if method == "up":
+            return {"up_to_date": self._up_to_date(request["services"], request["no_deps"])}
+        if method == "logs":
+            return {
+                "project_name": self.project_name,
+                "container_names_by_service": self.compose.container_names_by_service,
+                "containers": [
+                    {"_service": cnt["_service"], "log_prefix": cnt["log_prefix"]}
+                    for cnt in self.compose.containers
+                ],
+            }
+        return {"error": f"unknown method: {method}"}
 
-@cmd_run(podman_compose, "down", "tear down entire stack")
-async def compose_down(compose: PodmanCompose, args: argparse.Namespace) -> None:
-    excluded = get_excluded(compose, args, DependField.DEPENDENTS)
-    podman_args: list[str] = []
-    timeout_global = getattr(args, "timeout", None)
-    containers = list(reversed(compose.containers))
+    async def _serve_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            async for line in reader:
+                try:
+                    reply = await self.handle(json.loads(line))
+                except (
+                    KeyError,
+                    TypeError,
+                    ValueError,
+                    subprocess.CalledProcessError,
+                    PodmanComposeError,
+                ) as e:
+                    reply = {"error": repr(e)}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except (OSError, ValueError) as e:
+            log.debug("daemon client: %s", e)
+        finally:
+            writer.close()
 
-    down_tasks = []
-    for cnt in containers:
-        if cnt["_service"] in excluded:
-            continue
-        podman_stop_args = [*podman_args]
-        timeout = timeout_global
-        if timeout is None:
-            timeout_str = cnt.get("stop_grace_period", STOP_GRACE_PERIOD)
-            timeout = str_to_seconds(timeout_str)
-        if timeout is not None:
-            podman_stop_args.extend(["-t", str(timeout)])
-        down_tasks.append(
-            asyncio.create_task(
-                compose.podman.run([], "stop", [*podman_stop_args, cnt["name"]]), name=cnt["name"]
+    async def serve(self) -> int:
+        if await daemon_request(self.socket_path, {"method": "ping"}) is not None:
+            log.error("a daemon of the project is already listening on %s", self.socket_path)
+            return 1
+        os.makedirs(os.path.dirname(self.socket_path), mode=0o700, exist_ok=True)
+        if not is_private_dir(os.path.dirname(self.socket_path)):
+            log.error(
+                "%s is not a directory owned by the user with mode 0700, not listening on it",
+                os.path.dirname(self.socket_path),
             )
+            return 1
+        if os.path.exists(self.socket_path):
+            # left by a daemon which was killed
+            os.unlink(self.socket_path)
+        await self.refresh()
+        server = await asyncio.start_unix_server(
+            self._serve_client, self.socket_path, limit=DAEMON_LINE_LIMIT
         )
-    await asyncio.gather(*down_tasks)
-    for cnt in containers:
-        if cnt["_service"] in excluded:
-            continue
-        await compose.podman.run([], "rm", [cnt["name"]])
+        tasks = [
+            asyncio.create_task(self._follow_events()),
+            asyncio.create_task(self._refresh_when_stale()),
+            asyncio.create_task(self._reload_on_change()),
+        ]
+        print(f"serving project {self.project_name} on {self.socket_path}")
+        stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, stopped.set)
+        try:
+            async with server:
+                await stopped.wait()
+        finally:
+            loop.remove_signal_handler(signal.SIGTERM)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        return 0
 
-    orphaned_images = set()
-    if args.remove_orphans:
-        orphaned_containers = (
-            (
-                await compose.podman.output(
-                    [],
-                    "ps",
-                    [
-                        "--filter",
-                        f"label=io.podman.compose.project={compose.project_name}",
-                        "-a",
-                        "--format",
-                        "{{ .Image }} {{ .Names }}",
-                    ],
-                )
-            )
-            .decode("utf-8")
-            .splitlines()
-        )
-        orphaned_images = {item.split()[0] for item in orphaned_containers}
-        names = {item.split()[1] for item in orphaned_containers}
-        for name in names:
-            await compose.podman.run([], "stop", [*podman_args, name])
-        for name in names:
-            await compose.podman.run([], "rm", [name])
-    if args.volumes:
-        vol_names_to_keep = set()
-        for cnt in containers:
-            if cnt["_service"] not in excluded:
-                continue
-            vol_names_to_keep.update(get_volume_names(compose, cnt))
-        log.debug("keep %s", vol_names_to_keep)
-        for volume_name in await compose.podman.volume_ls():
-            if volume_name in vol_names_to_keep:
-                continue
-            await compose.podman.run([], "volume", ["rm", volume_name])
-    if args.rmi:
-        images_to_remove = set()
-        for cnt in containers:
-            if cnt["_service"] in excluded:
-                continue
-            if args.rmi == "local" and not is_local(cnt):
-                continue
-            images_to_remove.add(cnt["image"])
-        images_to_remove.update(orphaned_images)
-        log.debug("images to remove: %s", images_to_remove)
-        await compose.podman.run([], "rmi", ["--ignore", "--force"] + list(images_to_remove))
 
-    if excluded:
-        return
-    for pod in compose.pods:
-        await compose.podman.run([], "pod", ["rm", pod["name"]])
-    for network in await compose.podman.network_ls():
-        await compose.podman.run([], "network", ["rm", network])
+@cmd_run(
+    podman_compose,
+    "daemon",
+    "Keep the project in memory and answer ps, exec, cp, up -d and logs of the other commands",
+)
+async def compose_daemon(
+    compose: PodmanCompose,
+    args: argparse.Namespace,  # pylint: disable=unused-argument
+) -> int:
+    return await ProjectDaemon(compose, compose.daemon_socket).serve()
 
 
 @cmd_run(podman_compose, "ps", "show status of containers")
 async def compose_ps(compose: PodmanCompose, args: argparse.Namespace) -> None:
+    if compose.daemon_containers is not None:
+        if args.quiet:
+            for c in compose.daemon_containers:
+                print(c["Id"][:12])
+        else:
+            print(json.dumps(compose.daemon_containers, indent=4))
+        return
     ps_args = ["-a", "--filter", f"label=io.podman.compose.project={compose.project_name}"]
     if args.quiet is True:
         ps_args.extend(["--format", "{{.ID}}"])
@@ -4553,7 +8029,7 @@ async def compose_run(compose: PodmanCompose, args: argparse.Namespace) -> None:
     container_name = container_names[0]
     cnt = dict(compose.container_by_name[container_name])
     deps = cnt["_deps"]
-    if deps and not args.no_deps:
+    if deps and not args.no_deps and not await run_dependencies_ready(compose, deps):
         up_args = argparse.Namespace(
             **dict(
                 args.__dict__,
@@ -4575,10 +8051,11 @@ async def compose_run(compose: PodmanCompose, args: argparse.Namespace) -> None:
         )
         await compose.commands["up"](compose, up_args)
 
-    build_args = argparse.Namespace(
-        services=[args.service], if_not_exists=(not args.build), build_arg=[], **args.__dict__
-    )
-    await compose.commands["build"](compose, build_args)
+    if "build" in cnt:
+        build_args = argparse.Namespace(
+            services=[args.service], if_not_exists=(not args.build), build_arg=[], **args.__dict__
+        )
+        await compose.commands["build"](compose, build_args)
 
     compose_run_update_container_from_args(compose, cnt, args)
     # run podman
@@ -4591,6 +8068,31 @@ async def compose_run(compose: PodmanCompose, args: argparse.Namespace) -> None:
     sys.exit(p)
 
 
+async def run_dependencies_ready(compose: PodmanCompose, deps: set[ServiceDependency]) -> bool:
+    """
+    whether all containers of the dependencies are running with the current configuration,
+    looked up with a single `podman ps`; `run` does not need to bring them up then
+    """
+    assert compose.project_name is not None
+    try:
+        existing_containers = await compose.podman.existing_containers(compose.project_name)
+    except (subprocess.CalledProcessError, ValueError) as e:
+        log.debug("could not list the existing containers: %s", e)
+        return False
+    for dep in deps:
+        service = compose.services.get(dep.name)
+        if service is None:
+            return False
+        config_hash = compose.config_hash(service)
+        for name in compose.container_names_by_service[dep.name]:
+            c = existing_containers.get(name)
+            if c is None or c.state != "running" or c.config_hash != config_hash:
+                log.debug("dependency %s is not running with the current configuration", name)
+                return False
+    log.debug("dependencies are running, skipping up")
+    return True
+
+
 def compose_run_update_container_from_args(
     compose: PodmanCompose, cnt: dict, args: argparse.Namespace
 ) -> None:
@@ -4615,7 +8117,7 @@ def compose_run_update_container_from_args(
             except KeyError:
                 pass
     if args.publish:
-        ports = cnt.get("ports", [])
+        ports = list(cnt.get("ports", []))
         ports.extend(norm_ports(args.publish))
         cnt["ports"] = ports
     if args.volume:
@@ -4635,27 +8137,79 @@ def compose_run_update_container_from_args(
     podman_compose, "cp", "copy files/folders between a service container and the local filesystem"
 )
 async def compose_cp(compose: PodmanCompose, args: argparse.Namespace) -> None:
-    if ':' in args.src and ':' not in args.dst:
-        service = args.src.split(':', 1)[0]
-    elif ':' in args.dst and ':' not in args.src:
-        service = args.dst.split(':', 1)[0]
-    else:
-        raise ValueError(
-            f"Invalid copy arguments format: source = {args.src}, destination = {args.dst}."
-        )
-    compose.assert_services(service)
-    container_names = compose.container_names_by_service[service]
-    podman_args = compose_cp_args(container_names[0], args)
+    container_name = compose.resolved_container
+    if container_name is None:
+        service = compose_cp_service(args)
+        compose.assert_services(service)
+        container_names = compose.container_names_by_service[service]
+        if args.all_replicas:
+            sys.exit(await compose_cp_to_all_replicas(compose, args, container_names))
+        if not 0 < args.index <= len(container_names):
+            log.error("service %s has no container with index %d", service, args.index)
+            sys.exit(1)
+        container_name = container_names[args.index - 1]
+    podman_args = compose_cp_args(container_name, args)
     p = await compose.podman.run([], "cp", podman_args)
     sys.exit(p)
 
 
-def compose_cp_args(container_name: str, args: argparse.Namespace) -> list[str]:
+async def compose_cp_to_all_replicas(
+    compose: PodmanCompose, args: argparse.Namespace, container_names: list[str]
+) -> int:
+    """
+    pack the source once and extract the archive in every replica with `podman cp -`
+    """
+    if ":" in args.src:
+        log.error("--all-replicas only copies from the host to the containers")
+        return 1
+    cnt_path = args.dst.split(":", 1)[1]
+    if cnt_path.endswith("/"):
+        # copy into the directory, like `podman cp` does for an existing directory
+        extract_dir, arcname = cnt_path, os.path.basename(os.path.normpath(args.src))
+    else:
+        extract_dir, arcname = posixpath.split(cnt_path)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive = os.path.join(tmp_dir, "cp.tar")
+        with tarfile.open(archive, "w") as tar:
+            tar.add(args.src, arcname=arcname)
+
+        async def copy_to(container_name: str) -> int | None:
+            podman_args = [*compose_cp_options(args), "-", f"{container_name}:{extract_dir or '/'}"]
+            with open(archive, "rb") as f:
+                return await compose.podman.run([], "cp", podman_args, stdin=f)
+
+        exit_codes = await asyncio.gather(*[copy_to(name) for name in container_names])
+    failed = [
+        f"{name} ({exit_code})"
+        for name, exit_code in zip(container_names, exit_codes)
+        if exit_code is not None and exit_code != 0
+    ]
+    if failed:
+        log.error("copy failed for %d of %d containers: %s", len(failed), len(exit_codes), failed)
+    return next((exit_code for exit_code in exit_codes if exit_code), 0)
+
+
+def compose_cp_service(args: argparse.Namespace) -> str:
+    if ':' in args.src and ':' not in args.dst:
+        return args.src.split(':', 1)[0]
+    if ':' in args.dst and ':' not in args.src:
+        return args.dst.split(':', 1)[0]
+    raise ValueError(
+        f"Invalid copy arguments format: source = {args.src}, destination = {args.dst}."
+    )
+
+
+def compose_cp_options(args: argparse.Namespace) -> list[str]:
     podman_args = []
     if args.archive:
         podman_args += ["--archive"]
     if args.overwrite:
         podman_args += ["--overwrite"]
+    return podman_args
+
+
+def compose_cp_args(container_name: str, args: argparse.Namespace) -> list[str]:
+    podman_args = compose_cp_options(args)
 
     # Determine which argument has the colon so we know the direction
     if ':' in args.src:
@@ -4672,24 +8226,82 @@ def compose_cp_args(container_name: str, args: argparse.Namespace) -> list[str]:
 
 @cmd_run(podman_compose, "exec", "execute a command in a running container")
 async def compose_exec(compose: PodmanCompose, args: argparse.Namespace) -> None:
-    compose.assert_services(args.service)
-    container_names = compose.container_names_by_service[args.service]
-    container_name = container_names[args.index - 1]
-    cnt = compose.container_by_name[container_name]
+    if args.services or args.all_replicas:
+        sys.exit(await compose_exec_fan_out(compose, args))
+    container_name = compose.resolved_container
+    if container_name is None:
+        compose.assert_services(args.service)
+        container_names = compose.container_names_by_service[args.service]
+        container_name = container_names[args.index - 1]
+        cnt = compose.container_by_name[container_name]
+    else:
+        # only the environment is needed from the compose files
+        cnt = {"environment": compose.resolved_environment}
     podman_args = compose_exec_args(cnt, container_name, args)
     p = await compose.podman.run([], "exec", podman_args)
     sys.exit(p)
 
 
-def compose_exec_args(cnt: dict, container_name: str, args: argparse.Namespace) -> list[str]:
-    podman_args = ["--interactive"]
+async def compose_exec_fan_out(compose: PodmanCompose, args: argparse.Namespace) -> int:
+    """
+    run the command concurrently in the selected replicas of several services, with the output
+    prefixed by the replica and a summary of the exit codes
+    """
+    services = args.services or [args.service]
+    compose.assert_services(services)
+    containers = [
+        compose.container_by_name[name]
+        for service in services
+        for i, name in enumerate(compose.container_names_by_service[service], start=1)
+        if args.all_replicas or i == args.index
+    ]
+    if not containers:
+        log.error("no container with index %d", args.index)
+        return 1
+
+    max_prefix_length = max(len(cnt["log_prefix"]) for cnt in containers)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def exec_in(i: int, cnt: dict[str, Any]) -> int | None:
+        color = compose.console_colors[i % len(compose.console_colors)]
+        space_suffix = " " * (max_prefix_length - len(cnt["log_prefix"]) + 1)
+        log_formatter = f"{color}[{cnt['log_prefix']}]{space_suffix}|\x1b[0m"
+        podman_args = compose_exec_args(cnt, cnt["name"], args, interactive=False)
+        async with semaphore:
+            return await compose.podman.run([], "exec", podman_args, log_formatter=log_formatter)
+
+    exit_codes = await asyncio.gather(*[exec_in(i, cnt) for i, cnt in enumerate(containers)])
+    failed = [
+        (cnt["name"], exit_code)
+        for cnt, exit_code in zip(containers, exit_codes)
+        if exit_code is not None and exit_code != 0
+    ]
+    print_table([
+        ["CONTAINER", "EXIT CODE"],
+        *([cnt["name"], str(exit_code)] for cnt, exit_code in zip(containers, exit_codes)),
+    ])
+    if failed:
+        log.error(
+            "command failed in %d of %d containers: %s",
+            len(failed),
+            len(containers),
+            ", ".join(f"{name} ({exit_code})" for name, exit_code in failed),
+        )
+        return failed[0][1]
+    return 0
+
+
+def compose_exec_args(
+    cnt: dict, container_name: str, args: argparse.Namespace, interactive: bool = True
+) -> list[str]:
+    podman_args = ["--interactive"] if interactive else []
     if args.privileged:
         podman_args += ["--privileged"]
     if args.user:
         podman_args += ["--user", args.user]
     if args.workdir:
         podman_args += ["--workdir", args.workdir]
-    if not args.T:
+    if not args.T and interactive:
         podman_args += ["--tty"]
     env = dict(cnt.get("environment", {}))
     if args.env:
@@ -4705,36 +8317,142 @@ def compose_exec_args(cnt: dict, container_name: str, args: argparse.Namespace)
     return podman_args
 
 
+def get_stop_timeout_args(
+    compose: PodmanCompose, args: argparse.Namespace, container_name: str
+) -> list[str]:
+    timeout = getattr(args, "timeout", None)
+    if timeout is None:
+        timeout_str = compose.container_by_name[container_name].get(
+            "stop_grace_period", STOP_GRACE_PERIOD
+        )
+        timeout = str_to_seconds(timeout_str)
+    if timeout is not None:
+        return ["-t", str(timeout)]
+    return []
+
+
+async def stop_services_in_order(
+    compose: PodmanCompose, args: argparse.Namespace, services: list[str]
+) -> None:
+    """stop dependents before the services they depend on"""
+
+    async def stop_service(service: str) -> None:
+        targets = compose.container_names_by_service[service]
+        await asyncio.gather(*[
+            compose.podman.run([], "stop", get_stop_timeout_args(compose, args, target) + [target])
+            for target in reversed(targets)
+        ])
+
+    await run_in_dependency_order(compose, services, DependField.DEPENDENTS, stop_service)
+
+
+async def start_services_in_order(compose: PodmanCompose, services: list[str]) -> None:
+    """
+    start dependencies first, waiting for the conditions of each service on them before
+    starting it
+    """
+    levels = dependency_levels(compose, services, DependField.DEPENDENCIES)
+
+    async def start_service(service: str) -> None:
+        # only wait for services started by us, others are left as they are
+        deps = {
+            dep
+            for dep in compose.services[service].get(DependField.DEPENDENCIES, set())
+            if dep.name in levels and levels[dep.name] < levels[service]
+        }
+        await check_dep_conditions(compose, deps)
+        await asyncio.gather(*[
+            compose.podman.run([], "start", [target])
+            for target in compose.container_names_by_service[service]
+        ])
+
+    await run_in_dependency_order(compose, services, DependField.DEPENDENCIES, start_service)
+
+
+async def wait_containers_ready(compose: PodmanCompose, container_names: list[str]) -> None:
+    """wait for containers to be healthy if they have a healthcheck, running otherwise"""
+    skip_healthy = compose.podman_version is not None and strverscmp_lt(
+        compose.podman_version, "4.6.0"
+    )
+    conditions = []
+    for name in container_names:
+        if "healthcheck" in compose.container_by_name[name] and not skip_healthy:
+            conditions.append((name, ServiceDependencyCondition.HEALTHY))
+        else:
+            conditions.append((name, ServiceDependencyCondition.RUNNING))
+    await asyncio.gather(*[
+        wait_container_condition(compose, name, condition) for name, condition in conditions
+    ])
+
+
+def readiness_timeout(cnt: dict[str, Any]) -> int:
+    """
+    seconds until podman gives up on the healthcheck of the container, using podman's
+    defaults for what is not set
+    """
+    healthcheck = cnt.get("healthcheck")
+    if not healthcheck or healthcheck.get("disable"):
+        return ROLLING_RUNNING_TIMEOUT
+    start_period = str_to_seconds(healthcheck.get("start_period")) or 0
+    interval = str_to_seconds(healthcheck.get("interval")) or 30
+    timeout = str_to_seconds(healthcheck.get("timeout")) or 30
+    retries = int(healthcheck.get("retries", 3))
+    return start_period + (interval + timeout) * retries
+
+
+async def restart_services_rolling(
+    compose: PodmanCompose, args: argparse.Namespace, services: list[str]
+) -> int:
+    """
+    restart the replicas of each service in batches, the next batch is only restarted
+    once the previous one is running|healthy again, the restart stops at a batch which is
+    not ready within --wait-timeout
+    """
+    batch_size = max(1, args.rolling_batch_size)
+    levels = dependency_levels(compose, services, DependField.DEPENDENCIES)
+    for service in sorted(services, key=lambda service: levels[service]):
+        names = compose.container_names_by_service[service]
+        for i in range(0, len(names), batch_size):
+            batch = names[i : i + batch_size]
+            log.info("restarting %s", " ".join(batch))
+            await compose.podman.run(
+                [], "restart", get_stop_timeout_args(compose, args, batch[0]) + batch
+            )
+            timeout = getattr(args, "wait_timeout", None)
+            if timeout is None:
+                timeout = max(readiness_timeout(compose.container_by_name[name]) for name in batch)
+            try:
+                await wait_with_timeout(wait_containers_ready(compose, batch), timeout)
+            except TimeoutError:
+                log.error(
+                    "%s did not become running|healthy within %d seconds, "
+                    "stopping the rolling restart",
+                    " ".join(batch),
+                    timeout,
+                )
+                return 1
+    return 0
+
+
 async def transfer_service_status(
     compose: PodmanCompose, args: argparse.Namespace, action: str
-) -> None:
-    # TODO: handle dependencies, handle creations
+) -> int | None:
+    # TODO: handle creations
     container_names_by_service = compose.container_names_by_service
     if not args.services:
         args.services = container_names_by_service.keys()
     compose.assert_services(args.services)
-    targets = []
     for service in args.services:
         if service not in container_names_by_service:
             raise ValueError("unknown service: " + service)
-        targets.extend(container_names_by_service[service])
+    services = list(dict.fromkeys(args.services))
+    if action == "restart" and getattr(args, "rolling", False):
+        return await restart_services_rolling(compose, args, services)
     if action in ["stop", "restart"]:
-        targets = list(reversed(targets))
-    timeout_global = getattr(args, "timeout", None)
-    tasks = []
-    for target in targets:
-        podman_args = []
-        if action != "start":
-            timeout = timeout_global
-            if timeout is None:
-                timeout_str = compose.container_by_name[target].get(
-                    "stop_grace_period", STOP_GRACE_PERIOD
-                )
-                timeout = str_to_seconds(timeout_str)
-            if timeout is not None:
-                podman_args.extend(["-t", str(timeout)])
-        tasks.append(asyncio.create_task(compose.podman.run([], action, podman_args + [target])))
-    await asyncio.gather(*tasks)
+        await stop_services_in_order(compose, args, services)
+    if action in ["start", "restart"]:
+        await start_services_in_order(compose, services)
+    return None
 
 
 @cmd_run(podman_compose, "start", "start specific services")
@@ -4751,8 +8469,8 @@ async def compose_stop(compose: PodmanCompose, args: argparse.Namespace) -> None
 
 
 @cmd_run(podman_compose, "restart", "restart specific services")
-async def compose_restart(compose: PodmanCompose, args: argparse.Namespace) -> None:
-    await transfer_service_status(compose, args, "restart")
+async def compose_restart(compose: PodmanCompose, args: argparse.Namespace) -> int | None:
+    return await transfer_service_status(compose, args, "restart")
 
 
 @cmd_run(podman_compose, "logs", "show logs from services")
@@ -4958,6 +8676,15 @@ def compose_version_parse(parser: argparse.ArgumentParser) -> None:
 
 @cmd_parse(podman_compose, "up")
 def compose_up_parse(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--replace-strategy",
+        choices=["stop-first", "start-first"],
+        default="stop-first",
+        help="How changed containers are recreated. `stop-first` removes the old containers "
+        "before creating the new ones. `start-first` starts each new replica under a temporary "
+        "name and waits for it to be running|healthy before removing the old one, for services "
+        "without container_name, fixed host ports, pod or existing dependents.",
+    )
     parser.add_argument(
         "-d",
         "--detach",
@@ -5047,6 +8774,16 @@ def compose_up_parse(parser: argparse.ArgumentParser) -> None:
         help="Scale SERVICE to NUM instances. "
         "Overrides the `scale` setting in the Compose file if present.",
     )
+    parser.add_argument(
+        "--replica-strategy",
+        choices=["create", "clone"],
+        default="create",
+        help="How the replicas of a service are created: `create` each one from the compose "
+        "file, or `clone` the replicas 2..N concurrently with `podman container clone`. "
+        "Unlike created replicas, cloned replicas have no "
+        "com.docker.compose.container-number label: podman-compose reads their number "
+        "from the container name, other tools filtering on the label do not see it.",
+    )
     parser.add_argument(
         "--exit-code-from",
         metavar="SERVICE",
@@ -5086,6 +8823,13 @@ def compose_down_parse(parser: argparse.ArgumentParser) -> None:
         help="Remove images used by services. `local` remove only images that don't have a "
         "custom tag. (`local` or `all`)",
     )
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="When no services are given, remove the whole project with `podman pod stop` and "
+        "`podman pod rm -f` (or a single `podman rm -f`) instead of stopping and removing each "
+        "service in dependency order.",
+    )
 
 
 @cmd_parse(podman_compose, "run")
@@ -5209,7 +8953,28 @@ def compose_exec_parse(parser: argparse.ArgumentParser) -> None:
         default=None,
         help="Working directory inside the container",
     )
-    parser.add_argument("service", metavar="service", nargs=None, help="service name")
+    parser.add_argument(
+        "--all-replicas",
+        action="store_true",
+        help="Run the command in every replica of the service(s) instead of the one at --index",
+    )
+    parser.add_argument(
+        "--services",
+        metavar="SERVICE[,SERVICE...]",
+        type=lambda value: [service for service in value.split(",") if service],
+        default=None,
+        help="Run the command in the given services, no service argument is given then",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=positive_int,
+        default=10,
+        help="Number of containers the command runs in at once with --all-replicas or --services "
+        "(default: 10)",
+    )
+    parser.add_argument(
+        "service", metavar="service", nargs="?", help="service name, not given with --services"
+    )
     parser.add_argument(
         "cnt_command",
         metavar="command",
@@ -5233,6 +8998,18 @@ def compose_parse_cp(parser: argparse.ArgumentParser) -> None:
         help="Allow to overwrite directories with non-directories and vice versa (default=None)",
         default=None,
     )
+    parser.add_argument(
+        "--index",
+        type=int,
+        default=1,
+        help="Index of the container if there are multiple instances of a service",
+    )
+    parser.add_argument(
+        "--all-replicas",
+        action="store_true",
+        help="Copy from the host to every replica of the service, the source is packed once and "
+        "streamed to each of them. A destination ending with / is a directory to copy into.",
+    )
     parser.add_argument(
         "src",
         metavar="SOURCE",
@@ -5247,7 +9024,79 @@ def compose_parse_cp(parser: argparse.ArgumentParser) -> None:
     )
 
 
-@cmd_parse(podman_compose, ["down", "stop", "restart"])
+@cmd_parse(podman_compose, "restart")
+def compose_restart_parse(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--rolling",
+        action="store_true",
+        help="Restart the replicas of each service one batch at a time, waiting for a batch to "
+        "be running|healthy before restarting the next one.",
+    )
+    parser.add_argument(
+        "--rolling-batch-size",
+        type=int,
+        default=1,
+        help="Number of replicas restarted at once with --rolling (default: 1)",
+    )
+    parser.add_argument(
+        "--wait-timeout",
+        type=int,
+        default=None,
+        help="Maximum duration in seconds to wait for a batch to be running|healthy with "
+        "--rolling (default: derived from the healthcheck)",
+    )
+
+
+@cmd_parse(podman_compose, "watch")
+def compose_watch_parse(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--no-up", action="store_true", help="Do not bring the services up before watching"
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="Poll the files for changes instead of using inotify",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between two polls of the files when inotify is not used (default: 1)",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.5,
+        help="Seconds without changes to wait for before handling a batch of changes "
+        "(default: 0.5)",
+    )
+    parser.add_argument(
+        "services",
+        metavar="services",
+        nargs="*",
+        default=None,
+        help="only watch and recreate these services",
+    )
+
+
+@cmd_parse(podman_compose, "scale")
+def compose_scale_parse(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--no-deps", action="store_true", help="Don't start linked services when adding replicas."
+    )
+    parser.add_argument(
+        "--no-start", action="store_true", help="Create the added replicas without starting them."
+    )
+    parser.add_argument(
+        "scale",
+        metavar="SERVICE=NUM",
+        nargs="+",
+        help="Number of replicas to run for SERVICE; only the missing replicas are created and "
+        "only the surplus highest-numbered ones are stopped and removed.",
+    )
+
+
+@cmd_parse(podman_compose, ["down", "stop", "restart", "scale"])
 def compose_parse_timeout(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
         "-t",
@@ -5303,9 +9152,66 @@ def compose_systemd_parse(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
         "-a",
         "--action",
-        choices=["register", "unregister", "create-unit", "list", "ls"],
+        choices=["register", "unregister", "create-unit", "generate-units", "list", "ls"],
         default="register",
-        help="create systemd unit file or register compose stack to it",
+        help="create systemd unit file or register compose stack to it, or generate a unit "
+        "per container ordered by the dependencies of the services",
+    )
+    parser.add_argument(
+        "--unit-dir",
+        default="~/.config/systemd/user",
+        help="directory generate-units writes the units to (default: ~/.config/systemd/user)",
+    )
+
+
+@cmd_parse(podman_compose, "quadlet")
+def compose_quadlet_parse(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--output",
+        default="~/.config/containers/systemd",
+        help="directory the Quadlet files are written to (default: ~/.config/containers/systemd)",
+    )
+
+
+@cmd_parse(podman_compose, "kube")
+def compose_kube_parse(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("action", choices=["generate"], help="generate the Kubernetes YAML")
+    parser.add_argument(
+        "--kind",
+        choices=["Pod", "Deployment"],
+        default="Pod",
+        help="run the services in a Pod, or in the pod template of a Deployment (default: Pod)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="-",
+        help="file the YAML is written to (default: standard output)",
+    )
+
+
+@cmd_parse(podman_compose, "plan")
+def compose_plan_parse(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="-",
+        help="file the plan is written to (default: standard output)",
+    )
+
+
+@cmd_parse(podman_compose, "apply")
+def compose_apply_parse(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("plan", help="file with the plan written by plan, - for standard input")
+
+
+@cmd_parse(podman_compose, "all")
+def compose_all_parse(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "command_args",
+        metavar="command",
+        nargs=argparse.REMAINDER,
+        help="the command and its options, like up -d",
     )
 
 
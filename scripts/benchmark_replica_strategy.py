@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: GPL-2.0
+"""
+Compare `up --replica-strategy=create` and `up --replica-strategy=clone` for a service with many
+replicas. podman is replaced by a stand-in script which only sleeps to simulate the latency of
+`podman create` and `podman container clone`, so only the work done by podman-compose and the
+number of sequential podman calls are measured.
+
+    python3 scripts/benchmark_replica_strategy.py --replicas 100 --create-latency 0.1
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+STAND_IN_PODMAN = """#!/bin/sh
+case "$*" in
+  --version) echo "podman version 5.2.0";;
+  create*) sleep {create_latency};;
+  "container clone"*) sleep {clone_latency};;
+  ps*) ;;
+  *json*) echo "[]";;
+esac
+exit 0
+"""
+
+COMPOSE_FILE = """services:
+  worker:
+    image: busybox
+    command: ["sleep", "infinity"]
+    environment:
+      A: "1"
+    labels:
+      a: b
+    volumes:
+      - data:/data
+    scale: {replicas}
+volumes:
+  data: {{}}
+"""
+
+
+def run_up(podman_compose: str, work_dir: str, podman_path: str, strategy: str) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [
+            sys.executable,
+            podman_compose,
+            "--podman-path",
+            podman_path,
+            "--in-pod=false",
+            "-f",
+            os.path.join(work_dir, "docker-compose.yml"),
+            "up",
+            "-d",
+            "--no-start",
+            f"--replica-strategy={strategy}",
+        ],
+        check=True,
+        cwd=work_dir,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--replicas", type=int, default=50)
+    parser.add_argument("--create-latency", type=float, default=0.1)
+    parser.add_argument("--clone-latency", type=float, default=0.1)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    podman_compose = os.path.join(os.path.dirname(__file__), "..", "podman_compose.py")
+    with tempfile.TemporaryDirectory() as work_dir:
+        podman_path = os.path.join(work_dir, "podman")
+        with open(podman_path, "w", encoding="utf-8") as f:
+            f.write(
+                STAND_IN_PODMAN.format(
+                    create_latency=args.create_latency, clone_latency=args.clone_latency
+                )
+            )
+        os.chmod(podman_path, 0o755)
+        with open(os.path.join(work_dir, "docker-compose.yml"), "w", encoding="utf-8") as f:
+            f.write(COMPOSE_FILE.format(replicas=args.replicas))
+
+        print(
+            f"{args.replicas} replicas, create {args.create_latency}s, "
+            f"clone {args.clone_latency}s, median of {args.rounds} rounds"
+        )
+        for strategy in ("create", "clone"):
+            timings = [
+                run_up(podman_compose, work_dir, podman_path, strategy) for _ in range(args.rounds)
+            ]
+            print(f"{strategy:>8}: {statistics.median(timings):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import io
+import os
+import tarfile
+import unittest
+from typing import IO
+from typing import Any
+from typing import Optional
+from unittest import mock
+
+from podman_compose import compose_cp
+from podman_compose import podman_compose
+from tests.unit.test_utils import ComposeFileTestCase
+
+
+class TestComposeCpAllReplicas(ComposeFileTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.parse({"services": {"web": {"image": "busybox", "scale": 3}}})
+        self.src = os.path.join(self.dir, "bundle")
+        os.makedirs(os.path.join(self.src, "conf.d"))
+        for name in ("app.conf", "conf.d/extra.conf"):
+            with open(os.path.join(self.src, name), "w", encoding="utf-8") as f:
+                f.write(name)
+        self.calls: list[list[str]] = []
+        self.archives: list[list[str]] = []
+
+        async def podman_run(
+            podman_args: list[str],
+            cmd: str,
+            cmd_args: list[str],
+            stdin: Optional[IO[bytes]] = None,
+        ) -> int:
+            self.calls.append([cmd, *cmd_args])
+            if stdin is not None:
+                with tarfile.open(fileobj=io.BytesIO(stdin.read())) as tar:
+                    self.archives.append(sorted(tar.getnames()))
+            return 0
+
+        self.compose.podman = mock.Mock(run=mock.AsyncMock(side_effect=podman_run))
+
+    async def cp(self, *argv: str) -> Any:
+        args = podman_compose._parse_args(["cp", *argv])
+        with self.assertRaises(SystemExit) as cm:
+            await compose_cp(self.compose, args)
+        return cm.exception.code
+
+    async def test_directory_to_all_replicas(self) -> None:
+        exit_code = await self.cp("--all-replicas", self.src, "web:/etc/")
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(
+            sorted(self.calls),
+            [["cp", "--archive", "-", f"p_web_{i}:/etc/"] for i in (1, 2, 3)],
+        )
+        self.assertEqual(
+            self.archives,
+            [["bundle", "bundle/app.conf", "bundle/conf.d", "bundle/conf.d/extra.conf"]] * 3,
+        )
+
+    async def test_file_to_all_replicas_with_new_name(self) -> None:
+        await self.cp("--all-replicas", os.path.join(self.src, "app.conf"), "web:/etc/web.conf")
+
+        self.assertEqual(self.calls[0], ["cp", "--archive", "-", "p_web_1:/etc"])
+        self.assertEqual(self.archives, [["web.conf"]] * 3)
+
+    async def test_all_replicas_only_from_host(self) -> None:
+        self.assertEqual(await self.cp("--all-replicas", "web:/etc/hosts", "."), 1)
+        self.assertEqual(self.calls, [])
+
+    async def test_index_from_container(self) -> None:
+        await self.cp("--index=2", "web:/var/log/app.log", ".")
+
+        self.assertEqual(self.calls, [["cp", "--archive", "p_web_2:/var/log/app.log", "."]])
+
+    async def test_missing_index(self) -> None:
+        self.assertEqual(await self.cp("--index=4", "web:/var/log/app.log", "."), 1)
@@ -0,0 +1,268 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import asyncio
+import io
+import json
+import os
+import unittest
+from contextlib import redirect_stdout
+from typing import Any
+from unittest import mock
+
+from podman_compose import ExistingContainer
+from podman_compose import PodmanCompose
+from podman_compose import ProjectDaemon
+from podman_compose import daemon_request
+from podman_compose import daemon_socket_path
+from podman_compose import is_private_dir
+from podman_compose import podman_compose
+from tests.unit.test_utils import ComposeFileTestCase
+
+
+class TestProjectDaemon(ComposeFileTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.parse({
+            "services": {
+                "web": {"image": "busybox", "scale": 2, "environment": {"A": "1"}},
+                "db": {"image": "postgres"},
+                "api": {"image": "busybox", "depends_on": ["db"]},
+            },
+        })
+        self.image_ids = {"busybox": "b1", "postgres": "p1"}
+        self.ps = self.records()
+
+        async def output(podman_args: list[str], cmd: str, cmd_args: list[str]) -> bytes:
+            if cmd == "ps":
+                return json.dumps(self.ps).encode()
+            return self.image_ids[cmd_args[-1]].encode()
+
+        async def existing_containers(project_name: str) -> dict[str, ExistingContainer]:
+            self.assertEqual(project_name, "p")
+            return {c.name: c for c in map(ExistingContainer.from_ps, self.ps)}
+
+        self.compose.podman = mock.Mock(
+            output=mock.AsyncMock(side_effect=output),
+            existing_containers=mock.AsyncMock(side_effect=existing_containers),
+        )
+        self.socket_path = os.path.join(self.dir, "run", "p.sock")
+        self.daemon = ProjectDaemon(self.compose, self.socket_path)
+
+    def records(self, **overrides: dict[str, Any]) -> list[dict[str, Any]]:
+        records = []
+        for name, service in (
+            ("p_web_1", "web"),
+            ("p_web_2", "web"),
+            ("p_db_1", "db"),
+            ("p_api_1", "api"),
+        ):
+            service_desc = self.compose.services[service]
+            record = {
+                "Id": f"{name}-id",
+                "Names": [name],
+                "ImageID": self.image_ids[service_desc["image"]],
+                "State": "running",
+                "Labels": {
+                    "io.podman.compose.project": "p",
+                    "io.podman.compose.service": service,
+                    "io.podman.compose.config-hash": self.compose.config_hash(service_desc),
+                },
+            }
+            record.update(overrides.get(name, {}))
+            records.append(record)
+        return records
+
+    async def up_to_date(self, *services: str, no_deps: bool = False) -> bool:
+        reply = await self.daemon.handle({
+            "method": "up",
+            "services": list(services),
+            "no_deps": no_deps,
+        })
+        return reply["up_to_date"]
+
+    def test_environment_label(self) -> None:
+        # `exec` may only skip the compose files for services without an environment
+        label = "io.podman.compose.environment=none"
+        self.assertIn(label, self.compose.container_by_name["p_db_1"]["labels"])
+        self.assertNotIn(label, self.compose.container_by_name["p_web_1"]["labels"])
+
+    async def test_up_to_date(self) -> None:
+        await self.daemon.refresh()
+
+        self.assertTrue(await self.up_to_date())
+        self.assertTrue(await self.up_to_date("api"))
+        self.assertFalse(await self.up_to_date("missing"))
+
+    async def test_stopped_dependency(self) -> None:
+        self.ps = self.records(p_db_1={"State": "exited"})
+        await self.daemon.refresh()
+
+        self.assertFalse(await self.up_to_date("api"))
+        self.assertTrue(await self.up_to_date("api", no_deps=True))
+
+    async def test_outdated_containers(self) -> None:
+        for ps in (
+            self.records(p_web_2={"Labels": {"io.podman.compose.service": "web"}}),
+            self.records()[1:],
+        ):
+            self.ps = ps
+            await self.daemon.refresh()
+
+            self.assertFalse(await self.up_to_date("web"))
+
+        self.ps = self.records()
+        self.image_ids["busybox"] = "b2"
+        await self.daemon.refresh()
+
+        self.assertFalse(await self.up_to_date("web"))
+        self.assertTrue(await self.up_to_date("db"))
+
+    async def test_stale_containers_are_refreshed(self) -> None:
+        await self.daemon.refresh()
+        self.ps = self.records()[:1]
+        self.daemon._stale.set()
+
+        reply = await self.daemon.handle({"method": "ps"})
+
+        self.assertEqual([c["Names"] for c in reply["containers"]], [["p_web_1"]])
+
+    async def test_serve(self) -> None:
+        with mock.patch.object(ProjectDaemon, "_follow_events"), mock.patch.object(
+            ProjectDaemon, "_reload_on_change"
+        ):
+            with redirect_stdout(io.StringIO()):
+                task = asyncio.create_task(self.daemon.serve())
+                for _ in range(500):
+                    if os.path.exists(self.socket_path):
+                        break
+                    await asyncio.sleep(0.01)
+
+            reply = await daemon_request(self.socket_path, {"method": "ps"})
+            self.assertEqual(len((reply or {})["containers"]), 4)
+            reply = await daemon_request(
+                self.socket_path, {"method": "resolve", "service": "web", "index": 2}
+            )
+            self.assertEqual(
+                reply, {"project_name": "p", "container": "p_web_2", "environment": {"A": "1"}}
+            )
+            self.assertIsNone(await daemon_request(self.socket_path, {"method": "nope"}))
+            with self.assertLogs("podman_compose", "ERROR"):
+                self.assertEqual(await ProjectDaemon(self.compose, self.socket_path).serve(), 1)
+
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        self.assertFalse(os.path.exists(self.socket_path))
+        self.assertIsNone(await daemon_request(self.socket_path, {"method": "ps"}))
+
+    async def test_shared_socket_directory_is_refused(self) -> None:
+        socket_dir = os.path.dirname(self.socket_path)
+        os.makedirs(socket_dir, mode=0o755)
+        os.chmod(socket_dir, 0o755)
+
+        with self.assertLogs("podman_compose", "ERROR"):
+            self.assertEqual(await self.daemon.serve(), 1)
+        self.assertFalse(os.path.exists(self.socket_path))
+
+        open(self.socket_path, "w", encoding="utf-8").close()
+        with mock.patch("asyncio.open_unix_connection") as connect, self.assertLogs(
+            "podman_compose", "WARNING"
+        ):
+            self.assertIsNone(await daemon_request(self.socket_path, {"method": "ps"}))
+        connect.assert_not_called()
+
+    def test_is_private_dir(self) -> None:
+        path = os.path.join(self.dir, "private")
+        os.mkdir(path, 0o700)
+        os.chmod(path, 0o700)
+        link = os.path.join(self.dir, "link")
+        os.symlink(path, link)
+
+        self.assertTrue(is_private_dir(path))
+        self.assertFalse(is_private_dir(link))
+        self.assertFalse(is_private_dir(os.path.join(self.dir, "missing")))
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            self.assertFalse(is_private_dir(path))
+
+
+class TestDaemonClient(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.compose = PodmanCompose()
+        self.compose.commands = podman_compose.commands
+        self.podman_run = mock.AsyncMock(return_value=0)
+        self.podman = mock.Mock(run=self.podman_run)
+
+    async def run_compose(self, argv: list[str], reply: dict[str, Any]) -> tuple[Any, str, Any]:
+        stdout = io.StringIO()
+        with mock.patch("podman_compose.Podman", return_value=self.podman), mock.patch(
+            "podman_compose.read_cached_podman_version", return_value="5.0.0"
+        ), mock.patch.object(PodmanCompose, "_parse_compose_file") as parse, mock.patch(
+            "podman_compose.daemon_request", return_value=reply
+        ) as request:
+            exit_code = None
+            with redirect_stdout(stdout):
+                try:
+                    await self.compose.run(argv)
+                except SystemExit as e:
+                    exit_code = e.code
+        parse.assert_not_called()
+        return exit_code, stdout.getvalue(), request
+
+    async def test_ps(self) -> None:
+        containers = [{"Id": "0123456789abcdef", "Names": ["p_web_1"]}]
+
+        _, stdout, _ = await self.run_compose(["ps", "-q"], {"containers": containers})
+        self.assertEqual(stdout, "0123456789ab\n")
+
+        self.compose.daemon_containers = None
+        _, stdout, _ = await self.run_compose(
+            ["ps", "--format", "json"], {"containers": containers}
+        )
+        self.assertEqual(json.loads(stdout), containers)
+
+    async def test_up_to_date(self) -> None:
+        exit_code, _, request = await self.run_compose(
+            ["up", "-d", "--no-deps", "web"], {"up_to_date": True}
+        )
+
+        self.assertEqual(exit_code, 0)
+        request.assert_called_once_with(
+            self.compose.daemon_socket, {"method": "up", "services": ["web"], "no_deps": True}
+        )
+        self.podman_run.assert_not_called()
+
+    async def test_up_with_options_parses_the_project(self) -> None:
+        for argv in (["up", "web"], ["up", "-d", "--force-recreate"], ["up", "-d", "--build"]):
+            args = podman_compose._parse_args(argv)
+            with mock.patch("podman_compose.daemon_request") as request:
+                self.assertFalse(await self.compose._ask_daemon(args))
+            request.assert_not_called()
+
+    async def test_logs(self) -> None:
+        reply = {
+            "project_name": "p",
+            "container_names_by_service": {"web": ["p_web_1", "p_web_2"], "db": ["p_db_1"]},
+            "containers": [
+                {"_service": "web", "log_prefix": "web_1"},
+                {"_service": "web", "log_prefix": "web_2"},
+                {"_service": "db", "log_prefix": "db_1"},
+            ],
+        }
+
+        await self.run_compose(["logs", "--no-color", "web"], reply)
+
+        self.podman_run.assert_called_once_with(
+            [], "logs", ["p_web_1", "p_web_2"], log_formatter="\x1b[0m[web_1]|\x1b[0m"
+        )
+
+    def test_socket_path(self) -> None:
+        with mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": "/run/user/1000"}):
+            path = daemon_socket_path(podman_compose._parse_args(["-p", "a", "ps"]))
+            self.assertTrue(path.startswith("/run/user/1000/podman-compose/"))
+            self.assertEqual(
+                path, daemon_socket_path(podman_compose._parse_args(["-p", "a", "up"]))
+            )
+            self.assertNotEqual(
+                path, daemon_socket_path(podman_compose._parse_args(["-p", "b", "ps"]))
+            )
@@ -0,0 +1,152 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import argparse
+import asyncio
+import unittest
+from typing import Any
+from unittest import mock
+
+from podman_compose import DependField
+from podman_compose import compose_down
+from podman_compose import dependency_levels
+from tests.unit.test_utils import ComposeFileTestCase
+
+
+class TestComposeDown(ComposeFileTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.calls: list[list[str]] = []
+
+        async def podman_run(podman_args: list[str], cmd: str, cmd_args: list[str]) -> int:
+            self.calls.append([cmd, *cmd_args])
+            # let the other services make progress in between
+            await asyncio.sleep(0)
+            return 0
+
+        self.podman_output = mock.AsyncMock(return_value=b"")
+        self.compose.podman = mock.Mock(
+            run=mock.AsyncMock(side_effect=podman_run),
+            output=self.podman_output,
+            network_ls=mock.AsyncMock(return_value=[]),
+            volume_ls=mock.AsyncMock(return_value=[]),
+        )
+
+    def get_args(self, **kwargs: Any) -> argparse.Namespace:
+        return argparse.Namespace(**{
+            "services": [],
+            "volumes": False,
+            "remove_orphans": False,
+            "rmi": None,
+            "timeout": None,
+            **kwargs,
+        })
+
+    def parse_stack(self) -> None:
+        self.parse({
+            "services": {
+                "db": {"image": "busybox", "stop_grace_period": "30s"},
+                "cache": {"image": "busybox"},
+                "api": {"image": "busybox", "depends_on": ["db", "cache"], "scale": 2},
+                "web": {"image": "busybox", "depends_on": ["api"]},
+                "cron": {"image": "busybox"},
+            },
+        })
+
+    def index_of(self, cmd: str, name: str) -> int:
+        for i, call in enumerate(self.calls):
+            if call[0] == cmd and name in call:
+                return i
+        raise AssertionError(f"{cmd} {name} not called: {self.calls}")
+
+    def test_teardown_levels(self) -> None:
+        self.parse_stack()
+
+        levels = dependency_levels(self.compose, self.compose.services, DependField.DEPENDENTS)
+
+        self.assertEqual(levels, {"web": 0, "cron": 0, "api": 1, "db": 2, "cache": 2})
+
+    async def test_dependents_stop_first(self) -> None:
+        self.parse_stack()
+
+        await compose_down(self.compose, self.get_args())
+
+        self.assertLess(self.index_of("stop", "p_web_1"), self.index_of("stop", "p_api_1"))
+        self.assertLess(self.index_of("stop", "p_api_1"), self.index_of("stop", "p_db_1"))
+        self.assertLess(self.index_of("stop", "p_api_1"), self.index_of("stop", "p_cache_1"))
+        # unrelated services do not wait for the dependency chain
+        self.assertLess(self.index_of("stop", "p_cron_1"), self.index_of("stop", "p_api_1"))
+        # replicas are stopped and removed in a single call
+        self.assertIn(["stop", "-t", "10", "p_api_2", "p_api_1"], self.calls)
+        self.assertIn(["rm", "p_api_2", "p_api_1"], self.calls)
+        self.assertIn(["stop", "-t", "30", "p_db_1"], self.calls)
+        # removal does not wait until everything has been stopped
+        self.assertLess(self.index_of("rm", "p_web_1"), self.index_of("stop", "p_db_1"))
+
+    async def test_down_service_with_dependents(self) -> None:
+        self.parse_stack()
+
+        await compose_down(self.compose, self.get_args(services=["api"], timeout=5))
+
+        stopped = [name for call in self.calls if call[0] == "stop" for name in call[3:]]
+        self.assertEqual(sorted(stopped), ["p_api_1", "p_api_2", "p_web_1"])
+        self.assertLess(self.index_of("stop", "p_web_1"), self.index_of("stop", "p_api_1"))
+
+    async def test_dependency_loop(self) -> None:
+        self.parse({
+            "services": {
+                "a": {"image": "busybox", "depends_on": ["b"]},
+                "b": {"image": "busybox", "depends_on": ["a"]},
+            },
+        })
+
+        await asyncio.wait_for(compose_down(self.compose, self.get_args()), 5)
+
+        self.assertEqual(len([call for call in self.calls if call[0] == "rm"]), 2)
+
+    async def test_orphans_removed_in_one_call(self) -> None:
+        self.parse({"services": {"web": {"image": "busybox"}}})
+        self.podman_output.return_value = b"busybox p_old_1\nbusybox p_old_2\n"
+
+        await compose_down(self.compose, self.get_args(remove_orphans=True))
+
+        self.assertIn(["stop", "p_old_1", "p_old_2"], self.calls)
+        self.assertIn(["rm", "p_old_1", "p_old_2"], self.calls)
+
+    async def test_fast_in_pod(self) -> None:
+        self.compose.global_args.in_pod = "true"
+        self.parse_stack()
+        self.podman_output.return_value = b"busybox p_api_1\nbusybox p_old_1\n"
+
+        await compose_down(self.compose, self.get_args(fast=True, remove_orphans=True))
+
+        self.assertEqual(
+            self.calls[:3],
+            [
+                ["pod", "stop", "-t", "30", "pod_p"],
+                ["pod", "rm", "-f", "pod_p"],
+                ["rm", "-f", "--ignore", "-t", "30", "p_old_1"],
+            ],
+        )
+        self.assertNotIn("stop", [call[0] for call in self.calls])
+
+    async def test_fast_without_pod(self) -> None:
+        self.parse_stack()
+        self.compose.podman.volume_ls.return_value = ["p_a", "p_b"]  # type: ignore[attr-defined]
+
+        await compose_down(self.compose, self.get_args(fast=True, timeout=3, volumes=True))
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.calls[0][:4], ["rm", "-f", "-t", "3"])
+        self.assertEqual(
+            sorted(self.calls[0][4:]),
+            ["p_api_1", "p_api_2", "p_cache_1", "p_cron_1", "p_db_1", "p_web_1"],
+        )
+        self.assertEqual(self.calls[1], ["volume", "rm", "p_a", "p_b"])
+
+    async def test_fast_ignored_with_services(self) -> None:
+        self.parse_stack()
+
+        await compose_down(self.compose, self.get_args(fast=True, services=["web"]))
+
+        self.assertEqual(self.calls, [["stop", "-t", "10", "p_web_1"], ["rm", "p_web_1"]])
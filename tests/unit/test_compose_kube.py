@@ -0,0 +1,262 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import base64
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+from typing import Any
+from unittest import mock
+
+import yaml
+
+from podman_compose import KubeExport
+from podman_compose import compose_kube
+from podman_compose import kube_memory
+from podman_compose import podman_compose
+from tests.unit.test_utils import ComposeFileTestCase
+
+
+class TestKubeExport(ComposeFileTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        for name, content in (("web.env", "MODE=prod\nEMPTY=\n"), ("token.txt", "t0ken\n")):
+            with open(os.path.join(self.dir, name), "w", encoding="utf-8") as f:
+                f.write(content)
+        self.services: dict[str, Any] = {
+            "db": {
+                "image": "postgres",
+                "volumes": ["data:/var/lib/postgresql/data", "shared:/shared:ro"],
+                "healthcheck": {
+                    "test": ["CMD-SHELL", "pg_isready -U app"],
+                    "interval": "10s",
+                    "retries": 3,
+                },
+                "restart": "always",
+                "sysctls": {"net.core.somaxconn": 1024},
+            },
+            "migrate": {
+                "image": "app",
+                "command": "migrate --up",
+                "depends_on": {"db": {"condition": "service_started"}},
+            },
+            "web": {
+                "image": "app",
+                "scale": 2,
+                "entrypoint": ["/entrypoint.sh"],
+                "command": ["serve", "--port", "8000"],
+                "environment": {"DEBUG": "0", "HOME_DIR": None},
+                "env_file": ["web.env"],
+                "ports": ["127.0.0.1:8080:8000", "9000-9001:9000-9001/udp"],
+                "expose": [7000],
+                "volumes": ["./static:/srv/static", {"type": "tmpfs", "target": "/cache"}],
+                "secrets": ["token", {"source": "api_key", "target": "/etc/api", "mode": 0o440}],
+                "user": "1000:1000",
+                "cap_drop": ["ALL"],
+                "mem_limit": "512m",
+                "cpus": 1.5,
+                "labels": {"tier": "front"},
+                "restart": "always",
+                "depends_on": {
+                    "db": {"condition": "service_healthy"},
+                    "migrate": {"condition": "service_completed_successfully"},
+                },
+            },
+        }
+        with mock.patch.dict(os.environ, {"HOME_DIR": "/home/app"}):
+            self.parse({
+                "services": self.services,
+                "volumes": {"data": {}, "shared": {"external": True}},
+                "secrets": {
+                    "token": {"file": "token.txt"},
+                    "api_key": {"environment": "API_KEY"},
+                },
+            })
+
+    def export(self, kind: str = "Pod") -> tuple[dict[str, list[dict[str, Any]]], KubeExport]:
+        export = KubeExport(self.compose, kind)
+        with mock.patch.dict(os.environ, {"API_KEY": "s3cret"}):
+            documents = export.documents()
+        by_kind: dict[str, list[dict[str, Any]]] = {}
+        for document in documents:
+            by_kind.setdefault(document["kind"], []).append(document)
+        return by_kind, export
+
+    def containers(self, pod_spec: dict[str, Any]) -> dict[str, dict[str, Any]]:
+        return {c["name"]: c for c in pod_spec.get("initContainers", []) + pod_spec["containers"]}
+
+    def test_a_container_per_service(self) -> None:
+        documents, _ = self.export()
+        spec = documents["Pod"][0]["spec"]
+        containers = self.containers(spec)
+
+        self.assertEqual([c["name"] for c in spec["initContainers"]], ["migrate"])
+        self.assertEqual([c["name"] for c in spec["containers"]], ["db", "web"])
+        for name, service in self.services.items():
+            self.assertEqual(containers[name]["image"], service["image"])
+        self.assertEqual(containers["migrate"]["args"], ["migrate", "--up"])
+        self.assertEqual(containers["web"]["command"], ["/entrypoint.sh"])
+        self.assertEqual(containers["web"]["args"], ["serve", "--port", "8000"])
+        self.assertEqual(spec["restartPolicy"], "Always")
+        self.assertEqual(
+            spec["hostAliases"], [{"ip": "127.0.0.1", "hostnames": sorted(self.services)}]
+        )
+
+    def test_environment(self) -> None:
+        documents, _ = self.export()
+        web = self.containers(documents["Pod"][0]["spec"])["web"]
+
+        self.assertEqual(
+            web["env"],
+            [{"name": "DEBUG", "value": "0"}, {"name": "HOME_DIR", "value": "/home/app"}],
+        )
+        (config_map,) = documents["ConfigMap"]
+        self.assertEqual(
+            web["envFrom"], [{"configMapRef": {"name": config_map["metadata"]["name"]}}]
+        )
+        self.assertEqual(config_map["data"], {"MODE": "prod", "EMPTY": ""})
+
+    def test_ports(self) -> None:
+        documents, _ = self.export()
+        web = self.containers(documents["Pod"][0]["spec"])["web"]
+
+        self.assertEqual(
+            web["ports"],
+            [
+                {"containerPort": 8000, "hostPort": 8080, "hostIP": "127.0.0.1"},
+                {"containerPort": 9000, "hostPort": 9000, "protocol": "UDP"},
+                {"containerPort": 9001, "hostPort": 9001, "protocol": "UDP"},
+                {"containerPort": 7000},
+            ],
+        )
+
+    def test_random_host_port(self) -> None:
+        export = KubeExport(self.compose, "Pod")
+
+        ports = export.ports({"_service": "web", "ports": ["127.0.0.1::8000", "::9000", "7000"]})
+
+        self.assertEqual(
+            ports,
+            [
+                {"containerPort": 8000, "hostIP": "127.0.0.1"},
+                {"containerPort": 9000},
+                {"containerPort": 7000},
+            ],
+        )
+        self.assertEqual(
+            export.unmapped,
+            [
+                "service web: port 127.0.0.1::8000 is not published, "
+                "random host ports are not mapped",
+                "service web: port ::9000 is not published, random host ports are not mapped",
+            ],
+        )
+
+    def test_volumes(self) -> None:
+        documents, _ = self.export()
+        spec = documents["Pod"][0]["spec"]
+        volumes = {volume["name"]: volume for volume in spec["volumes"]}
+        mounts = {
+            mount["mountPath"]: volumes[mount["name"]]
+            for container in self.containers(spec).values()
+            for mount in container.get("volumeMounts", [])
+        }
+
+        # named volumes are claims of the same name, external ones are not declared
+        self.assertEqual(
+            [claim["metadata"]["name"] for claim in documents["PersistentVolumeClaim"]], ["p_data"]
+        )
+        self.assertEqual(
+            mounts["/var/lib/postgresql/data"]["persistentVolumeClaim"], {"claimName": "p_data"}
+        )
+        self.assertEqual(mounts["/shared"]["persistentVolumeClaim"], {"claimName": "shared"})
+        self.assertEqual(
+            mounts["/srv/static"]["hostPath"],
+            {"path": os.path.join(self.dir, "static"), "type": "DirectoryOrCreate"},
+        )
+        self.assertEqual(mounts["/cache"]["emptyDir"], {"medium": "Memory"})
+
+    def test_secrets(self) -> None:
+        documents, _ = self.export()
+        web = self.containers(documents["Pod"][0]["spec"])["web"]
+        volumes = {volume["name"]: volume for volume in documents["Pod"][0]["spec"]["volumes"]}
+        secrets = {
+            secret["metadata"]["name"]: {
+                key: base64.b64decode(value).decode() for key, value in secret["data"].items()
+            }
+            for secret in documents["Secret"]
+        }
+
+        self.assertEqual(
+            secrets, {"p-token": {"token": "t0ken\n"}, "p-api-key": {"api_key": "s3cret"}}
+        )
+        mounts = {m["mountPath"]: m for m in web["volumeMounts"] if m["name"].startswith("secret")}
+        self.assertEqual(sorted(mounts), ["/etc/api", "/run/secrets/token"])
+        api_key = volumes[mounts["/etc/api"]["name"]]["secret"]
+        self.assertEqual(
+            api_key,
+            {
+                "secretName": "p-api-key",
+                "items": [{"key": "api_key", "path": "api_key", "mode": 0o440}],
+            },
+        )
+
+    def test_container_settings(self) -> None:
+        documents, _ = self.export()
+        containers = self.containers(documents["Pod"][0]["spec"])
+
+        self.assertEqual(
+            containers["db"]["livenessProbe"],
+            {
+                "exec": {"command": ["/bin/sh", "-c", "pg_isready -U app"]},
+                "periodSeconds": 10,
+                "failureThreshold": 3,
+            },
+        )
+        self.assertEqual(
+            containers["web"]["securityContext"],
+            {"runAsUser": 1000, "runAsGroup": 1000, "capabilities": {"drop": ["ALL"]}},
+        )
+        self.assertEqual(
+            containers["web"]["resources"], {"limits": {"memory": "512Mi", "cpu": "1.5"}}
+        )
+        self.assertEqual(kube_memory("2g"), "2Gi")
+        self.assertIsNone(kube_memory("lots"))
+
+    def test_unmapped_features_are_reported(self) -> None:
+        _, export = self.export()
+
+        self.assertEqual(
+            sorted(export.unmapped),
+            [
+                "service db: sysctls is not mapped",
+                "service migrate: runs before db although it depends on it",
+                "service web: does not wait for db to be healthy",
+                "service web: labels are not mapped",
+                "service web: runs once instead of 2 times in the pod",
+            ],
+        )
+
+    def test_deployment(self) -> None:
+        pod, _ = self.export()
+        documents, _ = self.export("Deployment")
+        (deployment,) = documents["Deployment"]
+
+        self.assertNotIn("Pod", documents)
+        self.assertEqual(deployment["spec"]["replicas"], 1)
+        self.assertEqual(deployment["spec"]["selector"]["matchLabels"], {"app": "p"})
+        self.assertEqual(deployment["spec"]["template"]["spec"], pod["Pod"][0]["spec"])
+
+    async def test_generate(self) -> None:
+        output = os.path.join(self.dir, "kube.yaml")
+        args = podman_compose._parse_args(["kube", "generate", "-o", output])
+
+        with mock.patch.dict(os.environ, {"API_KEY": "s3cret"}), redirect_stdout(io.StringIO()):
+            with self.assertLogs("podman_compose", "WARNING") as logs:
+                await compose_kube(self.compose, args)
+
+        with open(output, encoding="utf-8") as f:
+            kinds = [document["kind"] for document in yaml.safe_load_all(f)]
+        self.assertEqual(kinds, ["ConfigMap", "Secret", "Secret", "PersistentVolumeClaim", "Pod"])
+        self.assertEqual(len(logs.records), 5)
@@ -0,0 +1,367 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import asyncio
+import io
+import json
+import os
+import subprocess
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from typing import Any
+from unittest import mock
+
+import yaml
+
+from podman_compose import PodmanCompose
+from podman_compose import apply_plan
+from podman_compose import container_to_args
+from podman_compose import execution_plan
+from podman_compose import podman_compose
+from podman_compose import resolve_plan_step
+from podman_compose import secret_content_hash
+
+
+class TestExecutionPlan(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = os.path.realpath(self.tmp_dir.name)
+        self.compose_path = os.path.join(self.dir, "docker-compose.yml")
+        with open(self.compose_path, "w", encoding="utf-8") as f:
+            yaml.safe_dump(
+                {
+                    "services": {
+                        "db": {
+                            "image": "postgres",
+                            "volumes": ["data:/var/lib/postgresql/data"],
+                            "secrets": ["password"],
+                            "networks": ["back"],
+                        },
+                        "migrate": {
+                            "image": "app",
+                            "pull_policy": "never",
+                            "depends_on": {"db": {"condition": "service_healthy"}},
+                            "networks": ["back"],
+                        },
+                        "web": {
+                            "image": "app",
+                            "pull_policy": "never",
+                            "volumes": ["./static:/srv/static"],
+                            "depends_on": {
+                                "migrate": {"condition": "service_completed_successfully"}
+                            },
+                            "networks": ["front", "outside"],
+                        },
+                    },
+                    "volumes": {"data": {}},
+                    "networks": {"front": {}, "back": {}, "outside": {"external": True}},
+                    "secrets": {"password": {"environment": "DB_PASSWORD"}},
+                },
+                f,
+            )
+        env = mock.patch.dict(
+            os.environ,
+            {"DB_PASSWORD": "s3cret", "XDG_CONFIG_HOME": os.path.join(self.dir, "config")},
+        )
+        env.start()
+        self.addCleanup(env.stop)
+        self.compose = self.parse()
+        self.calls: list[list[str]] = []
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def parse(self, *argv: str) -> PodmanCompose:
+        compose = PodmanCompose()
+        compose.global_args = podman_compose._parse_args([
+            "-f",
+            self.compose_path,
+            "-p",
+            "p",
+            "--in-pod=false",
+            *argv,
+            "plan",
+        ])
+        compose._parse_compose_file()
+        return compose
+
+    async def plan(self) -> dict[str, Any]:
+        return json.loads(json.dumps(await execution_plan(self.compose)))
+
+    def mock_podman(self, outputs: dict[str, Any]) -> None:
+        async def output(podman_args: list[str], cmd: str, cmd_args: list[str]) -> bytes:
+            self.calls.append(cmd_args)
+            result = outputs.get(" ".join(cmd_args), b"")
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        self.compose.podman = mock.Mock(output=mock.AsyncMock(side_effect=output))
+
+    async def test_steps(self) -> None:
+        plan = await self.plan()
+        steps = {step["id"]: step for step in plan["steps"]}
+
+        self.assertEqual(plan["project_name"], "p")
+        self.assertEqual(
+            sorted(steps),
+            [
+                "completed p_migrate_1",
+                "create p_db_1",
+                "create p_migrate_1",
+                "create p_web_1",
+                f"directory {os.path.join(self.dir, 'static')}",
+                "healthy p_db_1",
+                "image app",
+                "image postgres",
+                "network outside",
+                "network p_back",
+                "network p_front",
+                "secret p_password",
+                "start p_db_1",
+                "start p_migrate_1",
+                "start p_web_1",
+                "volume p_data",
+            ],
+        )
+        # the steps come after earlier steps only
+        seen: set[str] = set()
+        for step in plan["steps"]:
+            self.assertLessEqual(set(step["after"]), seen, step["id"])
+            seen.add(step["id"])
+        self.assertEqual(
+            steps["start p_web_1"]["after"],
+            ["create p_web_1", "healthy p_db_1", "completed p_migrate_1"],
+        )
+        self.assertEqual(steps["completed p_migrate_1"]["expect_output"], "0")
+        self.assertEqual(steps["healthy p_db_1"]["run"], ["wait", "--condition=healthy", "p_db_1"])
+        self.assertIn("create p_db_1", steps["create p_migrate_1"]["after"])
+        # no secret value ends up in the plan
+        self.assertEqual(
+            steps["secret p_password"]["run"][-3:], ["--env", "p_password", "DB_PASSWORD"]
+        )
+        self.assertNotIn("s3cret", json.dumps(plan))
+        # the value is hashed when applying the plan
+        self.assertNotIn("skip_if_output", steps["secret p_password"])
+        self.assertNotIn(
+            secret_content_hash(self.compose, "password"), json.dumps(steps["secret p_password"])
+        )
+        self.assertNotIn("skip_if", steps["network outside"])
+        self.assertIn("Create it first", steps["network outside"]["error"])
+        self.assertNotIn("skip_if", steps["image app"])
+
+    async def test_create_matches_up(self) -> None:
+        plan = await self.plan()
+        steps = {step["id"]: step for step in plan["steps"]}
+
+        for cnt in self.compose.containers:
+            args = await container_to_args(
+                self.compose, cnt, detached=False, create_resources=False
+            )
+            # the hashes of the secrets are filled in when applying the plan
+            step = resolve_plan_step(self.compose, steps[f"create {cnt['name']}"])
+            self.assertEqual(step["run"], ["create", "--replace", *args])
+            self.assertEqual(
+                step["skip_if_output"],
+                self.compose.config_hash(self.compose.services[cnt["_service"]]),
+            )
+        self.assertNotIn("skip_if_output", steps["create p_db_1"])
+        self.assertEqual(
+            steps["create p_db_1"]["config_hash"]["secrets"], {"password": "DB_PASSWORD"}
+        )
+
+    async def test_changed_secret_recreates_containers_when_applying(self) -> None:
+        plan = await self.plan()
+        with mock.patch.dict(os.environ, {"DB_PASSWORD": "changed"}):
+            compose = self.parse()
+            db_hash = compose.config_hash(compose.services["db"])
+        self.assertNotEqual(db_hash, self.compose.config_hash(self.compose.services["db"]))
+        inspect = (
+            'container inspect --format {{index .Config.Labels "io.podman.compose.config-hash"}} '
+        )
+        self.mock_podman({
+            "wait p_migrate_1": b"0\n",
+            # labelled with the value the plan was made with
+            inspect + "p_db_1": self.compose.config_hash(self.compose.services["db"]).encode(),
+        })
+
+        with mock.patch.dict(os.environ, {"DB_PASSWORD": "changed"}):
+            self.assertEqual(await apply_plan(self.compose, plan), 0)
+
+        create_db = [
+            call for call in self.calls if call[:3] == ["create", "--replace", "--name=p_db_1"]
+        ]
+        self.assertEqual(len(create_db), 1)
+        self.assertIn(f"io.podman.compose.config-hash={db_hash}", create_db[0])
+
+    async def test_podman_args(self) -> None:
+        self.compose = self.parse("--podman-args=--log-level=debug", "--podman-start-args=-a")
+        steps = {step["id"]: step for step in (await self.plan())["steps"]}
+
+        self.assertEqual(
+            steps["start p_db_1"]["run"], ["--log-level=debug", "start", "-a", "p_db_1"]
+        )
+        self.assertEqual(steps["network p_back"]["skip_if"][:2], ["--log-level=debug", "network"])
+
+    async def test_apply(self) -> None:
+        plan = await self.plan()
+        self.mock_podman({"wait p_migrate_1": b"0\n"})
+
+        self.assertEqual(await apply_plan(self.compose, plan), 0)
+
+        calls = [" ".join(call) for call in self.calls]
+        self.assertLess(calls.index("start p_db_1"), calls.index("wait --condition=healthy p_db_1"))
+        self.assertLess(
+            calls.index("wait --condition=healthy p_db_1"), calls.index("start p_migrate_1")
+        )
+        self.assertLess(calls.index("wait p_migrate_1"), calls.index("start p_web_1"))
+        self.assertTrue(os.path.isdir(os.path.join(self.dir, "static")))
+        # resources that exist are not created again
+        self.assertNotIn("network create", "\n".join(calls))
+
+    async def test_secret_hash_is_compared_when_applying(self) -> None:
+        plan = await self.plan()
+        inspect = (
+            'secret inspect --format {{index .Spec.Labels "io.podman.compose.secret-hash"}} '
+            "p_password"
+        )
+        self.mock_podman({
+            "wait p_migrate_1": b"0\n",
+            inspect: (secret_content_hash(self.compose, "password") or "").encode() + b"\n",
+        })
+
+        self.assertEqual(await apply_plan(self.compose, plan), 0)
+        self.assertNotIn("secret", [call[0] for call in self.calls if call[1] != "inspect"])
+
+        self.calls.clear()
+        with mock.patch.dict(os.environ, {"DB_PASSWORD": "changed"}):
+            new_hash = secret_content_hash(self.compose, "password")
+            self.assertEqual(await apply_plan(self.compose, plan), 0)
+        self.assertIn(
+            [
+                "secret",
+                "create",
+                "--replace",
+                "--label",
+                "io.podman.compose.project=p",
+                "--label",
+                f"io.podman.compose.secret-hash={new_hash}",
+                "--env",
+                "p_password",
+                "DB_PASSWORD",
+            ],
+            self.calls,
+        )
+
+    async def test_older_podman_removes_the_secret_first(self) -> None:
+        plan = await self.plan()
+        self.compose.podman_version = "4.4.1"
+        self.mock_podman({
+            "wait p_migrate_1": b"0\n",
+            "secret rm p_password": subprocess.CalledProcessError(1, "podman", b"no such secret"),
+        })
+
+        self.assertEqual(await apply_plan(self.compose, plan), 0)
+
+        secret_calls = [call for call in self.calls if call[0] == "secret" and call[1] != "inspect"]
+        self.assertEqual(
+            [call[:3] for call in secret_calls],
+            [["secret", "rm", "p_password"], ["secret", "create", "--label"]],
+        )
+
+    async def test_unset_secret_variable_fails_the_step(self) -> None:
+        plan = await self.plan()
+        self.mock_podman({})
+
+        with mock.patch.dict(os.environ), self.assertLogs("podman_compose", "ERROR") as logs:
+            del os.environ["DB_PASSWORD"]
+            self.assertEqual(await apply_plan(self.compose, plan), 1)
+
+        self.assertIn("secret p_password: Environment variable 'DB_PASSWORD'", logs.output[0])
+        self.assertNotIn("create", [call[0] for call in self.calls])
+
+    async def test_up_to_date_containers_are_kept(self) -> None:
+        plan = await self.plan()
+        db_hash = self.compose.config_hash(self.compose.services["db"])
+        self.mock_podman({
+            "wait p_migrate_1": b"0\n",
+            'container inspect --format {{index .Config.Labels "io.podman.compose.config-hash"}} '
+            "p_db_1": db_hash.encode() + b"\n",
+            'container inspect --format {{index .Config.Labels "io.podman.compose.config-hash"}} '
+            "p_web_1": b"outdated\n",
+        })
+
+        self.assertEqual(await apply_plan(self.compose, plan), 0)
+
+        created = [call[-1] for call in self.calls if call[:2] == ["create", "--replace"]]
+        self.assertEqual(sorted(created), ["app", "app"])
+
+    async def test_independent_steps_run_concurrently(self) -> None:
+        plan = await self.plan()
+        in_flight: set[str] = set()
+        both = asyncio.Event()
+
+        async def output(podman_args: list[str], cmd: str, cmd_args: list[str]) -> bytes:
+            if cmd_args[:2] == ["network", "exists"] and cmd_args[-1] != "outside":
+                raise subprocess.CalledProcessError(1, cmd_args)
+            if cmd_args[:2] == ["network", "create"]:
+                in_flight.add(cmd_args[-1])
+                if len(in_flight) == 2:
+                    both.set()
+                await asyncio.wait_for(both.wait(), 5)
+            return b"0" if cmd_args == ["wait", "p_migrate_1"] else b""
+
+        self.compose.podman = mock.Mock(output=mock.AsyncMock(side_effect=output))
+
+        self.assertEqual(await apply_plan(self.compose, plan), 0)
+        self.assertEqual(in_flight, {"p_back", "p_front"})
+
+    async def test_failure_skips_later_steps(self) -> None:
+        plan = await self.plan()
+        self.mock_podman({
+            "wait p_migrate_1": b"1\n",
+            "network exists outside": subprocess.CalledProcessError(1, "podman", stderr=b""),
+        })
+
+        with self.assertLogs("podman_compose", "ERROR") as logs:
+            self.assertEqual(await apply_plan(self.compose, plan), 1)
+
+        self.assertNotIn(["start", "p_web_1"], self.calls)
+        self.assertIn(["start", "p_db_1"], self.calls)
+        messages = "\n".join(logs.output)
+        self.assertIn("External network [outside] does not exist", messages)
+        self.assertIn("completed p_migrate_1: podman printed '1' instead of '0'", messages)
+
+    async def test_podman_error_is_logged(self) -> None:
+        plan = await self.plan()
+        self.mock_podman({
+            "start p_db_1": subprocess.CalledProcessError(125, "podman", b"no such container\n"),
+        })
+
+        with self.assertLogs("podman_compose", "ERROR") as logs:
+            self.assertEqual(await apply_plan(self.compose, plan), 1)
+
+        self.assertIn("start p_db_1: no such container", "\n".join(logs.output))
+
+    async def test_invalid_plans(self) -> None:
+        plan = await self.plan()
+
+        with self.assertRaises(ValueError):
+            await apply_plan(self.compose, {**plan, "version": 0})
+        with self.assertRaises(ValueError):
+            await apply_plan(self.compose, {**plan, "steps": plan["steps"][::-1]})
+
+    async def test_apply_does_not_read_compose_files(self) -> None:
+        plan_path = os.path.join(self.dir, "plan.json")
+        args = podman_compose._parse_args(["plan", "-o", plan_path])
+        await podman_compose.commands["plan"](self.compose, args)
+
+        compose = PodmanCompose()
+        compose.commands = podman_compose.commands
+        with mock.patch.object(PodmanCompose, "_parse_compose_file") as parse:
+            with redirect_stdout(io.StringIO()) as stdout, self.assertRaises(SystemExit) as e:
+                await compose.run(["--dry-run", "apply", plan_path])
+        parse.assert_not_called()
+        self.assertEqual(e.exception.code, 0)
+        self.assertIn("start p_web_1 start p_web_1\n", stdout.getvalue())
@@ -0,0 +1,152 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import asyncio
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from typing import Any
+from unittest import mock
+
+import yaml
+
+from podman_compose import Podman
+from podman_compose import PodmanCompose
+from podman_compose import podman_compose
+from podman_compose import registered_projects
+
+
+class TestMultiProject(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = os.path.realpath(self.tmp_dir.name)
+        for project, service in (("a", "web"), ("b", "db"), ("empty", None)):
+            os.makedirs(os.path.join(self.dir, project))
+            if service:
+                with open(
+                    os.path.join(self.dir, project, "compose.yaml"), "w", encoding="utf-8"
+                ) as f:
+                    yaml.safe_dump({"services": {service: {"image": "busybox"}}}, f)
+        self.cwd = os.getcwd()
+
+    def tearDown(self) -> None:
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    async def run_compose(self, argv: list[str]) -> tuple[Any, str, mock.Mock]:
+        compose = PodmanCompose()
+        compose.commands = podman_compose.commands
+        with mock.patch("podman_compose.Podman", wraps=Podman) as podman, redirect_stdout(
+            io.StringIO()
+        ) as stdout:
+            with self.assertRaises(SystemExit) as e:
+                await compose.run(["--dry-run", *argv])
+        return e.exception.code, stdout.getvalue(), podman
+
+    def mock_command(self, name: str, side_effect: Any) -> Any:
+        command = mock.AsyncMock(side_effect=side_effect)
+        command._parse_args = podman_compose.commands[name]._parse_args
+        return mock.patch.dict(podman_compose.commands, {name: command})
+
+    def project_dirs(self, *projects: str) -> list[str]:
+        return [arg for p in projects for arg in ("--project-directory", os.path.join(self.dir, p))]
+
+    async def test_project_directories(self) -> None:
+        code, stdout, podman = await self.run_compose([*self.project_dirs("a", "b"), "config"])
+
+        self.assertEqual(code, 0)
+        self.assertIn("web:", stdout)
+        self.assertIn("db:", stdout)
+        self.assertEqual(
+            stdout.splitlines()[-2:],
+            [f"{os.path.join(self.dir, p):{len(os.path.join(self.dir, 'a'))}}  done" for p in "ab"],
+        )
+        # the projects share the runner and its limit
+        self.assertEqual(podman.call_count, 3)
+        self.assertEqual(len({id(call.args[3]) for call in podman.call_args_list}), 1)
+        self.assertEqual(os.getcwd(), self.cwd)
+
+    async def test_failed_project(self) -> None:
+        with self.assertLogs("podman_compose", "CRITICAL"):
+            code, stdout, _ = await self.run_compose([*self.project_dirs("a", "empty"), "config"])
+
+        self.assertEqual(code, 1)
+        self.assertTrue(stdout.splitlines()[-1].endswith("  exit code -1"))
+        self.assertTrue(stdout.splitlines()[-2].endswith("  done"))
+
+    async def test_projects_run_concurrently(self) -> None:
+        both = asyncio.Event()
+        started: list[str] = []
+
+        async def config(compose: PodmanCompose, args: Any) -> None:
+            started.append(compose.project_name or "")
+            if len(started) == 2:
+                both.set()
+            await asyncio.wait_for(both.wait(), 5)
+
+        with self.mock_command("config", config):
+            code, _, _ = await self.run_compose([*self.project_dirs("a", "b"), "config"])
+
+        self.assertEqual(code, 0)
+        self.assertEqual(sorted(started), ["a", "b"])
+
+    async def test_all_registered_projects(self) -> None:
+        stacks_dir = os.path.join(self.dir, "home", ".config/containers/compose/projects")
+        os.makedirs(stacks_dir)
+        for name, project in (("alpha", "a"), ("beta", "b")):
+            with open(os.path.join(stacks_dir, f"{name}.env"), "w", encoding="utf-8") as f:
+                f.write(
+                    f"COMPOSE_PROJECT_DIR={os.path.join(self.dir, project)}\n"
+                    "COMPOSE_FILE=compose.yaml\n"
+                    f"COMPOSE_PROJECT_NAME={name}\n"
+                )
+        names: list[str] = []
+
+        async def config(compose: PodmanCompose, args: Any) -> None:
+            self.assertTrue(args.quiet)
+            names.append(compose.project_name or "")
+
+        with mock.patch.dict(os.environ, {"HOME": os.path.join(self.dir, "home")}):
+            self.assertEqual(sorted(registered_projects()), ["alpha", "beta"])
+            with self.mock_command("config", config):
+                code, stdout, _ = await self.run_compose(["all", "config", "-q"])
+
+        self.assertEqual(code, 0)
+        self.assertEqual(sorted(names), ["alpha", "beta"])
+        self.assertEqual(stdout.splitlines(), ["PROJECT  RESULT", "alpha    done", "beta     done"])
+        self.assertNotIn("COMPOSE_PROJECT_NAME", os.environ)
+
+    async def test_project_name_is_rejected(self) -> None:
+        with self.assertLogs("podman_compose", "ERROR"):
+            code, _, _ = await self.run_compose(["-p", "x", *self.project_dirs("a", "b"), "config"])
+
+        self.assertEqual(code, 1)
+
+    async def test_commands_run_with_the_project_environment(self) -> None:
+        stacks_dir = os.path.join(self.dir, "home", ".config/containers/compose/projects")
+        os.makedirs(stacks_dir)
+        for name, project in (("alpha", "a"), ("beta", "b")):
+            with open(os.path.join(stacks_dir, f"{name}.env"), "w", encoding="utf-8") as f:
+                f.write(f"COMPOSE_PROJECT_DIR={os.path.join(self.dir, project)}\nTOKEN={name}\n")
+        seen: dict[str, Any] = {}
+
+        async def config(compose: PodmanCompose, args: Any) -> None:
+            # the secrets are read and podman runs after the parse, in the project
+            podman_env = compose.podman.env or {}
+            seen[compose.getenv("TOKEN") or ""] = (podman_env.get("TOKEN"), compose.podman.cwd)
+
+        with mock.patch.dict(os.environ, {"HOME": os.path.join(self.dir, "home")}):
+            with self.mock_command("config", config):
+                code, _, _ = await self.run_compose(["all", "config"])
+
+        self.assertEqual(code, 0)
+        self.assertEqual(
+            seen,
+            {
+                "alpha": ("alpha", os.path.join(self.dir, "a")),
+                "beta": ("beta", os.path.join(self.dir, "b")),
+            },
+        )
+        self.assertNotIn("TOKEN", os.environ)
@@ -0,0 +1,239 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import io
+import os
+import shlex
+import unittest
+from contextlib import redirect_stdout
+from typing import Any
+from typing import Optional
+from unittest import mock
+
+from podman_compose import QUADLET_CONTAINER_KEYS
+from podman_compose import QUADLET_NETWORK_KEYS
+from podman_compose import QUADLET_VOLUME_KEYS
+from podman_compose import QUADLET_WORD_KEYS
+from podman_compose import PodmanCompose
+from podman_compose import compose_quadlet
+from podman_compose import container_to_args
+from podman_compose import get_network_create_args
+from podman_compose import get_volume_create_args
+from podman_compose import podman_compose
+from podman_compose import quadlet_files
+from tests.unit.test_utils import ComposeFileTestCase
+from tests.unit.test_utils import new_compose
+from tests.unit.test_utils import write_compose_file
+
+# the flags the generated podman commands have without a value
+FLAGS_WITHOUT_VALUE = {"--read-only", "--init", "--no-hosts", "--internal", "--disable-dns"}
+
+
+def parse_unit(content: str) -> dict[str, list[tuple[str, str]]]:
+    sections: dict[str, list[tuple[str, str]]] = {}
+    section: list[tuple[str, str]] = []
+    for line in content.splitlines():
+        if line.startswith("["):
+            section = sections.setdefault(line.strip("[]"), [])
+        elif line:
+            key, value = line.split("=", 1)
+            section.append((key, value))
+    return sections
+
+
+def unescape(value: str, words: bool) -> list[str]:
+    return [
+        word.replace("$$", "$").replace("%%", "%")
+        for word in (shlex.split(value) if words else [value])
+    ]
+
+
+def argv_options(args: list[str]) -> list[tuple[str, Optional[str]]]:
+    """
+    the flags and values of a generated podman command line
+    """
+    options: list[tuple[str, Optional[str]]] = []
+    words = iter(args)
+    for word in words:
+        if word.startswith("--") and "=" in word:
+            flag, value = word.split("=", 1)
+            options.append((flag, value))
+        elif word in FLAGS_WITHOUT_VALUE:
+            options.append((word, None))
+        else:
+            options.append((word, next(words)))
+    return options
+
+
+def podman_options(lines: list[tuple[str, str]], keys: dict[str, str]) -> list[tuple[str, Any]]:
+    """
+    the options of the podman command line the keys stand for
+    """
+    flags = {key: flag for flag, key in keys.items()}
+    options: list[tuple[str, Optional[str]]] = []
+    for key, value in lines:
+        if key == "PodmanArgs":
+            args = unescape(value, True)
+            options.extend(argv_options(args))
+        elif key in flags:
+            for word in unescape(value, key in QUADLET_WORD_KEYS):
+                options.append((flags[key], None if word == "true" else word))
+    return options
+
+
+class TestComposeQuadlet(ComposeFileTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        write_compose_file(
+            self.compose_path,
+            {
+                "services": {
+                    "db": {
+                        "image": "postgres",
+                        "environment": {"PASSWORD": "s3cret word $HOME 100%"},
+                        "volumes": ["dbdata:/var/lib/postgresql/data", "/cache"],
+                        "healthcheck": {"test": ["CMD", "pg_isready"], "interval": "5s"},
+                        "restart": "unless-stopped",
+                        "networks": ["back"],
+                    },
+                    "migrate": {
+                        "image": "app",
+                        "command": 'migrate --message "it\'s \\"done\\""',
+                        "depends_on": {"db": {"condition": "service_healthy"}},
+                        "networks": ["back"],
+                    },
+                    "web": {
+                        "image": "app",
+                        "scale": 2,
+                        "command": ["serve", "--bind", "0.0.0.0:80"],
+                        "ports": ["8080-8081:80"],
+                        "labels": {"a.b": "x y", "-tier": "front"},
+                        "cap_add": ["NET_ADMIN"],
+                        "read_only": True,
+                        "user": "1000",
+                        "volumes": ["./static:/srv/static:ro"],
+                        "depends_on": {
+                            "migrate": {"condition": "service_completed_successfully"},
+                            "cache": {"condition": "service_started", "required": False},
+                        },
+                        "networks": ["front", "back", "outside"],
+                    },
+                    "cache": {"image": "redis", "network_mode": "host"},
+                },
+                "volumes": {"dbdata": {"driver_opts": {"type": "tmpfs", "device": "tmpfs"}}},
+                "networks": {
+                    "front": {},
+                    "back": {
+                        "internal": True,
+                        "ipam": {"config": [{"subnet": "10.89.1.0/24"}]},
+                        "x-podman.routes": ["10.1.0.0/16,10.89.1.1"],
+                    },
+                    "outside": {"external": True},
+                },
+            },
+        )
+        self.compose = self.parse_in_pod("false")
+
+    def parse_in_pod(self, in_pod: str) -> PodmanCompose:
+        compose = new_compose(self.compose_path, in_pod=in_pod)
+        compose.global_args.pod_args = None
+        compose._parse_compose_file()
+        compose.podman = mock.Mock(
+            output=mock.AsyncMock(side_effect=AssertionError("podman must not be called")),
+            run=mock.AsyncMock(side_effect=AssertionError("podman must not be called")),
+        )
+        return compose
+
+    async def test_containers_round_trip(self) -> None:
+        files = await quadlet_files(self.compose)
+
+        for cnt in self.compose.containers:
+            args = await container_to_args(
+                self.compose, cnt, detached=False, no_deps=True, create_resources=False
+            )
+            container = parse_unit(files[f"{cnt['name']}.container"])["Container"]
+            image = [value for key, value in container if key == "Image"]
+            command = [
+                word for key, value in container if key == "Exec" for word in unescape(value, True)
+            ]
+            self.assertEqual(image + command, args[len(args) - len(image) - len(command) :])
+            expected = [
+                (flag, value)
+                for flag, value in argv_options(args[: len(args) - len(image) - len(command)])
+                if flag != "--restart" and not str(value).startswith("PODMAN_SYSTEMD_UNIT=")
+            ]
+            self.assertEqual(
+                sorted(podman_options(container, QUADLET_CONTAINER_KEYS), key=str),
+                sorted(expected, key=str),
+            )
+
+    async def test_resources_round_trip(self) -> None:
+        files = await quadlet_files(self.compose)
+
+        resources = sorted(fn for fn in files if not fn.endswith(".container"))
+        self.assertEqual(
+            [fn for fn in resources if not fn.startswith("p_db_")],
+            ["p_back.network", "p_dbdata.volume", "p_front.network"],
+        )
+        # the anonymous volume of db
+        self.assertEqual(len([fn for fn in resources if fn.startswith("p_db_")]), 1)
+        for net in ("front", "back"):
+            network = parse_unit(files[f"p_{net}.network"])["Network"]
+            args = get_network_create_args(self.compose.networks[net], "p", f"p_{net}")
+            self.assertEqual(network[0], ("NetworkName", f"p_{net}"))
+            self.assertEqual(
+                sorted(podman_options(network, QUADLET_NETWORK_KEYS), key=str),
+                sorted(argv_options(args[1:-1]), key=str),
+            )
+        volume = parse_unit(files["p_dbdata.volume"])["Volume"]
+        args = get_volume_create_args((self.compose.vols or {})["dbdata"], "p", "p_dbdata")
+        self.assertEqual(
+            sorted(podman_options(volume, QUADLET_VOLUME_KEYS), key=str),
+            sorted(argv_options(args[1:-1]), key=str),
+        )
+
+    async def test_dependency_order(self) -> None:
+        files = {
+            fn: parse_unit(content) for fn, content in (await quadlet_files(self.compose)).items()
+        }
+        web = dict(files["p_web_2.container"]["Unit"])
+
+        self.assertEqual(
+            web["Requires"].split(),
+            ["p_migrate_1.service", "p_front-network.service", "p_back-network.service"],
+        )
+        self.assertEqual(web["Wants"].split(), ["p_cache_1.service"])
+        self.assertEqual(web["After"].split(), web["Requires"].split() + ["p_cache_1.service"])
+        self.assertIn(("Notify", "healthy"), files["p_db_1.container"]["Container"])
+        self.assertEqual(
+            files["p_migrate_1.container"]["Service"],
+            [("Type", "oneshot"), ("RemainAfterExit", "yes"), ("TimeoutStopSec", "40")],
+        )
+        self.assertEqual(dict(files["p_db_1.container"]["Service"])["Restart"], "always")
+        self.assertIn(
+            "p_dbdata-volume.service", dict(files["p_db_1.container"]["Unit"])["Requires"]
+        )
+
+    async def test_pod(self) -> None:
+        compose = self.parse_in_pod("true")
+
+        with self.assertLogs("podman_compose", "WARNING"):
+            files = await quadlet_files(compose)
+
+        self.assertEqual(
+            parse_unit(files["pod_p.pod"])["Pod"],
+            [("PodName", "pod_p"), ("PodmanArgs", "--share=")],
+        )
+        self.assertIn(("Pod", "pod_p.pod"), parse_unit(files["p_web_1.container"])["Container"])
+
+    async def test_write_files(self) -> None:
+        output = os.path.join(self.dir, "quadlet")
+        args = podman_compose._parse_args(["quadlet", "--output", output])
+
+        with redirect_stdout(io.StringIO()) as stdout:
+            await compose_quadlet(self.compose, args)
+
+        self.assertEqual(sorted(os.listdir(output)), sorted(await quadlet_files(self.compose)))
+        self.assertIn(
+            "systemctl --user start 'p_cache_1.service' 'p_db_1.service'", stdout.getvalue()
+        )
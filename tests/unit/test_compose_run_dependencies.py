@@ -0,0 +1,85 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import unittest
+from typing import Any
+from unittest import mock
+
+from podman_compose import ExistingContainer
+from podman_compose import compose_run
+from podman_compose import podman_compose
+from tests.unit.test_utils import ComposeFileTestCase
+
+
+class TestComposeRunDependencies(ComposeFileTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.parse({
+            "services": {
+                "db": {"image": "busybox"},
+                "cache": {"image": "busybox", "scale": 2},
+                "migrate": {"image": "busybox", "depends_on": ["db", "cache"]},
+            },
+        })
+        self.podman_run = mock.AsyncMock(return_value=0)
+        self.existing_containers = mock.AsyncMock(return_value=self.running_containers())
+        self.compose.podman = mock.Mock(
+            run=self.podman_run,
+            output=mock.AsyncMock(return_value=b""),
+            existing_containers=self.existing_containers,
+        )
+        self.up = mock.AsyncMock()
+        self.build = mock.AsyncMock()
+        self.compose.commands = {**podman_compose.commands, "up": self.up, "build": self.build}
+
+    def running_containers(self, **overrides: Any) -> dict[str, ExistingContainer]:
+        containers = {}
+        for name, service in (("p_db_1", "db"), ("p_cache_1", "cache"), ("p_cache_2", "cache")):
+            fields = {
+                "name": name,
+                "id": name,
+                "service_name": service,
+                "config_hash": self.compose.config_hash(self.compose.services[service]),
+                "image_id": "",
+                "exited": False,
+                "state": "running",
+                "status": "Up",
+                **overrides.get(name, {}),
+            }
+            containers[name] = ExistingContainer(**fields)
+        return containers
+
+    async def run_migrate(self) -> None:
+        args = podman_compose._parse_args(["run", "--rm", "migrate", "true"])
+        with self.assertRaises(SystemExit):
+            await compose_run(self.compose, args)
+
+    async def test_running_dependencies_skip_up(self) -> None:
+        await self.run_migrate()
+
+        self.up.assert_not_called()
+        # there is nothing to build
+        self.build.assert_not_called()
+        self.assertEqual(self.podman_run.call_args.args[1], "run")
+
+    async def test_outdated_dependency_runs_up(self) -> None:
+        self.existing_containers.return_value = self.running_containers(
+            p_cache_2={"config_hash": "outdated"}
+        )
+
+        await self.run_migrate()
+
+        self.up.assert_called_once()
+        self.assertEqual(sorted(self.up.call_args.args[1].services), ["cache", "db"])
+
+    async def test_stopped_or_missing_dependency_runs_up(self) -> None:
+        for containers in (
+            self.running_containers(p_db_1={"state": "exited", "exited": True}),
+            {"p_db_1": self.running_containers()["p_db_1"]},
+        ):
+            self.up.reset_mock()
+            self.existing_containers.return_value = containers
+
+            await self.run_migrate()
+
+            self.up.assert_called_once()
@@ -0,0 +1,122 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import asyncio
+import unittest
+from typing import Any
+from unittest import mock
+
+from podman_compose import ExistingContainer
+from podman_compose import podman_compose
+from tests.unit.test_utils import ComposeFileTestCase
+from tests.unit.test_utils import write_compose_file
+
+
+def existing(service: str, num: int) -> ExistingContainer:
+    return ExistingContainer(
+        name=f"p_{service}_{num}",
+        id=f"{service}{num}",
+        service_name=service,
+        config_hash="",
+        image_id="",
+        exited=False,
+        state="running",
+        status="Up",
+        number=num,
+    )
+
+
+class TestComposeScale(ComposeFileTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        write_compose_file(
+            self.compose_path,
+            {
+                "services": {
+                    "db": {"image": "busybox", "stop_grace_period": "30s"},
+                    "worker": {"image": "busybox", "scale": 3, "depends_on": ["db"]},
+                    "named": {"image": "busybox", "container_name": "named"},
+                },
+            },
+        )
+        self.compose.commands = podman_compose.commands
+        self.calls: list[list[str]] = []
+
+        async def podman_run(
+            podman_args: list[str], cmd: str, cmd_args: list[str], **kwargs: Any
+        ) -> int:
+            self.calls.append([cmd, *cmd_args])
+            await asyncio.sleep(0)
+            return 0
+
+        self.existing_containers = mock.AsyncMock(return_value={})
+        self.compose.podman = mock.Mock(
+            run=mock.AsyncMock(side_effect=podman_run),
+            output=mock.AsyncMock(return_value=b""),
+            existing_containers=self.existing_containers,
+        )
+
+    async def scale(self, *argv: str) -> int:
+        args = podman_compose._parse_args([
+            "-f",
+            self.compose_path,
+            "-p",
+            "p",
+            "--in-pod=false",
+            "scale",
+            *argv,
+        ])
+        self.compose.global_args = args
+        self.compose._parse_compose_file()
+        return await self.compose.commands["scale"](self.compose, args)
+
+    def test_scale_overrides_only_named_services(self) -> None:
+        self.compose.global_args.scale = ["db=2"]
+        self.compose._parse_compose_file()
+
+        self.assertEqual(self.compose.container_names_by_service["db"], ["p_db_1", "p_db_2"])
+        self.assertEqual(len(self.compose.container_names_by_service["worker"]), 3)
+
+    async def test_scale_up_creates_missing_replicas(self) -> None:
+        self.existing_containers.return_value = {
+            "p_db_1": existing("db", 1),
+            "p_worker_1": existing("worker", 1),
+            "p_worker_2": existing("worker", 2),
+        }
+
+        exit_code = await self.scale("worker=4")
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(
+            [call[:2] for call in self.calls if call[0] == "create"],
+            [["create", "--name=p_worker_3"], ["create", "--name=p_worker_4"]],
+        )
+        self.assertEqual(
+            sorted(call for call in self.calls if call[0] == "start"),
+            [["start", "p_worker_3"], ["start", "p_worker_4"]],
+        )
+        self.assertNotIn("stop", [call[0] for call in self.calls])
+
+    async def test_scale_down_removes_highest_numbered(self) -> None:
+        self.existing_containers.return_value = {
+            f"p_worker_{num}": existing("worker", num) for num in (1, 2, 10, 3)
+        }
+        self.existing_containers.return_value["p_db_1"] = existing("db", 1)
+
+        exit_code = await self.scale("worker=1", "db=0")
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(
+            sorted(self.calls),
+            [
+                ["rm", "p_db_1"],
+                ["rm", "p_worker_10", "p_worker_3", "p_worker_2"],
+                ["stop", "-t", "10", "p_worker_10", "p_worker_3", "p_worker_2"],
+                ["stop", "-t", "30", "p_db_1"],
+            ],
+        )
+
+    async def test_invalid_arguments(self) -> None:
+        for argv in (["missing=1"], ["worker=-1"], ["worker"], ["named=2"]):
+            self.assertEqual(await self.scale(*argv), 1)
+        self.assertEqual(self.calls, [])
@@ -0,0 +1,184 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import hashlib
+import json
+import os
+import stat
+import subprocess
+import unittest
+from typing import Any
+from unittest import mock
+
+from podman_compose import create_secrets_from_environment
+from podman_compose import secret_content_hash
+from podman_compose import secret_hash_key_file
+from podman_compose import secret_value_hash
+from tests.unit.test_utils import ComposeFileTestCase
+from tests.unit.test_utils import new_compose
+
+
+class TestSecretHashes(ComposeFileTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.env = {"DB_PASSWORD": "s3cret", "API_TOKEN": "t0ken", "UNCHANGED": "same"}
+        config_home = mock.patch.dict(
+            os.environ, {"XDG_CONFIG_HOME": os.path.join(self.dir, "config")}
+        )
+        config_home.start()
+        self.addCleanup(config_home.stop)
+        self.parse({
+            "services": {
+                "db": {"image": "postgres", "secrets": ["password"]},
+                "api": {
+                    "image": "app",
+                    "secrets": [{"source": "token", "target": "/etc/token"}],
+                },
+                "web": {"image": "app"},
+            },
+            "secrets": {
+                "password": {"environment": "DB_PASSWORD"},
+                "token": {"environment": "API_TOKEN"},
+                "unchanged": {"environment": "UNCHANGED"},
+            },
+        })
+        self.secrets: list[dict[str, Any]] = []
+
+        async def output(podman_args: list[str], cmd: str, cmd_args: list[str]) -> bytes:
+            self.assertEqual([cmd, *cmd_args[:3]], ["secret", "ls", "--format", "json"])
+            self.assertEqual(cmd_args[3:], ["--filter", "label=io.podman.compose.project=p"])
+            return json.dumps(self.secrets).encode()
+
+        self.podman_output = mock.AsyncMock(side_effect=output)
+        self.podman_run = mock.AsyncMock(return_value=0)
+        self.compose.podman = mock.Mock(output=self.podman_output, run=self.podman_run)
+
+    def secret(self, name: str, content_hash: str) -> dict[str, Any]:
+        return {
+            "ID": f"{name}-id",
+            "Spec": {
+                "Name": f"p_{name}",
+                "Labels": {
+                    "io.podman.compose.project": "p",
+                    "io.podman.compose.secret-hash": content_hash,
+                },
+            },
+        }
+
+    async def create_secrets(self) -> list[list[str]]:
+        with mock.patch.dict(os.environ, self.env):
+            await create_secrets_from_environment(self.compose)
+        return [call.args[2] for call in self.podman_run.call_args_list]
+
+    async def test_only_changed_secrets_are_replaced(self) -> None:
+        with mock.patch.dict(os.environ, self.env):
+            self.secrets = [
+                self.secret(name, secret_content_hash(self.compose, name) or "")
+                for name in ("token", "unchanged")
+            ]
+        self.env["API_TOKEN"] = "new"
+        with mock.patch.dict(os.environ, self.env):
+            token_hash = secret_content_hash(self.compose, "token")
+            password_hash = secret_content_hash(self.compose, "password")
+
+        calls = await self.create_secrets()
+
+        self.podman_output.assert_awaited_once()
+        self.assertEqual(
+            sorted(calls, key=lambda call: call[-2]),
+            [
+                [
+                    "create",
+                    "--replace",
+                    "--label",
+                    "io.podman.compose.project=p",
+                    "--label",
+                    f"io.podman.compose.secret-hash={password_hash}",
+                    "--env",
+                    "p_password",
+                    "DB_PASSWORD",
+                ],
+                [
+                    "create",
+                    "--replace",
+                    "--label",
+                    "io.podman.compose.project=p",
+                    "--label",
+                    f"io.podman.compose.secret-hash={token_hash}",
+                    "--env",
+                    "p_token",
+                    "API_TOKEN",
+                ],
+            ],
+        )
+
+    async def test_older_podman_removes_changed_secrets(self) -> None:
+        self.compose.podman_version = "4.6.2"
+        with mock.patch.dict(os.environ, self.env):
+            self.secrets = [
+                self.secret(name, secret_content_hash(self.compose, name) or "")
+                for name in ("token", "unchanged")
+            ]
+        self.env["API_TOKEN"] = "new"
+
+        calls = await self.create_secrets()
+
+        # the new secret is created, the changed one removed first, neither with --replace
+        self.assertEqual(calls[1], ["rm", "p_token"])
+        self.assertEqual([calls[0][-2], calls[2][-2]], ["p_password", "p_token"])
+        self.assertEqual([calls[0][:2], calls[2][:2]], [["create", "--label"]] * 2)
+
+    async def test_up_to_date_secrets_are_kept(self) -> None:
+        with mock.patch.dict(os.environ, self.env):
+            self.secrets = [
+                self.secret(name, secret_content_hash(self.compose, name) or "")
+                for name in ("password", "token", "unchanged")
+            ]
+
+        self.assertEqual(await self.create_secrets(), [])
+
+    async def test_unset_variable(self) -> None:
+        del self.env["API_TOKEN"]
+
+        with mock.patch.dict(os.environ, {}, clear=True), self.assertRaises(ValueError):
+            await create_secrets_from_environment(self.compose)
+
+    async def test_listing_fails(self) -> None:
+        self.podman_output.side_effect = subprocess.CalledProcessError(125, "podman")
+
+        with self.assertLogs("podman_compose", "WARNING"):
+            calls = await self.create_secrets()
+
+        self.assertEqual(len(calls), 3)
+
+    def test_hash_is_keyed_per_user(self) -> None:
+        content_hash = secret_value_hash("password", "s3cret")
+
+        key_file = secret_hash_key_file()
+        self.assertEqual(
+            key_file, os.path.join(self.dir, "config/containers/compose/secret-hash.key")
+        )
+        self.assertEqual(stat.S_IMODE(os.stat(key_file).st_mode), 0o600)
+        self.assertEqual(secret_value_hash("password", "s3cret"), content_hash)
+        self.assertNotEqual(secret_value_hash("password", "other"), content_hash)
+        self.assertNotEqual(hashlib.sha256(b"password\0s3cret").hexdigest(), content_hash)
+        with mock.patch.dict(os.environ, {"XDG_CONFIG_HOME": os.path.join(self.dir, "other")}):
+            self.assertNotEqual(secret_value_hash("password", "s3cret"), content_hash)
+
+    def test_changed_secret_changes_config_hash(self) -> None:
+        def config_hashes() -> dict[str, str]:
+            with mock.patch.dict(os.environ, self.env):
+                compose = new_compose(self.compose_path)
+                compose._parse_compose_file()
+                return {
+                    name: compose.config_hash(compose.services[name]) for name in compose.services
+                }
+
+        before = config_hashes()
+        self.assertEqual(before, config_hashes())
+        self.env["API_TOKEN"] = "new"
+        after = config_hashes()
+
+        self.assertNotEqual(before["api"], after["api"])
+        self.assertEqual(before["db"], after["db"])
+        self.assertEqual(before["web"], after["web"])
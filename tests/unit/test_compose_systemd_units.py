@@ -0,0 +1,126 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from podman_compose import compose_systemd
+from podman_compose import podman_compose
+from podman_compose import systemd_units
+from tests.unit.test_utils import ComposeFileTestCase
+
+
+def unit_values(unit: str, key: str) -> list[str]:
+    return [
+        value
+        for line in unit.splitlines()
+        if line.startswith(f"{key}=")
+        for value in line.split("=", 1)[1].split()
+    ]
+
+
+class TestSystemdUnits(ComposeFileTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.parse({
+            "services": {
+                "db": {
+                    "image": "postgres",
+                    "restart": "unless-stopped",
+                    "stop_grace_period": "1m",
+                },
+                "migrate": {
+                    "image": "app",
+                    "depends_on": {"db": {"condition": "service_healthy"}},
+                },
+                "web": {
+                    "image": "app",
+                    "scale": 2,
+                    "restart": "on-failure:3",
+                    "depends_on": {
+                        "migrate": {"condition": "service_completed_successfully"},
+                        "cache": {"condition": "service_started", "required": False},
+                    },
+                },
+                "cache": {"image": "redis"},
+            },
+        })
+        self.units = systemd_units(self.compose, "/usr/bin/podman")
+
+    def test_unit_per_container_and_target(self) -> None:
+        self.assertEqual(
+            sorted(self.units),
+            [
+                "podman-compose-p-p_cache_1.service",
+                "podman-compose-p-p_db_1.service",
+                "podman-compose-p-p_migrate_1.service",
+                "podman-compose-p-p_web_1.service",
+                "podman-compose-p-p_web_2.service",
+                "podman-compose-p.target",
+            ],
+        )
+        self.assertEqual(
+            sorted(unit_values(self.units["podman-compose-p.target"], "Wants")),
+            sorted(name for name in self.units if name.endswith(".service")),
+        )
+        for name in ("p_web_1", "p_web_2"):
+            self.assertEqual(
+                unit_values(self.units[f"podman-compose-p-{name}.service"], "ExecStart"),
+                ["/usr/bin/podman", "start", "-a", name],
+            )
+
+    def test_dependency_order(self) -> None:
+        web = self.units["podman-compose-p-p_web_2.service"]
+
+        self.assertEqual(
+            unit_values(web, "After"),
+            [
+                "network-online.target",
+                "podman-compose-p-p_migrate_1.service",
+                "podman-compose-p-p_cache_1.service",
+            ],
+        )
+        self.assertEqual(unit_values(web, "Requires"), ["podman-compose-p-p_migrate_1.service"])
+        self.assertIn("podman-compose-p-p_cache_1.service", unit_values(web, "Wants"))
+        self.assertEqual(unit_values(web, "PartOf"), ["podman-compose-p.target"])
+        self.assertEqual(unit_values(self.units["podman-compose-p-p_db_1.service"], "Requires"), [])
+
+    def test_conditions_and_restart(self) -> None:
+        db = self.units["podman-compose-p-p_db_1.service"]
+        migrate = self.units["podman-compose-p-p_migrate_1.service"]
+
+        self.assertEqual(
+            unit_values(db, "ExecStartPost"),
+            ["/usr/bin/podman", "wait", "--condition=healthy", "p_db_1"],
+        )
+        self.assertEqual(unit_values(db, "Restart"), ["always"])
+        self.assertEqual(
+            unit_values(db, "ExecStop"), ["/usr/bin/podman", "stop", "-t", "60", "p_db_1"]
+        )
+        self.assertEqual(unit_values(migrate, "Type"), ["oneshot"])
+        self.assertEqual(unit_values(migrate, "Restart"), [])
+        self.assertEqual(
+            unit_values(self.units["podman-compose-p-p_web_1.service"], "Restart"), ["on-failure"]
+        )
+
+    async def test_generate_units(self) -> None:
+        unit_dir = os.path.join(self.dir, "units")
+        args = podman_compose._parse_args([
+            "systemd",
+            "-a",
+            "generate-units",
+            "--unit-dir",
+            unit_dir,
+        ])
+        self.compose.podman = mock.Mock(podman_path="podman")
+
+        with redirect_stdout(io.StringIO()) as stdout:
+            await compose_systemd(self.compose, args)
+
+        self.assertEqual(sorted(os.listdir(unit_dir)), sorted(self.units))
+        with open(os.path.join(unit_dir, "podman-compose-p-p_db_1.service"), encoding="utf-8") as f:
+            self.assertIn("ExecStart=/usr/bin/env podman start -a p_db_1\n", f.read())
+        self.assertIn("systemctl --user enable --now 'podman-compose-p.target'", stdout.getvalue())
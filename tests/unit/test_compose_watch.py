@@ -0,0 +1,167 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import asyncio
+import os
+import tempfile
+import unittest
+from typing import Any
+from typing import Callable
+from unittest import mock
+
+import yaml
+
+from podman_compose import FileWatcher
+from podman_compose import PodmanCompose
+from podman_compose import get_watched_files
+from podman_compose import podman_compose
+
+
+class TestFileWatcher(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "docker-compose.yml")
+        self.missing = os.path.join(self.tmp_dir.name, ".env")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("services: {}\n")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    async def check_changes(self, watcher: FileWatcher) -> None:
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("# changed\n")
+            self.assertEqual(await asyncio.wait_for(watcher.wait(0.05), 5), {self.path})
+            with open(self.missing, "w", encoding="utf-8") as f:
+                f.write("A=1\n")
+            self.assertEqual(await asyncio.wait_for(watcher.wait(0.05), 5), {self.missing})
+        finally:
+            watcher.close()
+
+    async def test_polling(self) -> None:
+        watcher = FileWatcher([self.path, self.missing], poll_interval=0.01, use_inotify=False)
+
+        self.assertFalse(watcher.uses_inotify)
+        await self.check_changes(watcher)
+
+    async def test_inotify(self) -> None:
+        watcher = FileWatcher([self.path, self.missing])
+        if not watcher.uses_inotify:
+            watcher.close()
+            self.skipTest("inotify is not available")
+
+        await self.check_changes(watcher)
+
+
+class TestComposeWatch(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.compose_path = os.path.join(self.tmp_dir.name, "docker-compose.yml")
+        self.env_path = os.path.join(self.tmp_dir.name, "worker.env")
+        self.common_path = os.path.join(self.tmp_dir.name, "common.yml")
+        with open(self.env_path, "w", encoding="utf-8") as f:
+            f.write("A=1\n")
+        with open(self.common_path, "w", encoding="utf-8") as f:
+            yaml.safe_dump({"services": {"base": {"image": "busybox"}}}, f)
+        self.services: dict[str, Any] = {
+            "web": {"image": "busybox", "extends": {"file": "common.yml", "service": "base"}},
+            "worker": {"image": "busybox", "env_file": "worker.env"},
+            "db": {"image": "busybox"},
+        }
+        self.write_compose()
+        self.compose = PodmanCompose()
+        self.compose.global_args = podman_compose._parse_args([
+            "-f",
+            self.compose_path,
+            "-p",
+            "p",
+            "--in-pod=false",
+            "watch",
+        ])
+        self.compose._parse_compose_file()
+        self.up_calls: list[tuple[list[str], bool]] = []
+
+        async def up(compose: PodmanCompose, args: Any) -> None:
+            self.up_calls.append((args.services, args.force_recreate))
+
+        up_command = mock.AsyncMock(side_effect=up)
+        up_command._parse_args = podman_compose.commands["up"]._parse_args
+        self.compose.commands = {**podman_compose.commands, "up": up_command}
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def write_compose(self) -> None:
+        with open(self.compose_path, "w", encoding="utf-8") as f:
+            yaml.safe_dump({"services": self.services}, f)
+
+    def test_watched_files(self) -> None:
+        config_files, env_files = get_watched_files(self.compose)
+
+        self.assertEqual(
+            config_files,
+            {
+                os.path.realpath(self.compose_path),
+                os.path.realpath(self.common_path),
+                os.path.realpath(os.path.join(self.tmp_dir.name, ".env")),
+            },
+        )
+        self.assertEqual(env_files, {os.path.realpath(self.env_path): {"worker"}})
+
+    async def watch(self, *changes: Callable[[], str]) -> None:
+        pending = list(changes)
+
+        async def wait(debounce: float) -> set[str]:
+            if not pending:
+                raise asyncio.CancelledError()
+            return {os.path.realpath(pending.pop(0)())}
+
+        watcher = mock.Mock(paths=set(), trees=set(), uses_inotify=False, wait=wait)
+        with mock.patch("podman_compose.FileWatcher", return_value=watcher):
+            with self.assertRaises(asyncio.CancelledError):
+                await self.compose.commands["watch"](self.compose, self.compose.global_args)
+        watcher.close.assert_called_once()
+
+    async def test_only_changed_services_are_recreated(self) -> None:
+        def change_web() -> str:
+            self.services["web"]["environment"] = {"B": "2"}
+            self.write_compose()
+            return self.compose_path
+
+        def touch_compose() -> str:
+            self.write_compose()
+            return self.compose_path
+
+        def change_env_file() -> str:
+            with open(self.env_path, "w", encoding="utf-8") as f:
+                f.write("A=2\n")
+            return self.env_path
+
+        def change_extended_file() -> str:
+            with open(self.common_path, "w", encoding="utf-8") as f:
+                yaml.safe_dump({"services": {"base": {"image": "busybox", "init": True}}}, f)
+            return self.common_path
+
+        await self.watch(change_web, touch_compose, change_env_file, change_extended_file)
+
+        self.assertEqual(
+            self.up_calls,
+            [([], False), (["web"], True), (["worker"], True), (["web"], True)],
+        )
+
+    async def test_invalid_file_keeps_watching(self) -> None:
+        def break_compose() -> str:
+            with open(self.compose_path, "w", encoding="utf-8") as f:
+                f.write("services: [\n")
+            return self.compose_path
+
+        def add_service() -> str:
+            self.services["cache"] = {"image": "busybox"}
+            self.write_compose()
+            return self.compose_path
+
+        with self.assertLogs("podman_compose", "ERROR"):
+            await self.watch(break_compose, add_service)
+
+        self.assertEqual(self.up_calls, [([], False), (["cache"], True)])
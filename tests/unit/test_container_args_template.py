@@ -0,0 +1,88 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import os
+import unittest
+from unittest import mock
+
+from podman_compose import _container_to_args
+from podman_compose import container_to_args
+from tests.unit.test_utils import ComposeFileTestCase
+
+
+class TestContainerArgsTemplate(ComposeFileTestCase, unittest.IsolatedAsyncioTestCase):
+    project_name = "test_project"
+
+    def setUp(self) -> None:
+        super().setUp()
+        with open(os.path.join(self.dir, "app.env"), "w", encoding="utf-8") as f:
+            f.write("A=1\n")
+        self.podman_output = mock.AsyncMock(return_value=b"")
+        self.compose.podman = mock.Mock(output=self.podman_output)
+
+    async def test_replicas_match_full_computation(self) -> None:
+        self.parse({
+            "services": {
+                "db": {"image": "busybox"},
+                "worker": {
+                    "image": "busybox",
+                    "scale": 3,
+                    "env_file": "app.env",
+                    "labels": {"a": "b"},
+                    "volumes": ["data:/data"],
+                    "depends_on": ["db"],
+                    "command": ["--label", "x"],
+                },
+            },
+            "volumes": {"data": {}},
+        })
+
+        for cnt in self.compose.containers:
+            expected = await _container_to_args(self.compose, cnt, False, False)
+            self.assertEqual(await container_to_args(self.compose, cnt, False), expected)
+
+    async def test_service_resolved_once(self) -> None:
+        self.parse({
+            "services": {
+                "worker": {"image": "busybox", "scale": 300, "env_file": "app.env"},
+            },
+        })
+
+        with mock.patch("podman_compose.dotenv_to_dict", return_value={"A": "1"}) as dotenv:
+            all_args = [
+                await container_to_args(self.compose, cnt) for cnt in self.compose.containers
+            ]
+
+        dotenv.assert_called_once()
+        # network exists probe
+        self.podman_output.assert_called_once()
+        self.assertEqual(all_args[41][0], "--name=test_project_worker_42")
+        self.assertIn("com.docker.compose.container-number=42", all_args[41])
+        self.assertNotIn("com.docker.compose.container-number=1", all_args[41])
+
+    async def test_replica_overrides_are_not_shared(self) -> None:
+        self.parse({"services": {"worker": {"image": "busybox", "scale": 2}}})
+        cnt1, cnt2 = self.compose.containers
+        cnt2["x-podman.no_hosts"] = True
+
+        args1 = await container_to_args(self.compose, cnt1)
+        args2 = await container_to_args(self.compose, cnt2)
+
+        self.assertNotIn("--no-hosts", args1)
+        self.assertIn("--no-hosts", args2)
+
+    async def test_identical_services_are_not_shared(self) -> None:
+        self.parse({
+            "services": {
+                "a": {"image": "busybox", "volumes": ["/data"]},
+                "b": {"image": "busybox", "volumes": ["/data"]},
+            },
+        })
+
+        for cnt in self.compose.containers:
+            expected = await _container_to_args(self.compose, cnt, True, False)
+            self.assertEqual(await container_to_args(self.compose, cnt), expected)
+        args_b = await container_to_args(self.compose, self.compose.containers[1])
+        self.assertIn("--network=test_project_default:alias=b", args_b)
+        self.assertNotIn("--network=test_project_default:alias=a", args_b)
+        self.assertFalse([arg for arg in args_b if "source=test_project_a_" in arg])
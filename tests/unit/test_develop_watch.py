@@ -0,0 +1,226 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import asyncio
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+from typing import IO
+from typing import Any
+from typing import Callable
+from typing import Optional
+from unittest import mock
+
+import yaml
+from parameterized import parameterized
+
+from podman_compose import FileWatcher
+from podman_compose import PodmanCompose
+from podman_compose import get_watch_rules
+from podman_compose import podman_compose
+from podman_compose import watch_path_ignored
+
+
+class TestFileWatcherTrees(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tree = os.path.realpath(os.path.join(self.tmp_dir.name, "src"))
+        os.makedirs(self.tree)
+        with open(os.path.join(self.tree, "main.py"), "w", encoding="utf-8") as f:
+            f.write("")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    async def check_changes(self, watcher: FileWatcher) -> None:
+        package = os.path.join(self.tree, "pkg")
+        module = os.path.join(package, "mod.py")
+        try:
+            os.makedirs(package)
+            with open(module, "w", encoding="utf-8") as f:
+                f.write("")
+            self.assertEqual(await asyncio.wait_for(watcher.wait(0.1), 5), {package, module})
+            with open(module, "w", encoding="utf-8") as f:
+                f.write("x = 1\n")
+            self.assertEqual(await asyncio.wait_for(watcher.wait(0.1), 5), {module})
+            os.remove(module)
+            self.assertEqual(await asyncio.wait_for(watcher.wait(0.1), 5), {module})
+        finally:
+            watcher.close()
+
+    async def test_polling(self) -> None:
+        watcher = FileWatcher([], [self.tree], poll_interval=0.01, use_inotify=False)
+
+        await self.check_changes(watcher)
+
+    async def test_inotify(self) -> None:
+        watcher = FileWatcher([], [self.tree])
+        if not watcher.uses_inotify:
+            watcher.close()
+            self.skipTest("inotify is not available")
+
+        await self.check_changes(watcher)
+
+
+class TestWatchPathIgnored(unittest.TestCase):
+    @parameterized.expand([
+        ("app.py", ["*.pyc"], False),
+        ("app.pyc", ["*.pyc"], True),
+        ("pkg/app.pyc", ["*.pyc"], True),
+        ("node_modules/a/index.js", ["node_modules/"], True),
+        ("web/node_modules/index.js", ["**/node_modules"], True),
+        ("keep.log", ["*.log", "!keep.log"], False),
+        (".git/HEAD", [], True),
+        (".app.py.swp", [], True),
+    ])
+    def test_ignored(self, rel: str, patterns: list[str], expected: bool) -> None:
+        self.assertEqual(watch_path_ignored(rel, patterns), expected)
+
+
+class TestDevelopWatch(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = os.path.realpath(self.tmp_dir.name)
+        for path in ("src/app.py", "src/old.py", "conf/worker.conf", "package.json"):
+            os.makedirs(os.path.dirname(self.path(path)), exist_ok=True)
+            with open(self.path(path), "w", encoding="utf-8") as f:
+                f.write(path)
+        self.services: dict[str, Any] = {
+            "web": {
+                "build": ".",
+                "develop": {
+                    "watch": [
+                        {
+                            "action": "sync",
+                            "path": "./src",
+                            "target": "/app/src",
+                            "ignore": ["*.pyc"],
+                        },
+                        {"action": "rebuild", "path": "package.json"},
+                    ]
+                },
+            },
+            "worker": {
+                "image": "busybox",
+                "scale": 2,
+                "develop": {
+                    "watch": [
+                        {"action": "sync+restart", "path": "./conf", "target": "/etc/worker"},
+                    ]
+                },
+            },
+        }
+        self.compose = self.parse()
+        self.calls: list[list[str]] = []
+        self.archives: list[list[str]] = []
+
+        async def podman_run(
+            podman_args: list[str],
+            cmd: str,
+            cmd_args: list[str],
+            stdin: Optional[IO[bytes]] = None,
+        ) -> int:
+            self.calls.append([cmd, *cmd_args])
+            if stdin is not None:
+                with tarfile.open(fileobj=io.BytesIO(stdin.read())) as tar:
+                    self.archives.append(sorted(tar.getnames()))
+            return 0
+
+        self.compose.podman = mock.Mock(run=mock.AsyncMock(side_effect=podman_run))
+        self.up_calls: list[tuple[list[str], bool, bool]] = []
+
+        async def up(compose: PodmanCompose, args: Any) -> None:
+            self.up_calls.append((args.services, args.force_recreate, args.build))
+
+        up_command = mock.AsyncMock(side_effect=up)
+        up_command._parse_args = podman_compose.commands["up"]._parse_args
+        self.compose.commands = {**podman_compose.commands, "up": up_command}
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def path(self, rel: str) -> str:
+        return os.path.join(self.dir, rel)
+
+    def parse(self, *argv: str) -> PodmanCompose:
+        compose_path = self.path("docker-compose.yml")
+        with open(compose_path, "w", encoding="utf-8") as f:
+            yaml.safe_dump({"services": self.services}, f)
+        compose = PodmanCompose()
+        compose.global_args = podman_compose._parse_args([
+            "-f",
+            compose_path,
+            "-p",
+            "p",
+            "--in-pod=false",
+            "watch",
+            "--no-up",
+            *argv,
+        ])
+        compose._parse_compose_file()
+        return compose
+
+    async def watch(self, *changes: Callable[[], set[str]]) -> None:
+        pending = list(changes)
+
+        async def wait(debounce: float) -> set[str]:
+            if not pending:
+                raise asyncio.CancelledError()
+            return pending.pop(0)()
+
+        watcher = mock.Mock(paths=set(), trees=set(), uses_inotify=False, wait=wait)
+        with mock.patch("podman_compose.FileWatcher", return_value=watcher) as file_watcher:
+            with self.assertRaises(asyncio.CancelledError):
+                await self.compose.commands["watch"](self.compose, self.compose.global_args)
+        self.assertEqual(file_watcher.call_args.args[1], [self.path("src"), self.path("conf")])
+        self.assertIn(self.path("package.json"), file_watcher.call_args.args[0])
+
+    async def test_sync_batch(self) -> None:
+        def edit() -> set[str]:
+            os.remove(self.path("src/old.py"))
+            with open(self.path("src/app.pyc"), "w", encoding="utf-8") as f:
+                f.write("")
+            return {self.path("src/app.py"), self.path("src/app.pyc"), self.path("src/old.py")}
+
+        await self.watch(edit)
+
+        self.assertEqual(
+            self.calls,
+            [
+                ["exec", "p_web_1", "rm", "-rf", "--", "/app/src/old.py"],
+                ["cp", "-", "p_web_1:/"],
+            ],
+        )
+        self.assertEqual(self.archives, [["app/src/app.py"]])
+        self.assertEqual(self.up_calls, [])
+
+    async def test_sync_and_restart_every_replica(self) -> None:
+        await self.watch(lambda: {self.path("conf/worker.conf")})
+
+        self.assertEqual(
+            sorted(self.calls),
+            [
+                ["cp", "-", "p_worker_1:/"],
+                ["cp", "-", "p_worker_2:/"],
+                ["restart", "p_worker_1"],
+                ["restart", "p_worker_2"],
+            ],
+        )
+        self.assertEqual(self.archives, [["etc/worker/worker.conf"]] * 2)
+
+    async def test_rebuild_only_for_rebuild_rules(self) -> None:
+        await self.watch(
+            lambda: {self.path("src/app.py")},
+            lambda: {self.path("package.json"), self.path("src/app.py")},
+        )
+
+        self.assertEqual(self.calls, [["cp", "-", "p_web_1:/"]])
+        self.assertEqual(self.up_calls, [(["web"], True, True)])
+
+    def test_sync_requires_target(self) -> None:
+        del self.services["worker"]["develop"]["watch"][0]["target"]
+
+        with self.assertRaises(ValueError):
+            get_watch_rules(self.parse())
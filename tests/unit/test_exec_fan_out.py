@@ -0,0 +1,122 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import asyncio
+import io
+import unittest
+from contextlib import redirect_stderr
+from contextlib import redirect_stdout
+from typing import Any
+from typing import Optional
+from unittest import mock
+
+from podman_compose import compose_exec_fan_out
+from podman_compose import podman_compose
+from tests.unit.test_utils import ComposeFileTestCase
+
+
+class TestExecFanOut(ComposeFileTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.parse({
+            "services": {
+                "web": {"image": "busybox", "scale": 3, "environment": {"A": "1"}},
+                "worker": {"image": "busybox", "scale": 2},
+                "db": {"image": "busybox"},
+            },
+        })
+        self.calls: list[tuple[list[str], Optional[str]]] = []
+        self.running = 0
+        self.max_running = 0
+        self.exit_codes: dict[str, int] = {}
+
+        async def podman_run(
+            podman_args: list[str], cmd: str, cmd_args: list[str], log_formatter: str
+        ) -> int:
+            self.calls.append((cmd_args, log_formatter))
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            await asyncio.sleep(0.01)
+            self.running -= 1
+            return self.exit_codes.get(cmd_args[-2], 0)
+
+        self.compose.podman = mock.Mock(run=mock.AsyncMock(side_effect=podman_run))
+
+    async def fan_out(self, *argv: str) -> tuple[int, str]:
+        args = podman_compose._parse_args(["exec", *argv])
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            exit_code = await compose_exec_fan_out(self.compose, args)
+        return exit_code, stdout.getvalue()
+
+    def exec_args(self) -> list[list[str]]:
+        return sorted(cmd_args for cmd_args, _ in self.calls)
+
+    async def test_all_replicas(self) -> None:
+        exit_code, _ = await self.fan_out("--all-replicas", "web", "sync")
+
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(
+            self.exec_args(),
+            [["--env", "A=1", f"p_web_{i}", "sync"] for i in (1, 2, 3)],
+        )
+        self.assertIn("[web_2]", self.calls[1][1] or "")
+
+    async def test_services_with_concurrency_limit(self) -> None:
+        _, stdout = await self.fan_out(
+            "--services", "worker,db", "--all-replicas", "--concurrency=2", "redis-cli", "flushall"
+        )
+
+        self.assertEqual(
+            [cmd_args[-3:] for cmd_args in self.exec_args()],
+            [
+                ["p_db_1", "redis-cli", "flushall"],
+                ["p_worker_1", "redis-cli", "flushall"],
+                ["p_worker_2", "redis-cli", "flushall"],
+            ],
+        )
+        self.assertEqual(self.max_running, 2)
+        self.assertIn("p_worker_2  0", stdout)
+
+    async def test_services_at_index(self) -> None:
+        await self.fan_out("--services=web,worker", "--index=2", "true")
+
+        self.assertEqual([cmd_args[-2] for cmd_args in self.exec_args()], ["p_web_2", "p_worker_2"])
+
+    async def test_failures_are_summarized(self) -> None:
+        self.exit_codes = {"p_web_2": 3, "p_web_3": 1}
+
+        with self.assertLogs("podman_compose", "ERROR") as logs:
+            exit_code, stdout = await self.fan_out("--all-replicas", "web", "false")
+
+        self.assertEqual(exit_code, 3)
+        self.assertEqual(
+            stdout.splitlines(),
+            ["CONTAINER  EXIT CODE", "p_web_1    0", "p_web_2    3", "p_web_3    1"],
+        )
+        self.assertIn("2 of 3 containers: p_web_2 (3), p_web_3 (1)", logs.output[0])
+
+    def test_services_take_no_service_argument(self) -> None:
+        args: Any = podman_compose._parse_args(["exec", "--services=a,b", "ls"])
+
+        self.assertEqual(
+            (args.services, args.service, args.cnt_command), (["a", "b"], None, ["ls"])
+        )
+        args = podman_compose._parse_args(["exec", "--services=a,b", "ls", "-l"])
+        self.assertEqual((args.service, args.cnt_command), (None, ["ls", "-l"]))
+        args = podman_compose._parse_args(["exec", "web", "ls"])
+        self.assertEqual((args.services, args.service, args.cnt_command), (None, "web", ["ls"]))
+
+    def test_service_or_services_is_required(self) -> None:
+        for argv in (["exec"], ["exec", "--services=a,b"]):
+            with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit) as e:
+                podman_compose._parse_args(argv)
+            self.assertEqual(e.exception.code, 2)
+
+    def test_concurrency_must_be_positive(self) -> None:
+        for concurrency in ("0", "-1", "many"):
+            argv = ["exec", "--services=a,b", f"--concurrency={concurrency}", "ls"]
+            with redirect_stderr(io.StringIO()) as stderr, self.assertRaises(SystemExit) as e:
+                podman_compose._parse_args(argv)
+            self.assertEqual(e.exception.code, 2)
+            self.assertIn("expected a positive integer", stderr.getvalue())
@@ -0,0 +1,89 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import os
+import unittest
+from typing import Optional
+from unittest import mock
+
+from podman_compose import ExistingContainer
+from podman_compose import PodmanCompose
+from podman_compose import podman_compose
+
+
+def existing(name: str, service: str, num: int, has_environment: bool = False) -> ExistingContainer:
+    return ExistingContainer(
+        name, name, service, "", "", False, "running", "Up", num, has_environment
+    )
+
+
+class TestExecFastPath(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.compose = PodmanCompose()
+        self.compose.commands = podman_compose.commands
+        self.existing_containers = mock.AsyncMock(
+            return_value={
+                "p_web_1": existing("p_web_1", "web", 1),
+                "p_web_2": existing("p_web_2", "web", 1),
+                "named": existing("named", "web", 3),
+            }
+        )
+        self.podman_run = mock.AsyncMock(return_value=0)
+        self.podman = mock.Mock(existing_containers=self.existing_containers, run=self.podman_run)
+
+    async def resolve(self, *argv: str) -> Optional[str]:
+        args = podman_compose._parse_args(list(argv))
+        self.compose.podman = self.podman
+        return await self.compose._resolve_container_fast(args)
+
+    async def test_resolve_by_replica_number(self) -> None:
+        self.assertEqual(await self.resolve("-p", "p", "exec", "web", "ls"), "p_web_1")
+        # cloned replicas keep the container-number label of the first one
+        self.assertEqual(await self.resolve("-p", "p", "exec", "--index=2", "web", "ls"), "p_web_2")
+        self.assertEqual(await self.resolve("-p", "p", "exec", "--index=3", "web", "ls"), "named")
+        self.assertIsNone(await self.resolve("-p", "p", "exec", "--index=4", "web", "ls"))
+        self.existing_containers.assert_called_with("p", "web")
+
+    async def test_exec_with_service_environment(self) -> None:
+        self.existing_containers.return_value = {"p_web_1": existing("p_web_1", "web", 1, True)}
+
+        # exec passes the environment of the service, which needs the compose files
+        self.assertIsNone(await self.resolve("-p", "p", "exec", "web", "ls"))
+        self.assertEqual(await self.resolve("-p", "p", "cp", "web:/etc/hosts", "."), "p_web_1")
+
+    async def test_resolve_cp(self) -> None:
+        self.assertEqual(await self.resolve("-p", "p", "cp", "web:/etc/hosts", "."), "p_web_1")
+        self.assertIsNone(await self.resolve("-p", "p", "cp", "web:/a", "web:/b"))
+
+    async def test_project_name_from_environment(self) -> None:
+        with mock.patch.dict(os.environ, {"COMPOSE_PROJECT_NAME": "p!"}):
+            self.assertEqual(await self.resolve("exec", "web", "ls"), "p_web_1")
+        self.existing_containers.assert_called_with("p", "web")
+
+    async def test_project_name_required(self) -> None:
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(await self.resolve("exec", "web", "ls"))
+        self.existing_containers.assert_not_called()
+
+    async def test_exec_skips_compose_file(self) -> None:
+        with mock.patch("podman_compose.Podman", return_value=self.podman), mock.patch(
+            "podman_compose.read_cached_podman_version", return_value="5.0.0"
+        ), mock.patch.object(PodmanCompose, "_parse_compose_file") as parse:
+            with self.assertRaises(SystemExit):
+                await self.compose.run(["-p", "p", "exec", "-T", "web", "ls"])
+
+        parse.assert_not_called()
+        self.podman_run.assert_called_once_with([], "exec", ["--interactive", "p_web_1", "ls"])
+
+    async def test_exec_with_environment_from_daemon(self) -> None:
+        self.compose.resolved_container = "p_web_1"
+        self.compose.resolved_environment = {"A": "1", "B": None}
+        self.compose.podman = self.podman
+        args = podman_compose._parse_args(["-p", "p", "exec", "-T", "web", "ls"])
+
+        with self.assertRaises(SystemExit):
+            await podman_compose.commands["exec"](self.compose, args)
+
+        self.podman_run.assert_called_once_with(
+            [], "exec", ["--interactive", "--env", "A=1", "--env", "B", "p_web_1", "ls"]
+        )
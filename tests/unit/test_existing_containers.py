@@ -0,0 +1,206 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import asyncio
+import json
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+from typing import Any
+from unittest import mock
+
+from podman_compose import PS_RECORD_FORMAT
+from podman_compose import ExistingContainer
+from podman_compose import Podman
+from podman_compose import PodmanCompose
+from podman_compose import PodmanComposeError
+from podman_compose import podman_compose
+from podman_compose import ps_record
+
+
+class TestExistingContainers(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.args_path = os.path.join(self.tmp_dir.name, "args.json")
+        self.records_path = os.path.join(self.tmp_dir.name, "records")
+        self.compose = PodmanCompose()
+        self.compose.global_args = podman_compose._parse_args([
+            "--podman-args=--log-level=error",
+            "up",
+        ])
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def podman(self, exit_code: int = 0) -> Podman:
+        """
+        a podman which renders the `{{json .Field}}` actions of the --format template for each
+        container of the records file and stores its arguments
+        """
+        podman_path = os.path.join(self.tmp_dir.name, "podman")
+        with open(podman_path, "w", encoding="utf-8") as f:
+            f.write(
+                f"#!{sys.executable}\n"
+                "import functools, json, re, sys\n"
+                f"json.dump(sys.argv[1:], open({self.args_path!r}, 'w'))\n"
+                "template = sys.argv[sys.argv.index('--format') + 1]\n"
+                f"for line in open({self.records_path!r}):\n"
+                "    c = json.loads(line)\n"
+                "    field = lambda m: json.dumps(functools.reduce(dict.get, m[1].split('.'), c))\n"
+                "    print(re.sub(r'{{json \\.([\\w.]+)}}', field, template))\n"
+                "sys.stderr.write('listed')\n"
+                f"sys.exit({exit_code})\n"
+            )
+        os.chmod(podman_path, os.stat(podman_path).st_mode | stat.S_IXUSR)
+        return Podman(self.compose, podman_path)
+
+    def write_records(self, records: list[dict[str, Any]]) -> None:
+        with open(self.records_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    async def test_records_are_parsed(self) -> None:
+        labels = {
+            "io.podman.compose.service": "web",
+            "io.podman.compose.config-hash": "abc",
+            "com.docker.compose.container-number": "2",
+        }
+        # the fields of a container in a `podman ps` template, State and Status are for humans
+        self.write_records([
+            {
+                "Names": f"p_web_{i}",
+                "ID": f"{i}" * 64,
+                "ImageID": "f" * 64,
+                "State": "Up 2 minutes",
+                "Status": "Up 2 minutes (healthy)",
+                "Exited": False,
+                "Labels": labels,
+                "ListContainer": {"State": "running", "Status": "healthy"},
+            }
+            for i in range(1, 1001)
+        ])
+
+        containers = await self.podman().existing_containers("p", "web")
+
+        with open(self.args_path, encoding="utf-8") as f:
+            self.assertEqual(
+                json.load(f),
+                [
+                    "--log-level=error",
+                    "ps",
+                    "--filter",
+                    "label=io.podman.compose.project=p",
+                    "--filter",
+                    "label=com.docker.compose.service=web",
+                    "-a",
+                    "--no-trunc",
+                    "--format",
+                    PS_RECORD_FORMAT,
+                ],
+            )
+        self.assertEqual(len(containers), 1000)
+        self.assertEqual(
+            containers["p_web_1"],
+            ExistingContainer(
+                "p_web_1", "1" * 64, "web", "abc", "f" * 64, False, "running", "healthy", 2
+            ),
+        )
+
+    async def test_failure(self) -> None:
+        self.write_records([])
+
+        with self.assertRaises(subprocess.CalledProcessError) as e:
+            await self.podman(125).existing_containers("p")
+
+        self.assertEqual(e.exception.returncode, 125)
+        self.assertEqual(e.exception.stderr, b"listed")
+
+    async def test_unexpected_record(self) -> None:
+        self.write_records([{"ID": "1" * 64, "Labels": {}, "ListContainer": {}}])
+
+        with self.assertRaisesRegex(PodmanComposeError, "unexpected container record"):
+            await self.podman().existing_containers("p")
+
+    def test_ps_record(self) -> None:
+        self.assertEqual(ps_record(b'{"Names": "x", "Id": "1"}\n'), {"Names": "x", "Id": "1"})
+        for line in (b"[]\n", b'{"Names": "x"}\n', b"Error: no such template\n"):
+            with self.subTest(line=line), self.assertRaises(PodmanComposeError):
+                ps_record(line)
+
+    def test_from_ps_json(self) -> None:
+        c = ExistingContainer.from_ps({
+            "Names": ["p_db_1", "alias"],
+            "Id": "1234",
+            "Labels": {"com.docker.compose.service": "db"},
+        })
+
+        self.assertEqual((c.name, c.service_name, c.number, c.state), ("p_db_1", "db", 0, ""))
+        self.assertTrue(c.has_environment)
+        self.assertFalse(
+            ExistingContainer.from_ps({
+                "Names": "x",
+                "Id": "1",
+                "Labels": {"io.podman.compose.environment": "none"},
+            }).has_environment
+        )
+        self.assertEqual(
+            ExistingContainer.from_ps({"Names": "x", "Id": "1", "Labels": None}).name, "x"
+        )
+        self.assertFalse(hasattr(c, "__dict__"))
+
+    async def test_up_lists_while_preparing_images(self) -> None:
+        listing: list[bool] = []
+
+        async def existing_containers(project_name: str) -> dict[str, ExistingContainer]:
+            listing.append(True)
+            return {}
+
+        async def prepare_images(*args: Any) -> int:
+            await asyncio.sleep(0)
+            # the listing has started before the images are ready
+            self.assertEqual(listing, [True])
+            return 1
+
+        self.compose.podman = mock.Mock(
+            existing_containers=mock.AsyncMock(side_effect=existing_containers)
+        )
+        self.compose.project_name = "p"
+        self.compose.services = {}
+        args = podman_compose._parse_args(["up", "-d"])
+
+        with mock.patch("podman_compose.prepare_images", side_effect=prepare_images):
+            with self.assertLogs("podman_compose", "ERROR"):
+                self.assertEqual(await podman_compose.commands["up"](self.compose, args), 1)
+
+    async def test_listing_is_stopped_when_preparing_images_raises(self) -> None:
+        listing = asyncio.Event()
+        cancelled: list[bool] = []
+
+        async def existing_containers(project_name: str) -> dict[str, ExistingContainer]:
+            listing.set()
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return {}
+
+        async def prepare_images(*args: Any) -> int:
+            await listing.wait()
+            raise RuntimeError("build failed")
+
+        self.compose.podman = mock.Mock(
+            existing_containers=mock.AsyncMock(side_effect=existing_containers)
+        )
+        self.compose.project_name = "p"
+        self.compose.services = {}
+        args = podman_compose._parse_args(["up", "-d"])
+
+        with mock.patch("podman_compose.prepare_images", side_effect=prepare_images):
+            with self.assertRaises(RuntimeError):
+                await podman_compose.commands["up"](self.compose, args)
+
+        self.assertEqual(cancelled, [True])
@@ -0,0 +1,56 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import unittest
+from unittest import mock
+
+import yaml
+
+from tests.unit.test_utils import ComposeFileTestCase
+from tests.unit.test_utils import write_compose_file
+
+
+class TestMergedYaml(ComposeFileTestCase, unittest.TestCase):
+    project_name = "test_project"
+
+    def test_parse_does_not_dump_yaml(self) -> None:
+        write_compose_file(self.compose_path, {"services": {"web": {"image": "busybox"}}})
+        with mock.patch("podman_compose.yaml.safe_dump") as safe_dump:
+            self.compose._parse_compose_file()
+            safe_dump.assert_not_called()
+            _ = self.compose.merged_yaml
+            safe_dump.assert_called_once()
+
+    def test_merged_yaml_excludes_parse_annotations(self) -> None:
+        self.parse({
+            "services": {
+                "db": {
+                    "image": "busybox",
+                    "volumes": [{"type": "volume", "source": "data", "target": "/d"}],
+                },
+                "web": {
+                    "build": {"context": ".", "additional_contexts": ["db=service:db"]},
+                    "depends_on": ["db"],
+                },
+                "worker": {"extends": "web", "build": {"args": ["A=1"]}},
+            },
+            "volumes": {"data": {}},
+        })
+
+        merged = yaml.safe_load(self.compose.merged_yaml)
+
+        self.assertEqual(merged["volumes"], {"data": {}})
+        self.assertNotIn("_dirname", merged)
+        web = merged["services"]["web"]
+        self.assertNotIn("_deps", web)
+        self.assertEqual(web["build"]["additional_contexts"], ["db=service:db"])
+        self.assertNotIn("build_deps", web["build"])
+        self.assertNotIn("args", web["build"])
+        self.assertNotIn("_vol", merged["services"]["db"]["volumes"][0])
+
+    def test_yaml_hash_is_stable(self) -> None:
+        self.parse({"services": {"web": {"image": "busybox"}}})
+        yaml_hash = self.compose.yaml_hash
+
+        self.assertEqual(len(yaml_hash), 64)
+        self.assertEqual(self.compose.yaml_hash, yaml_hash)
@@ -0,0 +1,127 @@
+# SPDX-License-Identifier: GPL-2.0
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from podman_compose import PodmanCompose
+from podman_compose import podman_binary_stat
+from podman_compose import podman_compose
+from podman_compose import podman_version_cache_file
+from podman_compose import read_cached_podman_version
+from podman_compose import write_cached_podman_version
+
+FAKE_PODMAN = """#!/bin/sh
+echo "$@" >> "{calls}"
+echo "podman version {version}"
+"""
+
+
+class TestPodmanVersionCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.calls = os.path.join(self.tmp_dir.name, "calls")
+        self.podman_path = os.path.join(self.tmp_dir.name, "podman")
+        self.write_podman("5.2.0")
+        self.compose_path = os.path.join(self.tmp_dir.name, "docker-compose.yml")
+        with open(self.compose_path, "w", encoding="utf-8") as f:
+            f.write("services:\n  web:\n    image: busybox\n")
+        patcher = mock.patch.dict(
+            os.environ, {"XDG_CACHE_HOME": os.path.join(self.tmp_dir.name, "cache")}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def write_podman(self, version: str) -> None:
+        with open(self.podman_path, "w", encoding="utf-8") as f:
+            f.write(FAKE_PODMAN.format(calls=self.calls, version=version))
+        os.chmod(self.podman_path, 0o755)
+
+    def probe_count(self) -> int:
+        if not os.path.exists(self.calls):
+            return 0
+        with open(self.calls, encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip() == "--version")
+
+    async def run_compose(self) -> PodmanCompose:
+        compose = PodmanCompose()
+        compose.commands = podman_compose.commands
+        argv = ["--podman-path", self.podman_path, "-f", self.compose_path, "config"]
+        with contextlib.redirect_stdout(io.StringIO()):
+            await compose.run(argv)
+        return compose
+
+    async def test_version_is_probed_once(self) -> None:
+        compose = await self.run_compose()
+        self.assertEqual(compose.podman_version, "5.2.0")
+        self.assertEqual(self.probe_count(), 1)
+
+        compose = await self.run_compose()
+        self.assertEqual(compose.podman_version, "5.2.0")
+        self.assertEqual(self.probe_count(), 1)
+
+    async def test_cache_invalidated_when_binary_changes(self) -> None:
+        await self.run_compose()
+        self.write_podman("5.10.1")
+
+        compose = await self.run_compose()
+
+        self.assertEqual(compose.podman_version, "5.10.1")
+        self.assertEqual(self.probe_count(), 2)
+
+    async def test_failed_probe_is_not_cached(self) -> None:
+        with open(self.podman_path, "w", encoding="utf-8") as f:
+            f.write("#!/bin/sh\nexit 1\n")
+
+        with self.assertRaises(SystemExit):
+            await self.run_compose()
+
+        self.assertFalse(os.path.exists(podman_version_cache_file()))
+
+    def test_read_ignores_corrupt_cache(self) -> None:
+        binary_stat = podman_binary_stat(self.podman_path)
+        os.makedirs(os.path.dirname(podman_version_cache_file()))
+        with open(podman_version_cache_file(), "w", encoding="utf-8") as f:
+            f.write("{not json")
+
+        self.assertIsNone(read_cached_podman_version(binary_stat))
+
+        write_cached_podman_version(binary_stat, "4.9.3")
+        self.assertEqual(read_cached_podman_version(binary_stat), "4.9.3")
+        with open(podman_version_cache_file(), encoding="utf-8") as f:
+            self.assertIn(os.path.realpath(self.podman_path), json.load(f))
+
+    def test_binary_stat_of_missing_binary(self) -> None:
+        self.assertIsNone(podman_binary_stat(os.path.join(self.tmp_dir.name, "missing")))
+        self.assertIsNone(read_cached_podman_version(None))
+
+    async def test_probe_is_reaped_when_parsing_fails(self) -> None:
+        with open(self.podman_path, "w", encoding="utf-8") as f:
+            f.write("#!/bin/sh\nexec sleep 60\n")
+        with open(self.compose_path, "w", encoding="utf-8") as f:
+            f.write("services: [\n")
+        probes: list[asyncio.subprocess.Process] = []
+        start_probe = PodmanCompose._start_podman_version_probe
+
+        async def start(compose: PodmanCompose) -> asyncio.subprocess.Process:
+            probe = await start_probe(compose)
+            assert probe is not None
+            probes.append(probe)
+            return probe
+
+        with mock.patch.object(PodmanCompose, "_start_podman_version_probe", start):
+            with self.assertRaises(yaml.YAMLError):
+                await self.run_compose()
+
+        self.assertEqual(len(probes), 1)
+        self.assertIsNotNone(probes[0].returncode)
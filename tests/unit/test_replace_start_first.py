@@ -0,0 +1,176 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import argparse
+import asyncio
+import unittest
+from typing import Any
+from unittest import mock
+
+from parameterized import parameterized
+
+from podman_compose import ExistingContainer
+from podman_compose import can_replace_start_first
+from podman_compose import has_fixed_host_port
+from podman_compose import podman_compose
+from tests.unit.test_utils import ComposeFileTestCase
+
+
+def existing(name: str, service: str) -> ExistingContainer:
+    return ExistingContainer(
+        name=name,
+        id=name,
+        service_name=service,
+        config_hash="outdated",
+        image_id="",
+        exited=False,
+        state="running",
+        status="Up",
+    )
+
+
+class TestHasFixedHostPort(unittest.TestCase):
+    @parameterized.expand([
+        ("80", False),
+        ("80/udp", False),
+        ("8080:80", True),
+        ("127.0.0.1:8080:80", True),
+        ("127.0.0.1::80", False),
+        ("[::1]:8080:80/tcp", True),
+        ("8000-8001:80-81", True),
+    ])
+    def test_has_fixed_host_port(self, port: str, expected: bool) -> None:
+        self.assertEqual(has_fixed_host_port(port), expected)
+
+
+class TestReplaceStartFirst(ComposeFileTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.compose.commands = podman_compose.commands
+        self.compose.podman_version = "5.0.0"
+        self.calls: list[list[str]] = []
+
+        async def podman_run(
+            podman_args: list[str], cmd: str, cmd_args: list[str], **kwargs: Any
+        ) -> int:
+            self.calls.append([cmd, *cmd_args])
+            await asyncio.sleep(0)
+            return 0
+
+        async def podman_output(podman_args: list[str], cmd: str, cmd_args: list[str]) -> bytes:
+            self.calls.append([cmd, *cmd_args])
+            return b""
+
+        self.existing_containers = mock.AsyncMock(return_value={})
+        self.compose.podman = mock.Mock(
+            run=mock.AsyncMock(side_effect=podman_run),
+            output=mock.AsyncMock(side_effect=podman_output),
+            existing_containers=self.existing_containers,
+            network_ls=mock.AsyncMock(return_value=[]),
+        )
+
+    def get_up_args(self, **kwargs: Any) -> argparse.Namespace:
+        args = podman_compose._parse_args(["up", "-d", "--replace-strategy=start-first"])
+        for key, value in kwargs.items():
+            setattr(args, key, value)
+        return args
+
+    def test_eligibility(self) -> None:
+        self.parse({
+            "services": {
+                "db": {"image": "busybox"},
+                "api": {"image": "busybox", "depends_on": ["db"], "ports": ["80"]},
+                "web": {"image": "busybox", "ports": ["8080:80"]},
+                "named": {"image": "busybox", "container_name": "named"},
+                "host": {"image": "busybox", "network_mode": "host"},
+            },
+        })
+        containers = {"p_db_1": existing("p_db_1", "db"), "p_api_1": existing("p_api_1", "api")}
+
+        eligible = {
+            service
+            for service in self.compose.services
+            if can_replace_start_first(self.compose, service, containers)
+        }
+
+        # db has an existing dependent
+        self.assertEqual(eligible, {"api"})
+
+    async def test_up_replaces_start_first(self) -> None:
+        self.parse({
+            "services": {
+                "api": {"image": "busybox", "scale": 2, "healthcheck": {"test": "true"}},
+                "web": {"image": "busybox", "ports": ["8080:80"]},
+            },
+        })
+        self.existing_containers.return_value = {
+            "p_api_1": existing("p_api_1", "api"),
+            "p_web_1": existing("p_web_1", "web"),
+        }
+
+        with mock.patch("podman_compose.prepare_images", return_value=0):
+            await self.compose.commands["up"](self.compose, self.get_up_args())
+
+        commands = [" ".join(call[:2]) if call[0] != "create" else "create" for call in self.calls]
+        # web has a host port and is recreated stop-first
+        self.assertIn(["stop", "-t", "10", "p_web_1"], self.calls)
+        self.assertLess(commands.index("stop -t"), commands.index("rm --force"))
+        api_calls = [
+            call
+            for call in self.calls
+            if any(arg.startswith("p_api_1") or arg == "--name=p_api_1_replacement" for arg in call)
+        ]
+        self.assertEqual(
+            [call if call[0] != "create" else call[:2] for call in api_calls],
+            [
+                ["rm", "--force", "--ignore", "p_api_1_replacement"],
+                ["create", "--name=p_api_1_replacement"],
+                ["start", "p_api_1_replacement"],
+                ["wait", "--condition=healthy", "p_api_1_replacement"],
+                ["stop", "-t", "10", "p_api_1"],
+                ["rm", "p_api_1"],
+                ["rename", "p_api_1_replacement", "p_api_1"],
+                ["start", "p_api_1"],
+            ],
+        )
+        # the new replica is created normally
+        self.assertIn(["create", "--name=p_api_2"], [call[:2] for call in self.calls])
+
+    async def test_unhealthy_replacement_keeps_old_container(self) -> None:
+        self.parse({"services": {"api": {"image": "busybox", "healthcheck": {"test": "true"}}}})
+        self.existing_containers.return_value = {"p_api_1": existing("p_api_1", "api")}
+
+        async def never(*args: Any) -> None:
+            await asyncio.sleep(10)
+
+        with mock.patch("podman_compose.prepare_images", return_value=0), mock.patch(
+            "podman_compose.wait_container_condition", side_effect=never
+        ):
+            exit_code = await self.compose.commands["up"](
+                self.compose, self.get_up_args(wait_timeout=0.01)
+            )
+
+        self.assertEqual(exit_code, 1)
+        self.assertIn(["rm", "--force", "p_api_1_replacement"], self.calls)
+        self.assertNotIn(["rm", "p_api_1"], self.calls)
+        self.assertNotIn("rename", [call[0] for call in self.calls])
+
+    async def test_replacement_never_ready_without_wait_timeout(self) -> None:
+        self.parse({"services": {"api": {"image": "busybox"}}})
+        self.existing_containers.return_value = {"p_api_1": existing("p_api_1", "api")}
+
+        async def never(*args: Any) -> None:
+            await asyncio.Event().wait()
+
+        with mock.patch("podman_compose.prepare_images", return_value=0), mock.patch(
+            "podman_compose.wait_container_condition", side_effect=never
+        ), mock.patch("podman_compose.readiness_timeout", return_value=0.01) as timeout:
+            with self.assertLogs("podman_compose", "ERROR") as logs:
+                exit_code = await self.compose.commands["up"](self.compose, self.get_up_args())
+
+        self.assertEqual(exit_code, 1)
+        timeout.assert_called_once_with(self.compose.container_by_name["p_api_1"])
+        self.assertIn("p_api_1_replacement did not become running", logs.output[0])
+        self.assertIn(["rm", "--force", "p_api_1_replacement"], self.calls)
+        self.assertNotIn(["rm", "p_api_1"], self.calls)
+        self.assertNotIn("rename", [call[0] for call in self.calls])
@@ -0,0 +1,90 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import argparse
+import asyncio
+import unittest
+from unittest import mock
+
+from podman_compose import create_containers_by_cloning
+from tests.unit.test_utils import ComposeFileTestCase
+
+
+class TestCreateContainersByCloning(ComposeFileTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.parse({
+            "services": {
+                "db": {"image": "busybox"},
+                "worker": {"image": "busybox", "scale": 3, "depends_on": ["db"]},
+            },
+        })
+        self.calls: list[list[str]] = []
+        self.exit_codes: dict[str, int] = {}
+
+        async def podman_run(podman_args: list[str], cmd: str, cmd_args: list[str]) -> int:
+            self.calls.append([cmd, *cmd_args])
+            await asyncio.sleep(0)
+            return self.exit_codes.get(cmd_args[-1], 0)
+
+        self.compose.podman = mock.Mock(
+            run=mock.AsyncMock(side_effect=podman_run),
+            output=mock.AsyncMock(return_value=b""),
+        )
+        self.args = argparse.Namespace(no_deps=False)
+
+    def summary(self) -> list[list[str]]:
+        return [call[:2] if call[0] == "create" else call for call in self.calls]
+
+    async def test_clone_replicas_from_template(self) -> None:
+        exit_codes = await create_containers_by_cloning(
+            self.compose, self.args, self.compose.containers
+        )
+
+        self.assertEqual(exit_codes, [0, 0, 0, 0])
+        self.assertEqual(
+            self.summary(),
+            [
+                ["create", "--name=p_db_1"],
+                ["create", "--name=p_worker_1"],
+                ["rm", "--force", "--ignore", "p_worker_1_template"],
+                ["create", "--name=p_worker_1_template"],
+                ["container", "clone", "p_worker_1_template", "p_worker_2"],
+                ["container", "clone", "p_worker_1_template", "p_worker_3"],
+                ["rm", "p_worker_1_template"],
+            ],
+        )
+        self.assertIn("com.docker.compose.container-number=1", self.calls[1])
+        # the clones do not inherit the number of another replica
+        self.assertFalse([arg for arg in self.calls[3] if "container-number" in arg])
+        first_args = list(self.calls[1][2:])
+        i = first_args.index("com.docker.compose.container-number=1")
+        del first_args[i - 1 : i + 1]
+        self.assertEqual(self.calls[3][2:], first_args)
+
+    async def test_clone_missing_replicas(self) -> None:
+        missing = [cnt for cnt in self.compose.containers if cnt["num"] > 1]
+
+        await create_containers_by_cloning(self.compose, self.args, missing)
+
+        self.assertEqual(
+            self.summary(),
+            [
+                ["rm", "--force", "--ignore", "p_worker_1_template"],
+                ["create", "--name=p_worker_1_template"],
+                ["container", "clone", "p_worker_1_template", "p_worker_2"],
+                ["container", "clone", "p_worker_1_template", "p_worker_3"],
+                ["rm", "p_worker_1_template"],
+            ],
+        )
+
+    async def test_failed_template_falls_back_to_create(self) -> None:
+        self.exit_codes["busybox"] = 1
+
+        exit_codes = await create_containers_by_cloning(
+            self.compose, self.args, self.compose.containers
+        )
+
+        self.assertEqual(exit_codes, [1, 1, 1, 1])
+        self.assertNotIn("container", [call[0] for call in self.calls])
+        self.assertIn(["create", "--name=p_worker_3"], self.summary())
@@ -0,0 +1,85 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import unittest
+from unittest import mock
+
+from podman_compose import ServiceContainer
+from tests.unit.test_utils import ComposeFileTestCase
+
+
+class TestServiceContainer(unittest.TestCase):
+    def test_overlay(self) -> None:
+        service = {"image": "busybox", "ports": ["80"], "restart": "always"}
+        cnt = ServiceContainer(service, name="web_1", num=1)
+
+        self.assertEqual(cnt["image"], "busybox")
+        self.assertEqual(cnt["name"], "web_1")
+        self.assertEqual(len(cnt), 5)
+        self.assertEqual(
+            dict(cnt),
+            {"name": "web_1", "num": 1, "image": "busybox", "ports": ["80"], "restart": "always"},
+        )
+
+        cnt["image"] = "alpine"
+        del cnt["restart"]
+        del cnt["num"]
+
+        self.assertEqual(cnt["image"], "alpine")
+        self.assertNotIn("restart", cnt)
+        self.assertNotIn("num", cnt)
+        self.assertIsNone(cnt.get("restart"))
+        with self.assertRaises(KeyError):
+            del cnt["restart"]
+        self.assertEqual(service, {"image": "busybox", "ports": ["80"], "restart": "always"})
+
+        cnt["restart"] = "no"
+        self.assertEqual(cnt["restart"], "no")
+        self.assertEqual(sorted(cnt), ["image", "name", "ports", "restart"])
+
+
+class TestReplicas(ComposeFileTestCase, unittest.TestCase):
+    project_name = "test_project"
+
+    def test_replicas_share_service_config(self) -> None:
+        self.parse({
+            "services": {
+                "worker": {
+                    "image": "busybox",
+                    "scale": 3,
+                    "labels": {"a": "b"},
+                    "ports": ["8080"],
+                    "volumes": ["data:/data"],
+                }
+            },
+            "volumes": {"data": {}},
+        })
+
+        containers = self.compose.containers
+        self.assertEqual(
+            [c["name"] for c in containers], [f"test_project_worker_{i}" for i in (1, 2, 3)]
+        )
+        self.assertEqual(
+            [c["log_prefix"] for c in containers], ["worker_1", "worker_2", "worker_3"]
+        )
+        self.assertIs(containers[0]["ports"], containers[2]["ports"])
+        self.assertIs(containers[0]["volumes"], containers[2]["volumes"])
+        self.assertIn("com.docker.compose.container-number=2", containers[1]["labels"])
+        self.assertNotIn("com.docker.compose.container-number=1", containers[1]["labels"])
+        self.assertEqual(containers[1]["labels"][0], "a=b")
+        self.assertEqual(containers[1]["_service"], "worker")
+
+    def test_mounts_validated_once_per_service(self) -> None:
+        with mock.patch("podman_compose.get_mnt_dict", wraps=lambda *a: {"type": "bind"}) as m:
+            self.parse({
+                "services": {"worker": {"image": "busybox", "scale": 50, "volumes": ["/a:/a"]}},
+            })
+
+        self.assertEqual(len(self.compose.containers), 50)
+        m.assert_called_once()
+
+    def test_undeclared_volume(self) -> None:
+        with self.assertRaisesRegex(RuntimeError, r"volume \[data\] not defined"):
+            self.parse({
+                "services": {"worker": {"image": "busybox", "scale": 2, "volumes": ["data:/d"]}},
+            })
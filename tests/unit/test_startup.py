@@ -0,0 +1,107 @@
+# SPDX-License-Identifier: GPL-2.0
+
+import argparse
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from podman_compose import PodmanCompose
+from podman_compose import cmd_parse
+from podman_compose import cmd_run
+
+# modules which are loaded on first use only, see lazy_import()
+DEFERRED_MODULES = {
+    "yaml",
+    "dotenv",
+    "getpass",
+    "glob",
+    "hashlib",
+    "random",
+    "tempfile",
+    "urllib.parse",
+}
+
+
+def imported_modules(code: str) -> dict[str, int]:
+    """
+    run code in a fresh interpreter with `-X importtime`,
+    return the cumulative import time in us of each imported module
+    """
+    repo_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=repo_root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in p.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+class TestImportTime(unittest.TestCase):
+    def test_import_does_not_load_deferred_modules(self) -> None:
+        modules = imported_modules("import podman_compose")
+
+        self.assertIn("podman_compose", modules)
+        self.assertEqual(DEFERRED_MODULES & set(modules), set())
+
+    def test_yaml_loaded_on_first_use(self) -> None:
+        modules = imported_modules("import podman_compose; podman_compose.yaml.safe_load('a: 1')")
+
+        # the lazily loaded module itself is not reported, only its submodules
+        self.assertIn("yaml.loader", modules)
+
+
+class TestLazyParsers(unittest.TestCase):
+    def setUp(self) -> None:
+        self.compose = PodmanCompose()
+        self.up_parse = mock.Mock()
+        self.down_parse = mock.Mock()
+
+        @cmd_run(self.compose, "up", "create and start")
+        async def compose_up(compose: PodmanCompose, args: argparse.Namespace) -> None:
+            pass
+
+        @cmd_run(self.compose, "down", "tear down")
+        async def compose_down(compose: PodmanCompose, args: argparse.Namespace) -> None:
+            pass
+
+        cmd_parse(self.compose, "up")(self.up_parse)
+        cmd_parse(self.compose, "down")(self.down_parse)
+
+    def test_only_selected_command_parser_is_built(self) -> None:
+        args = self.compose._parse_args(["up"])  # pylint: disable=protected-access
+
+        self.assertEqual(args.command, "up")
+        self.up_parse.assert_called_once()
+        self.down_parse.assert_not_called()
+
+    def test_help_lists_all_commands(self) -> None:
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), self.assertRaises(SystemExit):
+            self.compose._parse_args(["-h"])  # pylint: disable=protected-access
+
+        self.assertIn("create and start", stdout.getvalue())
+        self.assertIn("tear down", stdout.getvalue())
+        self.up_parse.assert_not_called()
+        self.down_parse.assert_not_called()
+
+    def test_command_help(self) -> None:
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), self.assertRaises(SystemExit) as ex:
+            self.compose._parse_args(["down", "-h"])  # pylint: disable=protected-access
+
+        self.assertEqual(ex.exception.code, 0)
+        self.assertIn("usage:", stdout.getvalue())
+        self.down_parse.assert_called_once()
+        self.up_parse.assert_not_called()
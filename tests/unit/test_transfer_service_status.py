@@ -0,0 +1,186 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import argparse
+import asyncio
+import unittest
+from typing import Any
+from unittest import mock
+
+from podman_compose import ROLLING_RUNNING_TIMEOUT
+from podman_compose import readiness_timeout
+from podman_compose import transfer_service_status
+from tests.unit.test_utils import ComposeFileTestCase
+
+
+class TestTransferServiceStatus(ComposeFileTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.compose.podman_version = "5.0.0"
+        self.calls: list[list[str]] = []
+
+        async def podman_run(podman_args: list[str], cmd: str, cmd_args: list[str]) -> int:
+            self.calls.append([cmd, *cmd_args])
+            await asyncio.sleep(0)
+            return 0
+
+        async def podman_output(podman_args: list[str], cmd: str, cmd_args: list[str]) -> bytes:
+            self.calls.append([cmd, *cmd_args])
+            return b""
+
+        self.podman_output = mock.AsyncMock(side_effect=podman_output)
+        self.compose.podman = mock.Mock(
+            run=mock.AsyncMock(side_effect=podman_run), output=self.podman_output
+        )
+        self.parse({
+            "services": {
+                "db": {"image": "busybox", "healthcheck": {"test": "true"}},
+                "api": {
+                    "image": "busybox",
+                    "scale": 3,
+                    "depends_on": {"db": {"condition": "service_healthy"}},
+                },
+                "web": {"image": "busybox", "depends_on": ["api"]},
+            },
+        })
+
+    def get_args(self, **kwargs: Any) -> argparse.Namespace:
+        return argparse.Namespace(**{"services": [], "timeout": None, **kwargs})
+
+    async def test_stop_dependents_first(self) -> None:
+        await transfer_service_status(self.compose, self.get_args(timeout=1), "stop")
+
+        self.assertEqual(
+            self.calls,
+            [
+                ["stop", "-t", "1", "p_web_1"],
+                ["stop", "-t", "1", "p_api_3"],
+                ["stop", "-t", "1", "p_api_2"],
+                ["stop", "-t", "1", "p_api_1"],
+                ["stop", "-t", "1", "p_db_1"],
+            ],
+        )
+
+    async def test_stop_does_not_wait_for_unrelated_services(self) -> None:
+        self.parse({
+            "services": {
+                "db": {"image": "busybox"},
+                "web": {"image": "busybox", "depends_on": ["db"]},
+                "cache": {"image": "busybox"},
+                "worker": {"image": "busybox", "depends_on": ["cache"]},
+            },
+        })
+        web_stopped = asyncio.Event()
+
+        async def podman_run(podman_args: list[str], cmd: str, cmd_args: list[str]) -> int:
+            self.calls.append([cmd, *cmd_args])
+            if cmd_args[-1] == "p_web_1":
+                await web_stopped.wait()
+            return 0
+
+        self.compose.podman.run.side_effect = podman_run  # type: ignore[attr-defined]
+        task = asyncio.create_task(
+            transfer_service_status(self.compose, self.get_args(timeout=1), "stop")
+        )
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        # cache only waits for worker, not for web which is stopped at the same time
+        self.assertIn(["stop", "-t", "1", "p_cache_1"], self.calls)
+        self.assertNotIn(["stop", "-t", "1", "p_db_1"], self.calls)
+        web_stopped.set()
+        await task
+        self.assertEqual(self.calls[-1], ["stop", "-t", "1", "p_db_1"])
+
+    async def test_start_waits_for_conditions(self) -> None:
+        await transfer_service_status(self.compose, self.get_args(), "start")
+
+        self.assertEqual(
+            self.calls,
+            [
+                ["start", "p_db_1"],
+                ["wait", "--condition=healthy", "p_db_1"],
+                ["start", "p_api_1"],
+                ["start", "p_api_2"],
+                ["start", "p_api_3"],
+                # web depends on db through api
+                ["wait", "--condition=healthy", "p_db_1"],
+                ["wait", "--condition=running", "p_api_1"],
+                ["wait", "--condition=running", "p_api_2"],
+                ["wait", "--condition=running", "p_api_3"],
+                ["start", "p_web_1"],
+            ],
+        )
+
+    async def test_start_does_not_wait_for_untargeted_services(self) -> None:
+        await transfer_service_status(self.compose, self.get_args(services=["api"]), "start")
+
+        self.assertEqual(
+            self.calls, [["start", "p_api_1"], ["start", "p_api_2"], ["start", "p_api_3"]]
+        )
+
+    async def test_restart(self) -> None:
+        await transfer_service_status(
+            self.compose, self.get_args(services=["db", "api"]), "restart"
+        )
+
+        self.assertEqual(
+            [call[0] for call in self.calls],
+            ["stop", "stop", "stop", "stop", "start", "wait", "start", "start", "start"],
+        )
+        self.assertEqual(self.calls[3], ["stop", "-t", "10", "p_db_1"])
+
+    async def test_restart_rolling(self) -> None:
+        args = self.get_args(services=["api", "db"], rolling=True, rolling_batch_size=2)
+        await transfer_service_status(self.compose, args, "restart")
+
+        self.assertEqual(
+            self.calls,
+            [
+                ["restart", "-t", "10", "p_db_1"],
+                ["wait", "--condition=healthy", "p_db_1"],
+                ["restart", "-t", "10", "p_api_1", "p_api_2"],
+                ["wait", "--condition=running", "p_api_1"],
+                ["wait", "--condition=running", "p_api_2"],
+                ["restart", "-t", "10", "p_api_3"],
+                ["wait", "--condition=running", "p_api_3"],
+            ],
+        )
+
+    async def test_restart_rolling_stops_at_batch_not_ready(self) -> None:
+        async def podman_output(podman_args: list[str], cmd: str, cmd_args: list[str]) -> bytes:
+            self.calls.append([cmd, *cmd_args])
+            if cmd_args[-1] == "p_api_1":
+                await asyncio.Event().wait()
+            return b""
+
+        self.podman_output.side_effect = podman_output
+        args = self.get_args(
+            services=["api"], rolling=True, rolling_batch_size=1, wait_timeout=0.05
+        )
+
+        with self.assertLogs("podman_compose", "ERROR") as logs:
+            self.assertEqual(await transfer_service_status(self.compose, args, "restart"), 1)
+
+        self.assertIn("p_api_1 did not become running|healthy within 0 seconds", logs.output[0])
+        self.assertEqual(
+            self.calls,
+            [["restart", "-t", "10", "p_api_1"], ["wait", "--condition=running", "p_api_1"]],
+        )
+
+    def test_readiness_timeout(self) -> None:
+        self.assertEqual(readiness_timeout(self.compose.container_by_name["p_db_1"]), 180)
+        self.assertEqual(
+            readiness_timeout(self.compose.container_by_name["p_api_1"]), ROLLING_RUNNING_TIMEOUT
+        )
+        self.assertEqual(
+            readiness_timeout({
+                "healthcheck": {
+                    "interval": "5s",
+                    "timeout": "2s",
+                    "start_period": "1m",
+                    "retries": 2,
+                }
+            }),
+            74,
+        )
@@ -0,0 +1,51 @@
+# SPDX-License-Identifier: GPL-2.0
+# pylint: disable=protected-access
+
+import os
+import tempfile
+import unittest
+from typing import Any
+
+import yaml
+
+from podman_compose import PodmanCompose
+
+
+def new_compose(compose_path: str, project_name: str = "p", in_pod: str = "false") -> PodmanCompose:
+    """
+    a PodmanCompose with the global arguments needed to parse the compose file
+    """
+    compose = PodmanCompose()
+    compose.global_args.file = [compose_path]
+    compose.global_args.project_name = project_name
+    compose.global_args.env_file = None
+    compose.global_args.profile = []
+    compose.global_args.in_pod = in_pod
+    return compose
+
+
+def write_compose_file(path: str, content: dict[str, Any]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(content, f)
+
+
+class ComposeFileTestCase(unittest.TestCase):
+    """
+    a compose file in a temporary directory which is removed after the test, and the
+    PodmanCompose of the project
+    """
+
+    project_name = "p"
+
+    def setUp(self) -> None:
+        super().setUp()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.dir = os.path.realpath(tmp_dir.name)
+        self.compose_path = os.path.join(self.dir, "docker-compose.yml")
+        self.compose = new_compose(self.compose_path, self.project_name)
+
+    def parse(self, content: dict[str, Any]) -> PodmanCompose:
+        write_compose_file(self.compose_path, content)
+        self.compose._parse_compose_file()
+        return self.compose